@@ -1,96 +1,29 @@
-import smtplib
-from email.mime.text import MIMEText
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel, EmailStr
-from Application.db import token_blacklist_collection, users_collection
+from Application.db import users_collection
 from bson.objectid import ObjectId
-from Application.config import (PASSWORD_SALT, JWT_SECRET_KEY,
-    EMAIL_HOST, EMAIL_PORT, EMAIL_HOST_USER, EMAIL_HOST_PASSWORD, EMAIL_USE_TLS)
-from Application.db import user_code_collection
-import random, string
+from Application.config import PASSWORD_SALT, JWT_SECRET_KEY, JWT_EMBED_PROFILE
+from Application.hashing import hashing_service
+from Application.revocation import revocation_cache
+from Application.user_cache import user_cache
+import uuid
 
 # JWT settings
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
-CODE_VALIDITY_SECONDS = 600
-CODE_RESEND_COOLDOWN = 60    # block resending for 1 min even if code was used
-
-def hash_verification_code(code: str) -> str:
-    return pwd_context.hash(PASSWORD_SALT + code)
-
-def verify_hashed_code(code: str, hashed_code: str) -> bool:
-    return pwd_context.verify(PASSWORD_SALT + code, hashed_code)
-
-async def generate_and_store_code(email: str) -> str:
-    code = ''.join(random.choices(string.digits, k=6))
-    hashed_code = hash_verification_code(code)
-    now = datetime.utcnow()
-
-    await user_code_collection.update_one(
-        {"email": email},
-        {
-            "$set": {
-                "hashed_code": hashed_code,
-                "created_at": now,
-                "used": False
-            }
-        },
-        upsert=True
-    )
-    return code
-
-async def can_send_new_code(email: str) -> tuple[bool, int]:
-    record = await user_code_collection.find_one({"email": email})
-    if not record:
-        return True, 0
-
-    elapsed = (datetime.utcnow() - record["created_at"]).total_seconds()
-
-    # Always enforce cooldown even if code was used
-    if elapsed < CODE_RESEND_COOLDOWN:
-        return False, CODE_RESEND_COOLDOWN - int(elapsed)
-
-    # If code is unused but still valid, block sending a new one
-    if not record["used"] and elapsed < CODE_VALIDITY_SECONDS:
-        return False, CODE_VALIDITY_SECONDS - int(elapsed)
-
-    return True, 0
-
-async def validate_code_for_signup(email: str, code: str):
-    record = await user_code_collection.find_one({"email": email})
-    if not record:
-        return False, "No verification code found for this email"
-    elapsed = (datetime.utcnow() - record["created_at"]).total_seconds()
-    if elapsed > CODE_VALIDITY_SECONDS:
-        return False, "Verification code expired"
-    if record["used"]:
-        return False, "Verification code already used"
-    if not verify_hashed_code(code, record["hashed_code"]):
-        return False, "Invalid verification code"
-
-    # Mark as used
-    await user_code_collection.update_one(
-        {"email": email},
-        {"$set": {"used": True}}
-    )
-    return True, None
 
-# Hashing setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Save refresh token to blacklist
-async def blacklist_token(token: str):
-    await token_blacklist_collection.insert_one({"token": token})
+# Save token to blacklist (kept until the token's own expiry); False if the token is not ours
+async def blacklist_token(token: str) -> bool:
+    return await revocation_cache.revoke(token)
 
-# Check if a refresh token is blacklisted
-async def is_token_blacklisted(token: str) -> bool:
-    token_doc = await token_blacklist_collection.find_one({"token": token})
-    return token_doc is not None
+# Check if a token is blacklisted; pass decoded claims to key by jti
+async def is_token_blacklisted(token: str, claims: dict | None = None) -> bool:
+    return await revocation_cache.is_revoked(token, claims)
 
 # Pydantic Models
 class ForgotPasswordRequest(BaseModel):
@@ -134,26 +67,50 @@ class LogoutRequest(BaseModel):
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=ALGORITHM)
 
+def access_token_claims(user: User) -> dict:
+    """Claims for an access token; embeds the public profile when JWT_EMBED_PROFILE is on."""
+    claims = {"sub": user.email}
+    if JWT_EMBED_PROFILE:
+        claims.update({
+            "uid": user.id,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "joined_on": int(user.joined_on.timestamp()) if user.joined_on else None,
+        })
+    return claims
+
+def user_from_claims(payload: dict) -> User | None:
+    if "uid" not in payload:
+        return None
+    joined_on = payload.get("joined_on")
+    return User(
+        id=payload["uid"],
+        email=payload["sub"],
+        first_name=payload.get("first_name") or "",
+        last_name=payload.get("last_name") or "",
+        joined_on=datetime.utcfromtimestamp(joined_on) if joined_on is not None else None
+    )
+
 def create_refresh_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(days=7))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=ALGORITHM)
 
 class TokenData(BaseModel):
     email: EmailStr | None = None
 
 # Utilities
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     salted_password = PASSWORD_SALT + plain_password
-    return pwd_context.verify(salted_password, hashed_password)
+    return await hashing_service.verify(salted_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
+async def get_password_hash(password: str) -> str:
     salted_password = PASSWORD_SALT + password
-    return pwd_context.hash(salted_password)
+    return await hashing_service.hash(salted_password)
 
 # Updated function to get user by email
 async def get_user_by_email(email: str):
@@ -169,10 +126,23 @@ async def get_user_by_email(email: str):
         )
     return None
 
+# Public profile only (no password hash) for the authenticated hot path
+async def get_user_profile(email: str) -> User | None:
+    user = await users_collection.find_one({"email": email}, {"hashed_password": 0})
+    if user:
+        return User(
+            id=str(user["_id"]),
+            email=user["email"],
+            first_name=user.get("first_name"),
+            last_name=user.get("last_name"),
+            joined_on=user.get("joined_on")
+        )
+    return None
+
 # Updated authentication function
 async def authenticate_user(email: str, password: str):
     user = await get_user_by_email(email)
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await verify_password(password, user.hashed_password):
         return False
     return user
 
@@ -182,41 +152,28 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         detail="Invalid credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    # Check if token is blacklisted
-    if await is_token_blacklisted(token):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token revoked",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if not email:
             raise credentials_exception
-        user = await get_user_by_email(email)
+        # Check if token is blacklisted (answered in-process for most tokens)
+        if await is_token_blacklisted(token, payload):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        # Profile embedded in the token: no database round-trip at all
+        user = user_from_claims(payload) if JWT_EMBED_PROFILE else None
+        if user is not None:
+            return user
+        user = user_cache.get(email)
         if user is None:
-            raise credentials_exception
+            user = await get_user_profile(email)
+            if user is None:
+                raise credentials_exception
+            user_cache.set(email, user)
         return user
     except JWTError:
         raise credentials_exception
-
-def send_email(to_email: str, subject: str, message: str) -> bool:
-    try:
-        msg = MIMEText(message)
-        msg["Subject"] = subject
-        msg["From"] = EMAIL_HOST_USER
-        msg["To"] = to_email
-
-        server = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT)
-        if EMAIL_USE_TLS:
-            server.starttls()
-        server.login(EMAIL_HOST_USER, EMAIL_HOST_PASSWORD)
-        server.send_message(msg)
-        server.quit()
-        print(f"Email sent to {to_email}")
-        return True
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        return False
\ No newline at end of file
@@ -0,0 +1,87 @@
+import os
+import socket
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from pymongo.errors import PyMongoError
+
+from Application.config import CACHE_BUS_SYNC_SECONDS, CACHE_BUS_USE_CHANGE_STREAM
+from Application.db import cache_invalidations_collection
+from Application.collection_sync import CollectionSync
+
+# Events only matter until every worker has synced; the TTL index drops them after this
+EVENT_RETENTION = timedelta(hours=1)
+# Event ids remembered so the polling overlap does not apply an event twice
+SEEN_EVENTS = 10000
+
+Handler = Callable[[str], None]
+
+
+class CacheInvalidationBus:
+    """Broadcasts cache invalidations to every worker process and instance.
+
+    ``invalidate`` drops the key locally at once and records an event in
+    ``cache_invalidations``; every other process applies it through a change
+    stream, or by polling when change streams are unavailable. Handlers
+    should be idempotent: delivery is at-least-once.
+    """
+
+    def __init__(self, collection, sync_seconds: float, use_change_stream: bool = True):
+        self.collection = collection
+        self.handlers: Dict[str, List[Handler]] = {}
+        self.origin = ""
+        self._seen: OrderedDict = OrderedDict()
+        self._sync = CollectionSync(
+            "CACHE BUS", collection, "at", {"cache": 1, "key": 1, "origin": 1},
+            self._receive, sync_seconds, use_change_stream
+        )
+        # Metrics
+        self.published = 0
+        self.applied = 0
+
+    def register(self, cache: str, handler: Handler):
+        self.handlers.setdefault(cache, []).append(handler)
+
+    def _apply(self, cache: str, key: str):
+        for handler in self.handlers.get(cache, ()):
+            handler(key)
+
+    async def invalidate(self, cache: str, key: str):
+        self._apply(cache, key)
+        now = datetime.utcnow()
+        try:
+            await self.collection.insert_one({
+                "cache": cache, "key": key, "origin": self.origin,
+                "at": now, "expires_at": now + EVENT_RETENTION,
+            })
+            self.published += 1
+        except PyMongoError as e:
+            # Other workers fall back to their cache TTL
+            print(f"[CACHE BUS] Could not publish invalidation of {cache}:{key}: {e}")
+
+    def _receive(self, doc: dict):
+        if doc["_id"] in self._seen:
+            return
+        self._seen[doc["_id"]] = None
+        while len(self._seen) > SEEN_EVENTS:
+            self._seen.popitem(last=False)
+        if doc.get("origin") != self.origin:
+            self._apply(doc["cache"], doc["key"])
+            self.applied += 1
+
+    def start(self):
+        # Resolved here, not at import: pre-forked workers share the import
+        self.origin = f"{socket.gethostname()}:{os.getpid()}"
+        self._sync.start()
+
+    async def stop(self):
+        await self._sync.stop()
+
+    def stats(self) -> dict:
+        return {"published": self.published, "applied": self.applied}
+
+
+cache_bus = CacheInvalidationBus(
+    cache_invalidations_collection, CACHE_BUS_SYNC_SECONDS, CACHE_BUS_USE_CHANGE_STREAM
+)
@@ -0,0 +1,186 @@
+import asyncio
+import json
+from typing import Awaitable, Callable, Dict, Set
+
+from fastapi import WebSocket
+from fastapi.encoders import jsonable_encoder
+
+from Application.config import CHAT_BROKER_URL
+
+Handler = Callable[[str, dict], Awaitable[None]]
+
+
+# --- Brokers ---
+class Broker:
+    """Moves chat events between processes. Subclasses deliver each published
+    event exactly once to every process subscribed to its channel."""
+
+    handler: Handler | None = None
+
+    async def start(self, handler: Handler):
+        self.handler = handler
+
+    async def stop(self):
+        pass
+
+    async def subscribe(self, channel: str):
+        raise NotImplementedError
+
+    async def unsubscribe(self, channel: str):
+        raise NotImplementedError
+
+    async def publish(self, channel: str, event: dict):
+        raise NotImplementedError
+
+
+class InMemoryBroker(Broker):
+    """Single-process broker: publishing hands the event straight to the hub.
+    Brokers created on the same ``bus`` list (several hubs in one process)
+    deliver to each other as well."""
+
+    def __init__(self, bus: list | None = None):
+        self.channels: Set[str] = set()
+        self.bus = bus if bus is not None else []
+        self.bus.append(self)
+
+    async def subscribe(self, channel: str):
+        self.channels.add(channel)
+
+    async def unsubscribe(self, channel: str):
+        self.channels.discard(channel)
+
+    async def publish(self, channel: str, event: dict):
+        for broker in list(self.bus):
+            if channel in broker.channels and broker.handler is not None:
+                await broker.handler(channel, event)
+
+
+class RedisBroker(Broker):
+    """Redis pub/sub broker. Needs the optional ``redis`` package; any server
+    speaking the Redis protocol (including a local stand-in) works."""
+
+    def __init__(self, url: str | None = None, client=None):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise RuntimeError("CHAT_BROKER_URL uses redis but the 'redis' package is not installed")
+            client = redis.from_url(url)
+        self.client = client
+        self.pubsub = client.pubsub()
+        self._task: asyncio.Task | None = None
+
+    async def start(self, handler: Handler):
+        await super().start(handler)
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.pubsub.aclose()
+
+    async def _listen(self):
+        while True:
+            if not self.pubsub.subscribed:
+                await asyncio.sleep(0.1)
+                continue
+            message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if message is None:
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            try:
+                await self.handler(channel, json.loads(message["data"]))
+            except Exception as e:
+                print(f"[CHAT HUB] Dropped event on {channel}: {e}")
+
+    async def subscribe(self, channel: str):
+        await self.pubsub.subscribe(channel)
+
+    async def unsubscribe(self, channel: str):
+        await self.pubsub.unsubscribe(channel)
+
+    async def publish(self, channel: str, event: dict):
+        await self.client.publish(channel, json.dumps(event))
+
+
+def broker_from_url(url: str) -> Broker:
+    if url.startswith("memory://"):
+        return InMemoryBroker()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(url)
+    raise ValueError(f"Unsupported CHAT_BROKER_URL: {url!r}")
+
+
+# --- Hub ---
+class ChatHub:
+    """Per-chat registry of this process's WebSocket connections.
+
+    Events are published to the broker only; each process receives them once
+    per subscribed chat and fans them out to its own local sockets, so every
+    participant sees an event once no matter which worker it was sent from.
+    """
+
+    def __init__(self, broker: Broker):
+        self.broker = broker
+        self.connections: Dict[str, Set[WebSocket]] = {}
+        self._started = False
+
+    @staticmethod
+    def channel(chat_id: str) -> str:
+        return f"chat:{chat_id}"
+
+    async def start(self):
+        if not self._started:
+            await self.broker.start(self._deliver)
+            self._started = True
+
+    async def stop(self):
+        if self._started:
+            await self.broker.stop()
+            self._started = False
+
+    async def connect(self, chat_id: str, websocket: WebSocket):
+        sockets = self.connections.setdefault(chat_id, set())
+        if not sockets:
+            await self.broker.subscribe(self.channel(chat_id))
+        sockets.add(websocket)
+
+    async def disconnect(self, chat_id: str, websocket: WebSocket):
+        sockets = self.connections.get(chat_id)
+        if sockets is None:
+            return
+        sockets.discard(websocket)
+        if not sockets:
+            del self.connections[chat_id]
+            await self.broker.unsubscribe(self.channel(chat_id))
+
+    async def publish(self, chat_id: str, event: dict):
+        await self.broker.publish(self.channel(chat_id), jsonable_encoder(event))
+
+    async def _deliver(self, channel: str, event: dict):
+        chat_id = channel.split(":", 1)[1]
+        sockets = list(self.connections.get(chat_id, ()))
+        if not sockets:
+            return
+        results = await asyncio.gather(
+            *(ws.send_json(event) for ws in sockets), return_exceptions=True
+        )
+        for ws, result in zip(sockets, results):
+            if isinstance(result, Exception):
+                await self.disconnect(chat_id, ws)
+
+    def stats(self) -> dict:
+        return {
+            "chats": len(self.connections),
+            "connections": sum(len(s) for s in self.connections.values()),
+        }
+
+
+chat_hub = ChatHub(broker_from_url(CHAT_BROKER_URL))
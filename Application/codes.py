@@ -0,0 +1,150 @@
+import hashlib
+import hmac
+import secrets
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from Application.config import CODE_HMAC_KEY, CODE_MAX_ATTEMPTS
+from Application.db import user_code_collection
+
+# Purposes namespace the codes: a signup code never resets a password
+PURPOSE_SIGNUP = "signup"
+PURPOSE_PASSWORD_RESET = "password_reset"
+PURPOSES = (PURPOSE_SIGNUP, PURPOSE_PASSWORD_RESET)
+
+CODE_LENGTH = 6
+CODE_VALIDITY_SECONDS = 600
+CODE_RESEND_COOLDOWN = 60    # block resending for 1 min even if code was used
+# Upserts retried when a record vanishes between the conflict and the re-read
+ISSUE_ATTEMPTS = 3
+
+_key = CODE_HMAC_KEY.encode()
+
+
+def _normalize(email: str) -> str:
+    return email.strip().lower()
+
+def _check_purpose(purpose: str):
+    if purpose not in PURPOSES:
+        raise ValueError(f"Unknown verification code purpose: {purpose!r}")
+
+def code_digest(email: str, purpose: str, code: str) -> str:
+    """Keyed HMAC-SHA256 of the code, bound to its email and purpose."""
+    message = f"{purpose}:{email}:{code.strip()}".encode()
+    return hmac.new(_key, message, hashlib.sha256).hexdigest()
+
+
+def _wait_seconds(record: dict, now: datetime) -> int:
+    elapsed = (now - record["created_at"]).total_seconds()
+    wait = CODE_RESEND_COOLDOWN - elapsed
+    # An unused, still-valid code blocks a new one until it expires
+    if not record.get("used") and record.get("attempts", 0) < CODE_MAX_ATTEMPTS:
+        wait = max(wait, (record["expires_at"] - now).total_seconds())
+    return max(1, int(wait))
+
+
+async def issue_code(email: str, purpose: str) -> tuple[str | None, int]:
+    """Create a fresh code for ``email``/``purpose``.
+
+    Returns ``(code, 0)``, or ``(None, wait_seconds)`` while the resend
+    cooldown or a still-valid code is blocking a new one. The check and
+    the write are one conditional upsert, so concurrent requests cannot
+    both issue (and mail) a code.
+    """
+    _check_purpose(purpose)
+    email = _normalize(email)
+    for _ in range(ISSUE_ATTEMPTS):
+        now = datetime.utcnow()
+        issued = await _try_issue(email, purpose, now)
+        if issued is not None:
+            return issued
+    # Conflicting with a record we cannot read back: a legacy unique index
+    # on email alone, until init_db replaces it
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Verification codes are temporarily unavailable, please retry shortly",
+        headers={"Retry-After": "5"},
+    )
+
+
+async def _try_issue(email: str, purpose: str, now: datetime) -> tuple[str | None, int] | None:
+    """One conditional upsert; None when it conflicted with a record that is gone."""
+    cooled_down = {"$lte": now - timedelta(seconds=CODE_RESEND_COOLDOWN)}
+    code = "".join(secrets.choice("0123456789") for _ in range(CODE_LENGTH))
+
+    try:
+        await user_code_collection.update_one(
+            {
+                "email": email,
+                "purpose": purpose,
+                "$or": [
+                    {"expires_at": {"$lte": now}},
+                    {"used": True, "created_at": cooled_down},
+                    {"attempts": {"$gte": CODE_MAX_ATTEMPTS}, "created_at": cooled_down},
+                ],
+            },
+            {
+                "$set": {
+                    "code_hash": code_digest(email, purpose, code),
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=CODE_VALIDITY_SECONDS),
+                    "used": False,
+                    "attempts": 0,
+                }
+            },
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # A record exists and is not eligible for replacement yet
+        record = await user_code_collection.find_one({"email": email, "purpose": purpose})
+        if record is None:
+            return None
+        return None, _wait_seconds(record, now)
+    return code, 0
+
+
+async def consume_code(email: str, purpose: str, code: str) -> tuple[bool, str | None]:
+    """Validate and burn a code in one round-trip.
+
+    The update counts the attempt and flips ``used`` only when the stored
+    digest matches, guarded by expiry, used-flag and attempt limit, so two
+    concurrent submissions can never both succeed.
+    """
+    _check_purpose(purpose)
+    email = _normalize(email)
+    now = datetime.utcnow()
+    digest = code_digest(email, purpose, code)
+
+    record = await user_code_collection.find_one_and_update(
+        {
+            "email": email,
+            "purpose": purpose,
+            "used": False,
+            "expires_at": {"$gt": now},
+            "attempts": {"$lt": CODE_MAX_ATTEMPTS},
+        },
+        [{"$set": {
+            "attempts": {"$add": ["$attempts", 1]},
+            "used": {"$eq": ["$code_hash", digest]},
+        }}],
+        return_document=ReturnDocument.AFTER
+    )
+    if record is not None:
+        if record["used"] and hmac.compare_digest(record["code_hash"], digest):
+            return True, None
+        if record["attempts"] >= CODE_MAX_ATTEMPTS:
+            return False, "Too many attempts, please request a new code"
+        return False, "Invalid verification code"
+
+    # Nothing consumable: look once more only to explain why
+    record = await user_code_collection.find_one({"email": email, "purpose": purpose})
+    if not record:
+        return False, "No verification code found for this email"
+    if record["used"]:
+        return False, "Verification code already used"
+    if record["expires_at"] <= now:
+        return False, "Verification code expired"
+    return False, "Too many attempts, please request a new code"
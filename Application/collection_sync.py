@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from pymongo.errors import PyMongoError
+
+# Overlap applied to polling so clock skew between instances never drops a document
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class CollectionSync:
+    """Feeds documents written to ``collection`` by any process to ``on_document``.
+
+    A change stream delivers them as they are written. Without one (no
+    replica set) the collection is polled every ``sync_seconds`` for
+    documents whose ``time_field`` is newer than the last poll, minus
+    SYNC_OVERLAP. Delivery is at-least-once, so ``on_document`` must be
+    idempotent. ``on_synced`` runs after each change and each poll.
+    """
+
+    def __init__(self, name: str, collection, time_field: str, projection: Dict[str, int],
+                 on_document: Callable[[dict], None], sync_seconds: float, use_change_stream: bool = True,
+                 operation_types: Iterable[str] = ("insert",),
+                 on_synced: Optional[Callable[[], Awaitable[None]]] = None):
+        self.name = name
+        self.collection = collection
+        self.time_field = time_field
+        self.projection = projection
+        self.on_document = on_document
+        self.sync_seconds = sync_seconds
+        self.use_change_stream = use_change_stream
+        self.operation_types = list(operation_types)
+        self.on_synced = on_synced
+        self.synced_until = datetime.utcnow()
+        self._task: asyncio.Task | None = None
+
+    async def _synced(self):
+        if self.on_synced is not None:
+            await self.on_synced()
+
+    async def _watch(self):
+        pipeline = [{"$match": {"operationType": {"$in": self.operation_types}}}]
+        async with self.collection.watch(pipeline) as stream:
+            async for change in stream:
+                self.on_document(change["fullDocument"])
+                await self._synced()
+
+    async def poll_once(self):
+        since = self.synced_until - SYNC_OVERLAP
+        self.synced_until = datetime.utcnow()
+        async for doc in self.collection.find({self.time_field: {"$gt": since}}, self.projection):
+            self.on_document(doc)
+        await self._synced()
+
+    async def _run(self):
+        if self.use_change_stream:
+            try:
+                await self._watch()
+            except PyMongoError as e:
+                print(f"[{self.name}] Change streams unavailable ({e}); polling every {self.sync_seconds}s")
+        while True:
+            try:
+                await self.poll_once()
+            except PyMongoError as e:
+                print(f"[{self.name}] Sync failed: {e}")
+            await asyncio.sleep(self.sync_seconds)
+
+    def start(self, since: Optional[datetime] = None):
+        """Sync documents written after ``since`` (default: now)."""
+        if self._task is None:
+            self.synced_until = since or datetime.utcnow()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -8,9 +8,133 @@ JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "XXXXXX123YYYY")
 SECRET_KEY = os.getenv("SECRET_KEY", "121212XXXXXX123YYYY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 
+# SERVER (python -m Application.server)
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("PORT", "8080"))  # Cloud Run injects PORT
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "0"))  # 0 = one per available CPU
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+# Longer than the front end's idle timeout so it, not us, closes idle connections
+SERVER_KEEPALIVE_SECONDS = int(os.getenv("SERVER_KEEPALIVE_SECONDS", "620"))
+# Cloud Run sends SIGKILL 10 s after SIGTERM
+SERVER_GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", "8"))
+# Front-end proxy addresses whose X-Forwarded-For/-Proto are honoured (comma-separated).
+# Empty trusts nobody: a client could otherwise pick its own address and dodge per-IP limits.
+SERVER_FORWARDED_ALLOW_IPS = os.getenv("SERVER_FORWARDED_ALLOW_IPS", "")
+
+# BOOT
+# Defer Google sign-in and password hashing setup until first use
+LAZY_SUBSYSTEMS = os.getenv("LAZY_SUBSYSTEMS", "True").lower() == "true"
+# "startup" blocks readiness on index builds, "background" runs them after
+# boot, "off" leaves them to `python -m Application.migrations indexes`. The
+# unique indexes writes rely on are built before serving in every mode
+INDEX_BUILD_MODE = os.getenv("INDEX_BUILD_MODE", "background").lower()
+
+# MONGODB CLIENT
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+# Tried in order; ones whose Python package is missing are skipped
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+# Per-collection read preference, e.g. "chat_messages=secondaryPreferred,dashboards=nearest"
+MONGO_READ_PREFERENCES = os.getenv("MONGO_READ_PREFERENCES", "")
+
 # EMAIL CONFIGURATION
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
 EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
 EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "True").lower() == "true"
+
+# PASSWORD HASHING
+HASH_POOL_KIND = os.getenv("HASH_POOL_KIND", "thread").lower()  # "thread" or "process"
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(os.cpu_count() or 1)))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "64"))
+
+# VERIFICATION CODES
+CODE_HMAC_KEY = os.getenv("CODE_HMAC_KEY", SECRET_KEY)
+CODE_MAX_ATTEMPTS = int(os.getenv("CODE_MAX_ATTEMPTS", "5"))
+
+# RATE LIMITING (bcrypt-backed endpoints)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+# "memory://" per process, or a redis:// URL to share counters between instances
+RATE_LIMIT_BACKEND_URL = os.getenv("RATE_LIMIT_BACKEND_URL", "memory://")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_TRUSTED_HOPS = int(os.getenv("RATE_LIMIT_TRUSTED_HOPS", "0"))  # proxies appending X-Forwarded-For
+RATE_LIMIT_WINDOW_SECONDS = float(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "60"))
+RATE_LIMIT_PER_IP = int(os.getenv("RATE_LIMIT_PER_IP", "30"))
+RATE_LIMIT_PER_EMAIL = int(os.getenv("RATE_LIMIT_PER_EMAIL", "10"))
+RATE_LIMIT_GLOBAL = int(os.getenv("RATE_LIMIT_GLOBAL", "600"))
+RATE_LIMIT_FAILURES_PER_EMAIL = int(os.getenv("RATE_LIMIT_FAILURES_PER_EMAIL", "20"))  # per email and client IP
+RATE_LIMIT_FAILURE_WINDOW_SECONDS = float(os.getenv("RATE_LIMIT_FAILURE_WINDOW_SECONDS", "900"))
+
+# TOKEN REVOCATION
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+REVOCATION_LRU_SIZE = int(os.getenv("REVOCATION_LRU_SIZE", "10000"))
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "2"))
+REVOCATION_USE_CHANGE_STREAM = os.getenv("REVOCATION_USE_CHANGE_STREAM", "True").lower() == "true"
+
+# USER PROFILE CACHE
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+# Put id/names into access tokens so get_current_user can skip the database
+JWT_EMBED_PROFILE = os.getenv("JWT_EMBED_PROFILE", "False").lower() == "true"
+
+# CROSS-WORKER CACHE INVALIDATION
+CACHE_BUS_SYNC_SECONDS = float(os.getenv("CACHE_BUS_SYNC_SECONDS", "1"))
+CACHE_BUS_USE_CHANGE_STREAM = os.getenv(
+    "CACHE_BUS_USE_CHANGE_STREAM", os.getenv("REVOCATION_USE_CHANGE_STREAM", "True")
+).lower() == "true"
+
+# OUTBOUND MAIL QUEUE
+MAIL_FROM = os.getenv("MAIL_FROM", EMAIL_HOST_USER)
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", "20"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "5"))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv("MAIL_RETRY_BASE_SECONDS", "5"))
+MAIL_POLL_SECONDS = float(os.getenv("MAIL_POLL_SECONDS", "5"))
+MAIL_LEASE_SECONDS = int(os.getenv("MAIL_LEASE_SECONDS", "120"))
+MAIL_CONNECTION_IDLE_SECONDS = float(os.getenv("MAIL_CONNECTION_IDLE_SECONDS", "60"))
+
+# CHAT FAN-OUT
+# "memory://" for a single process, or a redis:// URL to share fan-out between workers
+CHAT_BROKER_URL = os.getenv("CHAT_BROKER_URL", "memory://")
+
+# GOOGLE SIGN-IN
+GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "")  # when set, id_token audience must match
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+
+# SERIALIZATION
+# Hot routes return pre-shaped documents without response_model revalidation
+TRUSTED_OUTPUT = os.getenv("TRUSTED_OUTPUT", "True").lower() == "true"
+
+# EXPORTS
+# Documents fetched per cursor batch and written per streamed chunk
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+
+# IDEMPOTENCY
+# Responses to create requests carrying an Idempotency-Key are replayed for this long
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# A worker that dies mid-request holds its key at most this long
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "30"))
+# How long a duplicate waits for the first request before answering 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+
+# ACCOUNT DELETION
+# Dependent documents removed or detached per batch by the background worker
+DELETION_BATCH_SIZE = int(os.getenv("DELETION_BATCH_SIZE", "200"))
+DELETION_BATCH_PAUSE_SECONDS = float(os.getenv("DELETION_BATCH_PAUSE_SECONDS", "0.05"))
+# Back off to DELETION_BUSY_PAUSE_SECONDS while this many requests are in flight
+DELETION_BUSY_REQUESTS = int(os.getenv("DELETION_BUSY_REQUESTS", "20"))
+DELETION_BUSY_PAUSE_SECONDS = float(os.getenv("DELETION_BUSY_PAUSE_SECONDS", "1"))
+DELETION_POLL_SECONDS = float(os.getenv("DELETION_POLL_SECONDS", "10"))
+DELETION_LEASE_SECONDS = int(os.getenv("DELETION_LEASE_SECONDS", "60"))
+
+# INSTRUMENTATION
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "True").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")  # when set, /metrics requires this bearer token
@@ -1,27 +1,136 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import ASCENDING
+from pymongo import ASCENDING, DESCENDING, TEXT, ReadPreference
+import asyncio
+import importlib.util
+from datetime import datetime
 import os
+import time
+
+from Application.config import (
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS, MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS, MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    MONGO_COMPRESSORS, MONGO_READ_PREFERENCES,
+)
+from Application.instrumentation import mongo_listener, pool_monitor
 
 MONGO_DETAILS = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 DB_NAME = os.getenv("MONGO_DB_NAME", "auth_db")
 
-client = AsyncIOMotorClient(MONGO_DETAILS)
+# Bump whenever init_db gains or changes an index so running deployments re-apply it
+SCHEMA_VERSION = 8
+
+# Wire compressors and the package each one needs (zlib ships with Python)
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+_READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+
+def available_compressors(names: str) -> list[str]:
+    compressors = []
+    for name in (n.strip() for n in names.split(",")):
+        module = _COMPRESSOR_MODULES.get(name)
+        if module and importlib.util.find_spec(module) is not None:
+            compressors.append(name)
+    return compressors
+
+def parse_read_preferences(spec: str) -> dict:
+    preferences = {}
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        name, _, mode = entry.partition("=")
+        if mode.strip() not in _READ_PREFERENCES:
+            raise ValueError(f"Unknown read preference in MONGO_READ_PREFERENCES: {entry!r}")
+        preferences[name.strip()] = _READ_PREFERENCES[mode.strip()]
+    return preferences
+
+
+_compressors = available_compressors(MONGO_COMPRESSORS)
+_read_preferences = parse_read_preferences(MONGO_READ_PREFERENCES)
+
+# connect=False: no sockets or monitor threads until the lifespan warms the pool
+client = AsyncIOMotorClient(
+    MONGO_DETAILS,
+    connect=False,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS or None,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+    event_listeners=[mongo_listener, pool_monitor],
+    **({"compressors": ",".join(_compressors)} if _compressors else {}),
+)
 db = client[DB_NAME]
 
-users_collection = db.get_collection("users")
-token_blacklist_collection = db.get_collection("token_blacklist")
-user_code_collection = db.get_collection("user_code")
-dashboards_collection = db.get_collection("dashboards")
-chats_collection = db.get_collection("chats")
-transactional_groups_collection = db.get_collection("transactional_groups")
+def _with_read_preference(name: str):
+    preference = _read_preferences.get(name)
+    if preference is None:
+        return db.get_collection(name)
+    return db.get_collection(name, read_preference=preference)
+
+users_collection = _with_read_preference("users")
+token_blacklist_collection = _with_read_preference("token_blacklist")
+user_code_collection = _with_read_preference("user_code")
+dashboards_collection = _with_read_preference("dashboards")
+chats_collection = _with_read_preference("chats")
+transactional_groups_collection = _with_read_preference("transactional_groups")
+mail_outbox_collection = _with_read_preference("mail_outbox")
+chat_messages_collection = _with_read_preference("chat_messages")
+cache_invalidations_collection = _with_read_preference("cache_invalidations")
+ledger_entries_collection = _with_read_preference("ledger_entries")
+idempotency_keys_collection = _with_read_preference("idempotency_keys")
+deletion_jobs_collection = _with_read_preference("deletion_jobs")
+schema_meta_collection = _with_read_preference("schema_meta")
+
 
-async def init_db():
+# --- Lifecycle ---
+async def warm_up():
+    """Open the pool before traffic: one ping checks the server, then
+    ``minPoolSize`` concurrent pings leave that many connections ready."""
+    started = time.perf_counter()
+    await db.command("ping")
+    await asyncio.gather(*(db.command("ping") for _ in range(max(0, MONGO_MIN_POOL_SIZE - 1))))
+    print(f"[DB INIT] Pool warmed in {(time.perf_counter() - started) * 1000:.0f} ms "
+          f"(compressors: {', '.join(_compressors) or 'none'})")
+
+async def close_db():
+    client.close()
+
+async def ping() -> float:
+    """Round-trip time of a ping in seconds; raises if the server is unreachable."""
+    started = time.perf_counter()
+    await db.command("ping")
+    return time.perf_counter() - started
+
+def pool_stats() -> dict:
+    return {**pool_monitor.stats(), "max_pool_size": MONGO_MAX_POOL_SIZE, "min_pool_size": MONGO_MIN_POOL_SIZE}
+
+
+# --- Indexes ---
+async def _schema_current() -> bool:
+    marker = await schema_meta_collection.find_one({"_id": "indexes"})
+    return bool(marker) and marker.get("version", 0) >= SCHEMA_VERSION
+
+async def _drop_conflicting_indexes():
+    """Drop legacy unique indexes that make current writes fail."""
     # 🔹 Remove old username index if it exists
-    indexes = await users_collection.index_information()
-    if "username_1" in indexes:
+    if "username_1" in await users_collection.index_information():
         print("[DB INIT] Removing old 'username_1' index to avoid duplicate key errors.")
         await users_collection.drop_index("username_1")
 
+    # 🔹 Unique on email alone: codes for a second purpose would never insert
+    if "email_1" in await user_code_collection.index_information():
+        print("[DB INIT] Replacing 'email_1' with a per-purpose code index.")
+        await user_code_collection.drop_index("email_1")
+        await user_code_collection.delete_many({"purpose": {"$exists": False}})
+
+async def _users_unique_indexes():
     # 🔹 Ensure unique email (case-insensitive)
     await users_collection.create_index(
         [("email", ASCENDING)],
@@ -29,6 +138,130 @@ async def init_db():
         collation={"locale": "en", "strength": 2}
     )
 
-    # 🔹 Prevent duplicate verification code entries per email
-    await user_code_collection.create_index([("email", ASCENDING)], unique=True)
-    await dashboards_collection.create_index([("owner_id", ASCENDING)])
+async def _user_code_unique_indexes():
+    # 🔹 One verification code per email and purpose (issue_code upserts on it)
+    await user_code_collection.create_index([("email", ASCENDING), ("purpose", ASCENDING)], unique=True)
+
+async def _token_blacklist_unique_indexes():
+    # 🔹 Revocation entries are keyed by jti/hash
+    await token_blacklist_collection.create_index(
+        [("key", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"key": {"$exists": True}}
+    )
+
+async def ensure_unique_indexes(force: bool = False) -> bool:
+    """Build the unique indexes whose DuplicateKeyError keeps accounts, codes
+    and revocations single. Runs before serving in every INDEX_BUILD_MODE;
+    a single read once the schema marker is current. The rest of init_db
+    only speeds queries up and may be deferred."""
+    if not force and await _schema_current():
+        return False
+    await _drop_conflicting_indexes()
+    await asyncio.gather(
+        _users_unique_indexes(), _user_code_unique_indexes(), _token_blacklist_unique_indexes()
+    )
+    return True
+
+async def _user_code_indexes():
+    # 🔹 Expired codes clean themselves up
+    await user_code_collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+
+async def _dashboards_indexes():
+    # 🔹 Owned/shared listings page newest-first by _id within each branch
+    if "owner_id_1" in await dashboards_collection.index_information():
+        await dashboards_collection.drop_index("owner_id_1")
+    await dashboards_collection.create_index([("owner_id", ASCENDING), ("_id", DESCENDING)])
+    await dashboards_collection.create_index([("shared_with", ASCENDING), ("_id", DESCENDING)])
+    # 🔹 Account and card writes address a single dashboard
+    await dashboards_collection.create_index([("dashboard_id", ASCENDING)], unique=True)
+    # 🔹 Search: title matches outrank description matches
+    await dashboards_collection.create_index(
+        [("title", TEXT), ("description", TEXT)], weights={"title": 3, "description": 1}, name="search_text"
+    )
+
+async def _transactional_groups_indexes():
+    await transactional_groups_collection.create_index([("owner_id", ASCENDING), ("_id", DESCENDING)])
+    await transactional_groups_collection.create_index([("shared_with", ASCENDING), ("_id", DESCENDING)])
+    await transactional_groups_collection.create_index([("transactional_group_id", ASCENDING)], unique=True)
+    await transactional_groups_collection.create_index(
+        [("title", TEXT), ("description", TEXT)], weights={"title": 3, "description": 1}, name="search_text"
+    )
+
+async def _token_blacklist_indexes():
+    # 🔹 Revocation entries expire with the token and are synced by revocation time
+    await token_blacklist_collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    await token_blacklist_collection.create_index([("revoked_at", ASCENDING)])
+
+async def _mail_outbox_indexes():
+    # 🔹 Mail outbox: workers claim pending messages in due order
+    await mail_outbox_collection.create_index([("status", ASCENDING), ("next_attempt_at", ASCENDING)])
+    await mail_outbox_collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+
+async def _chat_indexes():
+    # 🔹 Chat messages live outside the chat document, read newest-first by keyset
+    await chat_messages_collection.create_index([("message_id", ASCENDING)], unique=True)
+    await chat_messages_collection.create_index(
+        [("chat_id", ASCENDING), ("time_stamp", ASCENDING), ("message_id", ASCENDING)]
+    )
+    # 🔹 Search: chat_id trails the text key so access scoping is checked in the index
+    await chat_messages_collection.create_index([("text", TEXT), ("chat_id", ASCENDING)], name="search_text")
+    await chats_collection.create_index([("chat_id", ASCENDING)], unique=True)
+    await chats_collection.create_index([("transactional_group_id", ASCENDING)])
+    # 🔹 Inbox: a participant's chats by latest activity, keyset-paged
+    await chats_collection.create_index(
+        [("participants.user_id", ASCENDING), ("last_activity_at", DESCENDING), ("chat_id", DESCENDING)]
+    )
+
+async def _cache_invalidations_indexes():
+    # 🔹 Cross-worker cache invalidations are polled by time and expire after an hour
+    await cache_invalidations_collection.create_index([("at", ASCENDING)])
+    await cache_invalidations_collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+
+async def _ledger_indexes():
+    # 🔹 Ledger pages are read newest-first by keyset within a group
+    await ledger_entries_collection.create_index([("expense_id", ASCENDING)], unique=True)
+    await ledger_entries_collection.create_index(
+        [("transactional_group_id", ASCENDING), ("created_at", DESCENDING), ("expense_id", DESCENDING)]
+    )
+    # 🔹 Only interrupted writes carry a pending op; reconciliation scans just those
+    await ledger_entries_collection.create_index(
+        [("transactional_group_id", ASCENDING), ("pending_since", ASCENDING)],
+        partialFilterExpression={"pending_op": {"$type": "string"}}
+    )
+
+async def _idempotency_indexes():
+    # 🔹 Stored responses to keyed create requests expire after IDEMPOTENCY_TTL_SECONDS
+    await idempotency_keys_collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+
+async def _deletion_jobs_indexes():
+    # 🔹 Deletion jobs: workers claim pending or lease-expired jobs; finished ones expire
+    await deletion_jobs_collection.create_index([("status", ASCENDING), ("lease_until", ASCENDING)])
+    await deletion_jobs_collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+
+INDEX_BUILDERS = (
+    _user_code_indexes, _dashboards_indexes, _transactional_groups_indexes,
+    _token_blacklist_indexes, _mail_outbox_indexes, _chat_indexes, _cache_invalidations_indexes,
+    _ledger_indexes, _idempotency_indexes, _deletion_jobs_indexes,
+)
+
+async def init_db(force: bool = False):
+    """Create indexes unless the schema marker says this version already did.
+
+    Every step is idempotent, so concurrent boots of several instances are
+    safe; collections are handled concurrently, each one's steps in order.
+    """
+    if not force and await _schema_current():
+        return False
+
+    started = time.perf_counter()
+    await ensure_unique_indexes(force=True)
+    await asyncio.gather(*(builder() for builder in INDEX_BUILDERS))
+    await schema_meta_collection.update_one(
+        {"_id": "indexes"},
+        {"$max": {"version": SCHEMA_VERSION}, "$set": {"applied_at": datetime.utcnow()}},
+        upsert=True
+    )
+    print(f"[DB INIT] Indexes at schema version {SCHEMA_VERSION} "
+          f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+    return True
@@ -0,0 +1,317 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from Application.config import (
+    DELETION_BATCH_SIZE, DELETION_BATCH_PAUSE_SECONDS, DELETION_BUSY_REQUESTS,
+    DELETION_BUSY_PAUSE_SECONDS, DELETION_POLL_SECONDS, DELETION_LEASE_SECONDS,
+)
+from Application.db import (
+    deletion_jobs_collection, users_collection, user_code_collection, dashboards_collection,
+    transactional_groups_collection, chats_collection, chat_messages_collection, ledger_entries_collection,
+)
+from Application.instrumentation import metrics
+from Application.revocation import revocation_cache
+from Application import versioning
+
+# Finished jobs are kept this long for auditing
+JOB_RETENTION = timedelta(days=7)
+# Longest backoff before a failing job is retried
+MAX_RETRY_SECONDS = 3600
+
+
+async def _delete_batch(collection, query: dict, limit: int) -> int:
+    """Delete at most ``limit`` matching documents."""
+    ids = [doc["_id"] async for doc in collection.find(query, {"_id": 1}).limit(limit)]
+    if not ids:
+        return 0
+    result = await collection.delete_many({"_id": {"$in": ids}})
+    return result.deleted_count
+
+
+class DeletionJobs:
+    """Cascade deletion of a user's data, run by a background worker.
+
+    ``enqueue`` records a job in ``deletion_jobs``; the account itself is
+    removed by the caller. A worker claims jobs under a lease and walks
+    their phases in order, each step touching at most ``batch_size``
+    documents and recording its count in ``progress``. A phase ends when a
+    step finds nothing left, so an interrupted job resumes where it
+    stopped once the lease expires. Steps pause between batches, longer
+    while the process is busy serving requests.
+    """
+
+    def __init__(self, collection, batch_size: int, pause_seconds: float, busy_requests: int,
+                 busy_pause_seconds: float, poll_seconds: float, lease_seconds: int):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.busy_requests = busy_requests
+        self.busy_pause_seconds = busy_pause_seconds
+        self.poll_seconds = poll_seconds
+        self.lease = timedelta(seconds=lease_seconds)
+        self.worker_id = uuid.uuid4().hex
+        self.phases: Tuple[Tuple[str, Callable[[dict], Awaitable[int]]], ...] = (
+            ("account", self._account),
+            ("codes", self._codes),
+            ("dashboards", self._owned_dashboards),
+            ("dashboard_shares", self._dashboard_shares),
+            ("groups", self._owned_groups),
+            ("group_shares", self._group_shares),
+            ("chats", self._chats),
+            ("orphan_chats", self._orphan_chats),
+        )
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # Metrics
+        self.completed = 0
+        self.documents = 0
+        self.throttled = 0
+        self.errors = 0
+
+    async def enqueue(self, user_id: str, email: str) -> str:
+        """Record a deletion job for the account; enqueuing twice is a no-op."""
+        now = datetime.utcnow()
+        try:
+            await self.collection.insert_one({
+                "_id": user_id,
+                "email": email,
+                "status": "pending",
+                "phase": self.phases[0][0],
+                "progress": {},
+                "orphan_chats": [],
+                "created_at": now,
+                "updated_at": now,
+            })
+        except DuplicateKeyError:
+            pass
+        self._wakeup.set()
+        return user_id
+
+    # --- Phases: each returns the number of documents it touched ---
+    async def _account(self, job: dict) -> int:
+        # Normally already gone: the endpoint deletes it before enqueuing returns
+        result = await users_collection.delete_one({"_id": ObjectId(job["_id"]), "email": job["email"]})
+        if result.deleted_count:
+            await revocation_cache.revoke_subject(job["email"])
+        return result.deleted_count
+
+    async def _codes(self, job: dict) -> int:
+        # Codes issued since belong to whoever signs up with the address next
+        emails = list({job["email"], job["email"].strip().lower()})
+        result = await user_code_collection.delete_many(
+            {"email": {"$in": emails}, "created_at": {"$lt": job["created_at"]}}
+        )
+        return result.deleted_count
+
+    async def _owned_dashboards(self, job: dict) -> int:
+        docs = await dashboards_collection.find(
+            {"owner_id": job["_id"]}, {"_id": 1, "shared_with": 1}
+        ).limit(self.batch_size).to_list(length=self.batch_size)
+        if not docs:
+            return 0
+        result = await dashboards_collection.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+        await versioning.bump_collection_version(
+            versioning.DASHBOARDS, (uid for d in docs for uid in d.get("shared_with", []))
+        )
+        return result.deleted_count
+
+    async def _detach_shares(self, collection, kind: str, job: dict) -> int:
+        docs = await collection.find(
+            {"shared_with": job["_id"]}, {"_id": 1, "owner_id": 1, "shared_with": 1}
+        ).limit(self.batch_size).to_list(length=self.batch_size)
+        if not docs:
+            return 0
+        result = await collection.update_many(
+            {"_id": {"$in": [d["_id"] for d in docs]}},
+            {"$pull": {"shared_with": job["_id"]}, "$inc": versioning.BUMP}
+        )
+        await versioning.bump_collection_version(
+            kind, (uid for d in docs for uid in [d["owner_id"], *d.get("shared_with", [])] if uid != job["_id"])
+        )
+        return result.modified_count
+
+    async def _dashboard_shares(self, job: dict) -> int:
+        return await self._detach_shares(dashboards_collection, versioning.DASHBOARDS, job)
+
+    async def _owned_groups(self, job: dict) -> int:
+        """One group at a time: its expenses, then its messages, then the chat and group."""
+        group = await transactional_groups_collection.find_one(
+            {"owner_id": job["_id"]}, {"transactional_group_id": 1, "chat_id": 1, "shared_with": 1},
+            sort=[("_id", ASCENDING)]
+        )
+        if group is None:
+            return 0
+        group_id = group["transactional_group_id"]
+        removed = await _delete_batch(ledger_entries_collection, {"transactional_group_id": group_id}, self.batch_size)
+        if removed:
+            return removed
+        if group.get("chat_id"):
+            removed = await _delete_batch(chat_messages_collection, {"chat_id": group["chat_id"]}, self.batch_size)
+            if removed:
+                return removed
+            await chats_collection.delete_one({"chat_id": group["chat_id"]})
+        await transactional_groups_collection.delete_one({"_id": group["_id"]})
+        await versioning.bump_collection_version(versioning.TRANSACTIONAL_GROUPS, group.get("shared_with", []))
+        return 1
+
+    async def _group_shares(self, job: dict) -> int:
+        return await self._detach_shares(transactional_groups_collection, versioning.TRANSACTIONAL_GROUPS, job)
+
+    async def _chats(self, job: dict) -> int:
+        """Leave every remaining chat; chats left with nobody are queued for removal."""
+        user_id = job["_id"]
+        chats = await chats_collection.find(
+            {"participants.user_id": user_id}, {"_id": 1, "chat_id": 1, "participants.user_id": 1}
+        ).limit(self.batch_size).to_list(length=self.batch_size)
+        if not chats:
+            return 0
+        orphans = [c["chat_id"] for c in chats if all(p["user_id"] == user_id for p in c["participants"])]
+        if orphans:
+            await self.collection.update_one({"_id": user_id}, {"$addToSet": {"orphan_chats": {"$each": orphans}}})
+        result = await chats_collection.update_many(
+            {"_id": {"$in": [c["_id"] for c in chats]}},
+            {
+                "$pull": {"participants": {"user_id": user_id}},
+                "$unset": {f"read_state.{user_id}": ""},
+                "$inc": versioning.BUMP,
+            }
+        )
+        return result.modified_count
+
+    async def _orphan_chats(self, job: dict) -> int:
+        if not job.get("orphan_chats"):
+            return 0
+        chat_id = job["orphan_chats"][0]
+        removed = await _delete_batch(chat_messages_collection, {"chat_id": chat_id}, self.batch_size)
+        if removed:
+            return removed
+        # Someone may have joined since; only a still-empty chat goes
+        await chats_collection.delete_one({"chat_id": chat_id, "participants": {"$size": 0}})
+        await self.collection.update_one({"_id": job["_id"]}, {"$pull": {"orphan_chats": chat_id}})
+        return 1
+
+    # --- Worker ---
+    async def _claim(self) -> dict | None:
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "pending"},
+                {"status": "running", "lease_until": {"$lt": now}},
+            ]},
+            {"$set": {"status": "running", "lease_until": now + self.lease, "lease_owner": self.worker_id}},
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _record(self, job: dict, phase: str, count: int, next_phase: str | None) -> dict | None:
+        """Persist a step and renew the lease; None when another worker took the job over."""
+        now = datetime.utcnow()
+        update: Dict = {"$set": {"updated_at": now, "lease_until": now + self.lease}}
+        if count:
+            update["$inc"] = {f"progress.{phase}": count}
+        if next_phase is not None:
+            update["$set"]["phase"] = next_phase
+        return await self.collection.find_one_and_update(
+            {"_id": job["_id"], "lease_owner": self.worker_id}, update,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _finish(self, job: dict):
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"_id": job["_id"], "lease_owner": self.worker_id},
+            {"$set": {"status": "done", "finished_at": now, "updated_at": now, "expires_at": now + JOB_RETENTION},
+             "$unset": {"lease_until": "", "lease_owner": ""}}
+        )
+        self.completed += 1
+        print(f"[DELETION] Removed data of user {job['_id']}: {job.get('progress', {})}")
+
+    async def _record_error(self, job: dict, error: Exception):
+        """Keep the error on the job and hand it back for a retry after a backoff."""
+        now = datetime.utcnow()
+        delay = min(self.poll_seconds * 2 ** job.get("attempts", 0), MAX_RETRY_SECONDS)
+        await self.collection.update_one(
+            {"_id": job["_id"], "lease_owner": self.worker_id},
+            {"$set": {"last_error": f"{type(error).__name__}: {error}", "failed_at": now,
+                      "lease_until": now + timedelta(seconds=delay)},
+             "$inc": {"attempts": 1},
+             "$unset": {"lease_owner": ""}}
+        )
+
+    def _pause(self) -> float:
+        if metrics.gauges.get("http_requests_in_flight", 0) >= self.busy_requests:
+            self.throttled += 1
+            return self.busy_pause_seconds
+        return self.pause_seconds
+
+    async def _process(self, job: dict):
+        names: List[str] = [name for name, _ in self.phases]
+        steps = dict(self.phases)
+        while job is not None:
+            phase = job["phase"]
+            if phase not in steps:
+                await self._finish(job)
+                return
+            count = await steps[phase](job)
+            self.documents += count
+            next_phase = None
+            if count == 0:
+                index = names.index(phase) + 1
+                next_phase = names[index] if index < len(names) else "done"
+            job = await self._record(job, phase, count, next_phase)
+            await asyncio.sleep(self._pause())
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+                if job is not None:
+                    try:
+                        await self._process(job)
+                    except Exception as e:
+                        self.errors += 1
+                        print(f"[DELETION] Job {job['_id']} failed: {type(e).__name__}: {e}")
+                        await self._record_error(job, e)
+                    continue
+            except Exception as e:
+                # Never let the worker die: pending jobs would wait for a restart
+                self.errors += 1
+                print(f"[DELETION] Worker error: {type(e).__name__}: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {"completed": self.completed, "documents": self.documents, "throttled": self.throttled, "errors": self.errors}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+deletion_jobs = DeletionJobs(
+    deletion_jobs_collection,
+    DELETION_BATCH_SIZE,
+    DELETION_BATCH_PAUSE_SECONDS,
+    DELETION_BUSY_REQUESTS,
+    DELETION_BUSY_PAUSE_SECONDS,
+    DELETION_POLL_SECONDS,
+    DELETION_LEASE_SECONDS,
+)
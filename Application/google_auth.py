@@ -0,0 +1,157 @@
+import asyncio
+import re
+import time
+from typing import Awaitable, Callable, Dict, Tuple
+
+from Application.config import GOOGLE_CLIENT_ID, GOOGLE_CERTS_URL
+from Application.instrumentation import timed
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+# Refresh this long before the advertised expiry so requests never wait on it
+REFRESH_MARGIN_SECONDS = 300
+# Floor for max-age and retry delay after a failed refresh
+MIN_TTL_SECONDS = 60
+CLOCK_SKEW_SECONDS = 10
+
+# A cert source returns ({key_id: PEM certificate}, max_age_seconds)
+CertSource = Callable[[], Awaitable[Tuple[Dict[str, str], float]]]
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class CertFetchError(Exception):
+    """Google's signing certs could not be fetched."""
+
+
+def parse_max_age(cache_control: str | None) -> float:
+    match = _MAX_AGE.search(cache_control or "")
+    return float(match.group(1)) if match else MIN_TTL_SECONDS
+
+
+class HTTPCertSource:
+    """Fetches Google's signing certs over a pooled ``requests`` session,
+    created (and ``requests`` imported) on the first fetch."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.session = None
+
+    def _fetch(self) -> Tuple[Dict[str, str], float]:
+        if self.session is None:
+            import requests
+            self.session = requests.Session()
+        response = self.session.get(self.url, timeout=10)
+        response.raise_for_status()
+        return response.json(), parse_max_age(response.headers.get("Cache-Control"))
+
+    async def __call__(self) -> Tuple[Dict[str, str], float]:
+        return await asyncio.to_thread(self._fetch)
+
+
+def _decode(token: str, certs: Dict[str, str], audience: str | None) -> dict:
+    # google-auth is only needed once someone signs in with Google
+    from google.auth import jwt as google_jwt
+    return google_jwt.decode(token, certs=certs, audience=audience,
+                             clock_skew_in_seconds=CLOCK_SKEW_SECONDS)
+
+
+class GoogleCertCache:
+    """Caches Google's id_token signing certs for their advertised max-age and
+    refreshes them in the background shortly before they expire."""
+
+    def __init__(self, source: CertSource):
+        self.source = source
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._ttl = float(MIN_TTL_SECONDS)
+        self._fetched_at = float("-inf")
+        self._lock = asyncio.Lock()
+        # Set once the refresh loop's first fetch has finished, successfully or not
+        self._first_fetch = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # Metrics
+        self.fetches = 0
+        self.fetch_failures = 0
+
+    async def refresh(self) -> Dict[str, str]:
+        async with self._lock:
+            self.fetches += 1
+            try:
+                certs, max_age = await self.source()
+            except Exception as e:
+                self.fetch_failures += 1
+                raise CertFetchError(str(e)) from e
+            self._certs = certs
+            self._fetched_at = time.monotonic()
+            self._ttl = max(max_age, MIN_TTL_SECONDS)
+            self._expires_at = self._fetched_at + self._ttl
+            return certs
+
+    async def get_certs(self) -> Dict[str, str]:
+        if self._certs and time.monotonic() < self._expires_at:
+            return self._certs
+        async with self._lock:
+            # Another request may have refreshed while we waited
+            if self._certs and time.monotonic() < self._expires_at:
+                return self._certs
+        return await self.refresh()
+
+    async def _refresh_loop(self):
+        while True:
+            if self._certs:
+                # Short max-ages would leave no time before the margin: never refetch back-to-back
+                remaining = self._expires_at - time.monotonic() - REFRESH_MARGIN_SECONDS
+                await asyncio.sleep(max(remaining, self._ttl / 2, MIN_TTL_SECONDS))
+            error = None
+            try:
+                await self.refresh()
+            except CertFetchError as e:
+                error = e
+            self._first_fetch.set()
+            if error is not None:
+                print(f"[GOOGLE AUTH] Cert refresh failed: {error}")
+                await asyncio.sleep(MIN_TTL_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def verify(self, token: str, audience: str | None = None) -> dict:
+        """Verify a Google id_token locally; raises ValueError when invalid."""
+        # With lazy boot the refresh loop starts with the first Google sign-in;
+        # wait for its first fetch rather than fetching the certs a second time
+        self.start()
+        if not self._certs:
+            await self._first_fetch.wait()
+        certs = await self.get_certs()
+        try:
+            claims = await asyncio.to_thread(_decode, token, certs, audience)
+        except ValueError as e:
+            # Unknown key id: Google may have rotated keys before our copy
+            # expired. Refetch at most once a minute so bogus tokens can't
+            # turn into a stream of outbound requests.
+            if "Certificate for key id" not in str(e) or \
+                    time.monotonic() - self._fetched_at < MIN_TTL_SECONDS:
+                raise
+            certs = await self.refresh()
+            claims = await asyncio.to_thread(_decode, token, certs, audience)
+        if claims.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {claims.get('iss')}")
+        return claims
+
+
+google_cert_cache = GoogleCertCache(HTTPCertSource(GOOGLE_CERTS_URL))
+
+
+async def verify_google_id_token(token: str) -> dict:
+    with timed("google"):
+        return await google_cert_cache.verify(token, GOOGLE_CLIENT_ID or None)
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+
+from Application.config import HASH_POOL_KIND, HASH_POOL_WORKERS, HASH_QUEUE_LIMIT
+from Application.instrumentation import record
+
+# Hashing setup; passlib and the bcrypt backend load on first use
+_pwd_context = None
+
+def get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
+# --- Worker functions (module level so a process pool can pickle them) ---
+def _timed_hash(secret: str) -> tuple[str, float]:
+    started = time.perf_counter()
+    hashed = get_pwd_context().hash(secret)
+    return hashed, time.perf_counter() - started
+
+def _timed_verify(secret: str, hashed: str) -> tuple[bool, float]:
+    started = time.perf_counter()
+    try:
+        ok = get_pwd_context().verify(secret, hashed)
+    except ValueError:
+        # Unidentifiable hashes (e.g. Google accounts store "") never match
+        ok = False
+    return ok, time.perf_counter() - started
+
+
+class HashingService:
+    """Runs bcrypt off the event loop on a bounded thread or process pool.
+
+    At most ``max_pending`` calls may be queued or running at once; anything
+    beyond that is rejected with 503 so a login burst sheds load instead of
+    piling up latency for every other request on the worker.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 1, max_pending: int = 64):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown hash pool kind: {kind!r}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self._executor: Executor | None = None
+        self._pending = 0
+        # Metrics
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.hash_seconds_total = 0.0
+        self.hash_seconds_max = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        submitted = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, hash_seconds = await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._pending -= 1
+
+        wait_seconds = max(0.0, time.perf_counter() - submitted - hash_seconds)
+        record("bcrypt", hash_seconds)
+        record("bcrypt_wait", wait_seconds)
+        self.completed += 1
+        self.wait_seconds_total += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+        self.hash_seconds_total += hash_seconds
+        self.hash_seconds_max = max(self.hash_seconds_max, hash_seconds)
+        return result
+
+    async def hash(self, secret: str) -> str:
+        return await self._run(_timed_hash, secret)
+
+    async def verify(self, secret: str, hashed: str) -> bool:
+        return await self._run(_timed_verify, secret, hashed)
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_max": self.wait_seconds_max,
+            "hash_seconds_total": self.hash_seconds_total,
+            "hash_seconds_max": self.hash_seconds_max,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_service = HashingService(HASH_POOL_KIND, HASH_POOL_WORKERS, HASH_QUEUE_LIMIT)
@@ -0,0 +1,303 @@
+import asyncio
+import hashlib
+import json
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from cachetools import TTLCache
+from fastapi import Request
+from jose import JWTError, jwt
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from Application.config import (
+    JWT_SECRET_KEY, ALGORITHM, IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_CACHE_SIZE,
+    IDEMPOTENCY_LEASE_SECONDS, IDEMPOTENCY_WAIT_SECONDS,
+)
+from Application.db import idempotency_keys_collection
+from Application.rate_limit import rate_limiter
+
+MAX_KEY_LENGTH = 255
+# Requests and responses larger than this are executed normally and not stored
+MAX_BODY_BYTES = 256 * 1024
+POLL_INTERVAL = 0.1
+# Besides 2xx, only outcomes the same request body always gets again are
+# stored; anything else (409, 429, 5xx) releases the key for a retry
+STORED_ERROR_STATUSES = {422}
+# Added on the way out of every response, so never stored
+UNSTORED_HEADERS = {b"content-length", b"date", b"server", b"server-timing", b"set-cookie"}
+
+# Create endpoints: each blindly inserts, so a retried request would duplicate
+CREATE_ROUTES = (
+    r"/create-user",
+    r"/dashboard/create",
+    r"/dashboard/[^/]+/(bank-accounts|credit-cards)",
+    r"/transactional-group/create",
+    r"/transactional-group/bulk-create",
+    r"/transactional-group/[^/]+/expenses",
+    r"/chat/create",
+    r"/chat/[^/]+/messages",
+)
+
+
+class IdempotencyStore:
+    """Completed responses by idempotency key: an in-process TTL+LRU cache in
+    front of the TTL-indexed ``idempotency_keys`` collection, which also
+    holds the lease that lets one worker execute a key at a time."""
+
+    def __init__(self, collection, ttl_seconds: int, cache_size: int, lease_seconds: int):
+        self.collection = collection
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.lease = timedelta(seconds=lease_seconds)
+        self.cache = TTLCache(maxsize=cache_size, ttl=ttl_seconds)
+        # Metrics
+        self.cache_hits = 0
+        self.stored_hits = 0
+        self.executed = 0
+        self.waits = 0
+        self.conflicts = 0
+
+    async def claim(self, key: str, fingerprint: str) -> Optional[dict]:
+        """Take the execution lease; returns the existing record when another
+        request holds it or already completed, None when the lease is ours."""
+        now = datetime.utcnow()
+        try:
+            await self.collection.insert_one({
+                "_id": key, "fingerprint": fingerprint, "status": "in_progress",
+                "locked_until": now + self.lease, "expires_at": now + self.ttl,
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+        # Take over a lease whose holder died without completing or releasing it
+        taken = await self.collection.find_one_and_update(
+            {"_id": key, "fingerprint": fingerprint, "status": "in_progress", "locked_until": {"$lt": now}},
+            {"$set": {"locked_until": now + self.lease}}
+        )
+        if taken:
+            return None
+        return await self.collection.find_one({"_id": key}) or {"fingerprint": fingerprint, "status": "in_progress"}
+
+    async def complete(self, key: str, response: dict):
+        """Store ``{"status", "headers", "body", "fingerprint"}`` for replay."""
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {"status": "completed", "response": response}, "$unset": {"locked_until": ""}}
+        )
+        self.cache[key] = response
+
+    async def release(self, key: str):
+        """Drop an unfinished claim so a retry executes again."""
+        await self.collection.delete_one({"_id": key, "status": "in_progress"})
+
+    def stats(self) -> dict:
+        return {
+            "cache_size": len(self.cache), "cache_hits": self.cache_hits, "stored_hits": self.stored_hits,
+            "executed": self.executed, "waits": self.waits, "conflicts": self.conflicts,
+        }
+
+
+idempotency_store = IdempotencyStore(
+    idempotency_keys_collection, IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_LEASE_SECONDS
+)
+
+
+def _principal(scope, headers: Dict[bytes, bytes]) -> Optional[str]:
+    """Whose key space the request uses: the verified token subject, or the
+    client address without a token. None lets the app reject a bad token."""
+    authorization = headers.get(b"authorization")
+    if not authorization:
+        return "anonymous:" + rate_limiter.client_ip(Request(scope))
+    scheme, _, token = authorization.decode("latin-1").partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    try:
+        return jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+
+async def _send_stored(send, response: dict):
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in response["headers"]]
+    headers.append((b"content-length", str(len(response["body"])).encode()))
+    headers.append((b"idempotent-replayed", b"true"))
+    await send({"type": "http.response.start", "status": response["status"], "headers": headers})
+    await send({"type": "http.response.body", "body": response["body"]})
+
+
+async def _send_error(send, status: int, detail: str, retry_after: Optional[int] = None):
+    body = json.dumps({"detail": detail}).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if retry_after:
+        headers.append((b"retry-after", str(retry_after).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """Pure ASGI middleware honouring ``Idempotency-Key`` on create routes.
+
+    The first request with a key executes and its response (if 2xx or 422)
+    is stored for IDEMPOTENCY_TTL_SECONDS; retries with the same key and body
+    get that response replayed without reaching the route. Duplicates that
+    arrive while the first is still running wait for it: in-process on a
+    shared future, across workers by polling the stored record. Reusing a
+    key with a different body is a 422.
+    """
+
+    def __init__(self, app, store: IdempotencyStore = idempotency_store, routes: Iterable[str] = CREATE_ROUTES):
+        self.app = app
+        self.store = store
+        self.routes = re.compile("|".join(f"(?:{route})" for route in routes) + "$")
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not self.routes.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        raw_key = headers.get(b"idempotency-key")
+        principal = _principal(scope, headers) if raw_key else None
+        if not raw_key or principal is None:
+            await self.app(scope, receive, send)
+            return
+        if len(raw_key) > MAX_KEY_LENGTH:
+            await _send_error(send, 400, f"Idempotency-Key longer than {MAX_KEY_LENGTH} characters")
+            return
+
+        body, more = await self._read_body(receive)
+        if more:
+            # Too large to fingerprint cheaply: run it unprotected
+            await self.app(scope, self._replay(body, receive, more_body=True), send)
+            return
+
+        key = hashlib.sha256(b"\0".join([principal.encode(), scope["path"].encode(), raw_key])).hexdigest()
+        fingerprint = hashlib.sha256(body).hexdigest()
+        await self._handle(key, fingerprint, scope, self._replay(body, receive), send)
+
+    async def _handle(self, key: str, fingerprint: str, scope, receive, send):
+        deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            cached = self.store.cache.get(key)
+            if cached is not None:
+                self.store.cache_hits += 1
+                await self._replay_or_reject(cached, fingerprint, send)
+                return
+
+            pending = self._in_flight.get(key)
+            if pending is not None:
+                # Same process: wait on the first execution instead of polling Mongo
+                self.store.waits += 1
+                try:
+                    await asyncio.wait_for(asyncio.shield(pending), deadline - asyncio.get_running_loop().time())
+                except asyncio.TimeoutError:
+                    break
+                continue
+
+            try:
+                existing = await self.store.claim(key, fingerprint)
+            except PyMongoError as e:
+                print(f"[IDEMPOTENCY] Store unavailable, executing without protection: {e}")
+                await self.app(scope, receive, send)
+                return
+            if existing is None:
+                await self._execute(key, fingerprint, scope, receive, send)
+                return
+            if existing["fingerprint"] != fingerprint:
+                self.store.conflicts += 1
+                await _send_error(send, 422, "Idempotency-Key was already used with a different request")
+                return
+            if existing["status"] == "completed":
+                self.store.stored_hits += 1
+                self.store.cache[key] = existing["response"]
+                await _send_stored(send, existing["response"])
+                return
+
+            # Another worker is executing it
+            self.store.waits += 1
+            if asyncio.get_running_loop().time() >= deadline:
+                break
+            await asyncio.sleep(POLL_INTERVAL)
+
+        await _send_error(send, 409, "A request with this Idempotency-Key is still in progress", retry_after=1)
+
+    async def _replay_or_reject(self, response: dict, fingerprint: str, send):
+        if response.get("fingerprint") != fingerprint:
+            self.store.conflicts += 1
+            await _send_error(send, 422, "Idempotency-Key was already used with a different request")
+            return
+        await _send_stored(send, response)
+
+    async def _execute(self, key: str, fingerprint: str, scope, receive, send):
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        status = 500
+        response_headers: List[List[str]] = []
+        chunks: List[bytes] = []
+        size = 0
+
+        async def capture(message):
+            nonlocal status, response_headers, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = [
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in message.get("headers", []) if name.lower() not in UNSTORED_HEADERS
+                ]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                if size <= MAX_BODY_BYTES:
+                    chunks.append(message.get("body", b""))
+            await send(message)
+
+        stored = False
+        try:
+            self.store.executed += 1
+            await self.app(scope, receive, capture)
+            if (200 <= status < 300 or status in STORED_ERROR_STATUSES) and size <= MAX_BODY_BYTES:
+                await self.store.complete(key, {
+                    "status": status, "headers": response_headers,
+                    "body": b"".join(chunks), "fingerprint": fingerprint,
+                })
+                stored = True
+        except PyMongoError as e:
+            # The response already went out; only replay protection is lost
+            print(f"[IDEMPOTENCY] Could not store response: {e}")
+        finally:
+            if not stored:
+                try:
+                    await self.store.release(key)
+                except PyMongoError as e:
+                    print(f"[IDEMPOTENCY] Could not release key: {e}")
+            self._in_flight.pop(key, None)
+            future.set_result(None)
+
+    @staticmethod
+    async def _read_body(receive) -> tuple[bytes, bool]:
+        """Buffer the request body; ``more`` is True if it exceeded MAX_BODY_BYTES."""
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return b"".join(chunks), False
+            chunk = message.get("body", b"")
+            chunks.append(chunk)
+            size += len(chunk)
+            if not message.get("more_body", False):
+                return b"".join(chunks), False
+            if size > MAX_BODY_BYTES:
+                return b"".join(chunks), True
+
+    @staticmethod
+    def _replay(body: bytes, receive, more_body: bool = False):
+        """A ``receive`` that yields the buffered body, then defers to the original."""
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": more_body}
+            return await receive()
+        return replay
@@ -0,0 +1,171 @@
+"""Expense ledger for transactional groups.
+
+Amounts are integer cents. Each group document carries ``balances``
+(``{user_id: cents}``, positive means the member is owed money), kept up to
+date by ``$inc`` instead of re-scanning the ledger.
+
+An expense write touches two documents, so it runs as a small idempotent
+protocol rather than a transaction:
+
+1. the entry is written with ``pending_op`` and the balance ``pending_delta``;
+2. the group gets ``$inc`` of that delta and ``$push`` of the op id in one
+   update guarded by ``ledger_ops != op``, so an op can never apply twice;
+3. the entry's pending fields are cleared and the op id pulled again.
+
+A crash between steps leaves a pending entry that :func:`reconcile_group`
+finishes (or applies) on the next balance read. Every group write bumps the
+group ``version`` and its members' list version (see ``versioning``).
+"""
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from pymongo import ReturnDocument
+
+from Application import versioning
+from Application.db import ledger_entries_collection, transactional_groups_collection
+
+# Pending entries younger than this belong to a request that is still running
+RECONCILE_GRACE = timedelta(seconds=60)
+WRITTEN_GROUP = {"_id": 0, "version": 1, "owner_id": 1, "shared_with": 1}
+
+
+# --- Arithmetic ---
+def equal_split(amount_cents: int, user_ids: List[str]) -> Dict[str, int]:
+    """Split ``amount_cents`` evenly; leftover cents go to the first members."""
+    share, remainder = divmod(amount_cents, len(user_ids))
+    return {uid: share + (1 if i < remainder else 0) for i, uid in enumerate(user_ids)}
+
+def expense_delta(paid_by: str, amount_cents: int, splits: List[dict]) -> Dict[str, int]:
+    """Balance change of one expense: the payer is owed, each split member owes."""
+    delta = {paid_by: amount_cents}
+    for split in splits:
+        delta[split["user_id"]] = delta.get(split["user_id"], 0) - split["amount_cents"]
+    return {uid: cents for uid, cents in delta.items() if cents}
+
+def subtract(new: Dict[str, int], old: Dict[str, int]) -> Dict[str, int]:
+    delta = {uid: new.get(uid, 0) - old.get(uid, 0) for uid in set(new) | set(old)}
+    return {uid: cents for uid, cents in delta.items() if cents}
+
+def negate(delta: Dict[str, int]) -> Dict[str, int]:
+    return {uid: -cents for uid, cents in delta.items()}
+
+def entry_delta(entry: dict) -> Dict[str, int]:
+    return expense_delta(entry["paid_by"], entry["amount_cents"], entry["splits"])
+
+def settle(balances: Dict[str, int]) -> List[dict]:
+    """Greedy settlement: repeatedly pay the largest creditor from the largest
+    debtor. Needs at most ``members - 1`` transfers."""
+    creditors = [(-cents, uid) for uid, cents in balances.items() if cents > 0]
+    debtors = [(cents, uid) for uid, cents in balances.items() if cents < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append({"from_user_id": debtor, "to_user_id": creditor, "amount_cents": amount})
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+    return transfers
+
+
+# --- Balance updates ---
+async def _update_group(query: dict, update: dict) -> int | None:
+    """Apply ``update`` with a version bump; returns the new version, or None
+    when nothing matched. Every member's group list changes with it."""
+    update = {**update, "$inc": {**update.get("$inc", {}), **versioning.BUMP}}
+    # The document before the write: the queries test fields the updates change
+    group = await transactional_groups_collection.find_one_and_update(
+        query, update, projection=WRITTEN_GROUP, return_document=ReturnDocument.BEFORE
+    )
+    if group is None:
+        return None
+    await versioning.bump_collection_version(
+        versioning.TRANSACTIONAL_GROUPS, [group["owner_id"], *group.get("shared_with", [])]
+    )
+    return group.get("version", 0) + 1
+
+async def apply_op(group_id: str, op: str, delta: Dict[str, int]) -> int | None:
+    """Apply ``delta`` to the group balances unless ``op`` already was;
+    returns the new group version (None when it already was)."""
+    update: dict = {"$push": {"ledger_ops": op}}
+    if delta:
+        update["$inc"] = {f"balances.{uid}": cents for uid, cents in delta.items()}
+    return await _update_group({"transactional_group_id": group_id, "ledger_ops": {"$ne": op}}, update)
+
+async def finish_op(entry: dict, op: str) -> int | None:
+    """Clear the pending marker (or drop a deleted entry), then forget the op;
+    returns the new group version (None when it was already forgotten)."""
+    if entry.get("deleted"):
+        await ledger_entries_collection.delete_one({"expense_id": entry["expense_id"], "pending_op": op})
+    else:
+        await ledger_entries_collection.update_one(
+            {"expense_id": entry["expense_id"], "pending_op": op},
+            {"$set": {"pending_op": None, "pending_delta": None, "pending_since": None}}
+        )
+    return await _update_group(
+        {"transactional_group_id": entry["transactional_group_id"], "ledger_ops": op},
+        {"$pull": {"ledger_ops": op}}
+    )
+
+async def commit(entry: dict) -> int | None:
+    """Steps 2 and 3 for an entry just written with its pending fields;
+    returns the group version they left (None if a reconcile finished first)."""
+    applied = await apply_op(entry["transactional_group_id"], entry["pending_op"], entry["pending_delta"])
+    return await finish_op(entry, entry["pending_op"]) or applied
+
+
+async def reconcile_group(group_id: str, ledger_ops: List[str]) -> int:
+    """Finish writes interrupted between steps; returns how many ops it repaired."""
+    cutoff = datetime.utcnow() - RECONCILE_GRACE
+    repaired = 0
+    stale = ledger_entries_collection.find({
+        "transactional_group_id": group_id,
+        "pending_op": {"$type": "string"},
+        "pending_since": {"$lt": cutoff},
+    })
+    async for entry in stale:
+        if entry["pending_op"] not in ledger_ops:
+            await apply_op(group_id, entry["pending_op"], entry["pending_delta"] or {})
+        await finish_op(entry, entry["pending_op"])
+        repaired += 1
+
+    if ledger_ops:
+        # Ops whose entry finished but whose pull was lost
+        still_pending = await ledger_entries_collection.distinct(
+            "pending_op", {"transactional_group_id": group_id, "pending_op": {"$in": ledger_ops}}
+        )
+        finished = [op for op in ledger_ops if op not in still_pending]
+        if finished:
+            await _update_group(
+                {"transactional_group_id": group_id},
+                {"$pull": {"ledger_ops": {"$in": finished}}}
+            )
+            repaired += len(finished)
+    return repaired
+
+async def rebuild_balances(group_id: str) -> Dict[str, int]:
+    """Recompute a group's balances from its ledger. Only safe while no
+    ledger writes for the group are in flight."""
+    balances: Dict[str, int] = {}
+    cursor = ledger_entries_collection.find(
+        {"transactional_group_id": group_id, "deleted": {"$ne": True}},
+        {"paid_by": 1, "amount_cents": 1, "splits": 1}
+    )
+    async for entry in cursor:
+        for uid, cents in entry_delta(entry).items():
+            balances[uid] = balances.get(uid, 0) + cents
+    await ledger_entries_collection.delete_many({"transactional_group_id": group_id, "deleted": True})
+    await ledger_entries_collection.update_many(
+        {"transactional_group_id": group_id, "pending_op": {"$type": "string"}},
+        {"$set": {"pending_op": None, "pending_delta": None, "pending_since": None}}
+    )
+    await _update_group(
+        {"transactional_group_id": group_id},
+        {"$set": {"balances": {uid: c for uid, c in balances.items() if c}, "ledger_ops": []}}
+    )
+    return balances
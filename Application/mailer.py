@@ -0,0 +1,247 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import PyMongoError
+
+from Application.config import (
+    EMAIL_HOST, EMAIL_PORT, EMAIL_HOST_USER, EMAIL_HOST_PASSWORD, EMAIL_USE_TLS,
+    MAIL_FROM, MAIL_BATCH_SIZE, MAIL_MAX_ATTEMPTS, MAIL_RETRY_BASE_SECONDS, MAIL_POLL_SECONDS,
+    MAIL_LEASE_SECONDS, MAIL_CONNECTION_IDLE_SECONDS,
+)
+from Application.db import mail_outbox_collection
+from Application.instrumentation import timed
+
+# smtplib and the MIME classes load with the first message, not at boot
+if TYPE_CHECKING:
+    from email.mime.text import MIMEText
+
+# Delivered and abandoned messages are kept this long for auditing, without
+# their bodies: those carry live verification and reset codes
+OUTBOX_RETENTION = timedelta(days=7)
+
+
+class SMTPConnection:
+    """A reusable SMTP session. Only ever touched from the mail thread."""
+
+    def __init__(self, host: str, port: int, user: str, password: str,
+                 use_tls: bool, idle_seconds: float):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.idle_seconds = idle_seconds
+        self._server = None  # smtplib.SMTP once connected
+        self._last_used = 0.0
+
+    def _connect(self):
+        import smtplib
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.use_tls:
+            server.starttls()
+        if self.user:
+            server.login(self.user, self.password)
+        self._server = server
+
+    def close(self):
+        if self._server is not None:
+            import smtplib
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+    def send_batch(self, messages: "list[MIMEText]") -> list[str | None]:
+        """Send each message, returning ``None`` or an error string per message."""
+        import smtplib
+        # Servers drop idle sessions; reconnecting is cheaper than a failed send
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_seconds:
+            self.close()
+
+        results = []
+        for msg in messages:
+            error = None
+            for _ in range(2):
+                try:
+                    if self._server is None:
+                        self._connect()
+                    self._server.send_message(msg)
+                    error = None
+                    break
+                except smtplib.SMTPServerDisconnected as e:
+                    # Stale connection: reconnect once and retry this message
+                    self._server = None
+                    error = str(e)
+                except Exception as e:
+                    # Anything else is specific to this message or server; report it
+                    self.close()
+                    error = str(e) or type(e).__name__
+                    break
+            results.append(error)
+        self._last_used = time.monotonic()
+        return results
+
+
+class MailQueue:
+    """Persistent outbox drained by a background task.
+
+    ``enqueue`` only writes to ``mail_outbox``; a worker claims due messages
+    in batches, sends them over one reused SMTP connection and retries
+    failures with exponential backoff. Claims carry a lease, so messages
+    held by a crashed process are picked up again once it expires
+    (delivery is at-least-once).
+    """
+
+    def __init__(self, collection, connection: SMTPConnection, sender: str,
+                 batch_size: int, max_attempts: int, retry_base_seconds: float,
+                 poll_seconds: float, lease_seconds: int):
+        self.collection = collection
+        self.connection = connection
+        self.sender = sender
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # Metrics
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def enqueue(self, to_email: str, subject: str, message: str) -> str:
+        now = datetime.utcnow()
+        result = await self.collection.insert_one({
+            "to": to_email,
+            "subject": subject,
+            "body": message,
+            "status": "pending",
+            "attempts": 0,
+            "created_at": now,
+            "next_attempt_at": now,
+        })
+        self._wakeup.set()
+        return str(result.inserted_id)
+
+    async def _claim_batch(self) -> list[dict]:
+        batch = []
+        while len(batch) < self.batch_size:
+            now = datetime.utcnow()
+            doc = await self.collection.find_one_and_update(
+                {"$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    {"status": "sending", "lease_until": {"$lt": now}},
+                ]},
+                {
+                    "$set": {"status": "sending", "lease_until": now + timedelta(seconds=self.lease_seconds)},
+                    "$inc": {"attempts": 1},
+                },
+                sort=[("next_attempt_at", ASCENDING)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if doc is None:
+                break
+            batch.append(doc)
+        return batch
+
+    def _build(self, doc: dict) -> "MIMEText":
+        from email.mime.text import MIMEText
+        msg = MIMEText(doc["body"])
+        msg["Subject"] = doc["subject"]
+        msg["From"] = self.sender
+        msg["To"] = doc["to"]
+        return msg
+
+    async def _deliver(self, batch: list[dict]):
+        loop = asyncio.get_running_loop()
+        with timed("smtp"):
+            errors = await loop.run_in_executor(
+                self._executor, self.connection.send_batch, [self._build(d) for d in batch]
+            )
+        now = datetime.utcnow()
+        for doc, error in zip(batch, errors):
+            if error is None:
+                self.sent += 1
+                await self.collection.update_one(
+                    {"_id": doc["_id"]},
+                    {"$set": {"status": "sent", "sent_at": now, "expires_at": now + OUTBOX_RETENTION},
+                     "$unset": {"lease_until": "", "body": ""}},
+                )
+            elif doc["attempts"] >= self.max_attempts:
+                self.failed += 1
+                print(f"[MAIL] Giving up on message to {doc['to']}: {error}")
+                await self.collection.update_one(
+                    {"_id": doc["_id"]},
+                    {"$set": {"status": "failed", "last_error": error, "expires_at": now + OUTBOX_RETENTION},
+                     "$unset": {"lease_until": "", "body": ""}},
+                )
+            else:
+                self.retried += 1
+                delay = self.retry_base_seconds * 2 ** (doc["attempts"] - 1)
+                await self.collection.update_one(
+                    {"_id": doc["_id"]},
+                    {
+                        "$set": {
+                            "status": "pending",
+                            "last_error": error,
+                            "next_attempt_at": now + timedelta(seconds=delay),
+                        },
+                        "$unset": {"lease_until": ""},
+                    },
+                )
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                batch = await self._claim_batch()
+                if batch:
+                    await self._deliver(batch)
+                    continue
+            except PyMongoError as e:
+                print(f"[MAIL] Outbox error: {e}")
+            except Exception as e:
+                # A bad document or template must not stop the outbox from draining;
+                # claimed messages are retried once their lease expires
+                print(f"[MAIL] Worker error: {type(e).__name__}: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "failed": self.failed, "retried": self.retried}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.connection.close)
+
+
+mail_queue = MailQueue(
+    mail_outbox_collection,
+    SMTPConnection(EMAIL_HOST, EMAIL_PORT, EMAIL_HOST_USER, EMAIL_HOST_PASSWORD,
+                   EMAIL_USE_TLS, MAIL_CONNECTION_IDLE_SECONDS),
+    MAIL_FROM,
+    MAIL_BATCH_SIZE,
+    MAIL_MAX_ATTEMPTS,
+    MAIL_RETRY_BASE_SECONDS,
+    MAIL_POLL_SECONDS,
+    MAIL_LEASE_SECONDS,
+)
@@ -1,36 +1,98 @@
-from fastapi import FastAPI, Depends, HTTPException, Body, Path, status
+from fastapi import FastAPI, Depends, HTTPException, Body, Path, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from google.oauth2 import id_token
 from fastapi.security import OAuth2PasswordRequestForm
 from Application.auth import (
     Token, User, get_current_user, create_access_token,
     authenticate_user, is_token_blacklisted, blacklist_token,
     UserCreate, UserLogin, create_refresh_token, get_user_by_email,
-    validate_code_for_signup, generate_and_store_code, can_send_new_code,
-    ForgotPasswordRequest, ForgotPasswordReset, LogoutRequest
+    ForgotPasswordRequest, ForgotPasswordReset, LogoutRequest, access_token_claims
 )
-from pymongo.errors import DuplicateKeyError
-from Application.db import init_db, users_collection
-from Application.auth import get_password_hash, send_email
-from google.auth.transport import requests as google_requests
+from Application.db import init_db, warm_up, ensure_unique_indexes, close_db, ping, pool_stats, users_collection
+from Application.auth import get_password_hash
+from Application.codes import issue_code, consume_code, PURPOSE_SIGNUP, PURPOSE_PASSWORD_RESET
+from Application.mailer import mail_queue
+from Application.chat_hub import chat_hub
+from Application.google_auth import google_cert_cache, verify_google_id_token, CertFetchError
+from Application.instrumentation import InstrumentationMiddleware, metrics, loop_lag_monitor
+from Application.hashing import hashing_service, get_pwd_context
+from Application.revocation import revocation_cache
+from Application.user_cache import user_cache
+from Application.cache_bus import cache_bus
+from Application.rate_limit import rate_limiter
+from Application.idempotency import IdempotencyMiddleware, idempotency_store
+from Application.deletion import deletion_jobs
+from Application.serialization import ORJSONResponse
+from Application import versioning
 from jose import jwt, JWTError
-from Application.config import JWT_SECRET_KEY
+from Application.config import (
+    JWT_SECRET_KEY, ALGORITHM, SERVER_TIMING_ENABLED, METRICS_TOKEN, LAZY_SUBSYSTEMS, INDEX_BUILD_MODE
+)
 from typing import Annotated
+from contextlib import asynccontextmanager
+import asyncio
 from datetime import datetime
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from fastapi import Header
 
-from dotenv import load_dotenv
-load_dotenv()
-
 
 from Application.routers.dashboards import router as dashboard_router
 from Application.routers.chat import router as chat_router
 from Application.routers.transactional_group import router as transactional_group_router
+from Application.routers.ledger import router as ledger_router
+from Application.routers.search import router as search_router
+from Application.routers.export import router as export_router
 
 
-app = FastAPI()
-
+async def build_indexes():
+    try:
+        await init_db()
+    except Exception as e:
+        print(f"[DB INIT] Background index build failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warm_up()
+    # Writes rely on the unique indexes, so only the rest may wait for INDEX_BUILD_MODE
+    await ensure_unique_indexes()
+    index_task = None
+    if INDEX_BUILD_MODE == "startup":
+        await init_db()
+    elif INDEX_BUILD_MODE == "background":
+        index_task = asyncio.create_task(build_indexes())
+    await revocation_cache.start()
+    cache_bus.start()
+    mail_queue.start()
+    deletion_jobs.start()
+    await chat_hub.start()
+    if not LAZY_SUBSYSTEMS:
+        google_cert_cache.start()
+        get_pwd_context()
+    loop_lag_monitor.start()
+    try:
+        yield
+    finally:
+        if index_task is not None:
+            index_task.cancel()
+        await revocation_cache.stop()
+        await cache_bus.stop()
+        await mail_queue.stop()
+        await deletion_jobs.stop()
+        await chat_hub.stop()
+        await google_cert_cache.stop()
+        await loop_lag_monitor.stop()
+        await rate_limiter.close()
+        hashing_service.shutdown()
+        await close_db()
+
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+
+# Profile changes made by any worker evict the profile everywhere
+cache_bus.register("user", user_cache.invalidate)
+
+# Innermost, so replayed responses still get CORS headers and instrumentation
+app.add_middleware(IdempotencyMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -38,6 +100,36 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(InstrumentationMiddleware, server_timing=SERVER_TIMING_ENABLED)
+
+metrics.register_collector("hashing", hashing_service.stats)
+metrics.register_collector("revocation", revocation_cache.stats)
+metrics.register_collector("user_cache", user_cache.stats)
+metrics.register_collector("cache_bus", cache_bus.stats)
+metrics.register_collector("mail", mail_queue.stats)
+metrics.register_collector("chat_hub", chat_hub.stats)
+metrics.register_collector("rate_limit", rate_limiter.stats)
+metrics.register_collector("idempotency", idempotency_store.stats)
+metrics.register_collector("deletion", deletion_jobs.stats)
+metrics.register_collector("mongo_pool", pool_stats)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(authorization: str | None = Header(None)):
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """Readiness probe: Mongo reachable, plus connection pool counters."""
+    try:
+        ping_seconds = await asyncio.wait_for(ping(), timeout=2)
+    except Exception as e:
+        return ORJSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "error": str(e) or type(e).__name__, "mongo_pool": pool_stats()}
+        )
+    return {"status": "ok", "mongo_ping_ms": round(ping_seconds * 1000, 2), "mongo_pool": pool_stats()}
 
 @app.post("/forgot-password/request")
 async def forgot_password_request(request: ForgotPasswordRequest):
@@ -46,53 +138,52 @@ async def forgot_password_request(request: ForgotPasswordRequest):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    can_send, wait_time = await can_send_new_code(email)
-    if not can_send:
+    code, wait_time = await issue_code(email, PURPOSE_PASSWORD_RESET)
+    if code is None:
         raise HTTPException(
             status_code=429,
             detail=f"Please wait {wait_time} seconds before requesting a new code."
         )
 
-    code = await generate_and_store_code(email)
     subject = "Your Password Reset Code"
     message = f"Your password reset code is: {code}. It is valid for 10 minutes."
-    print(f"[DEBUG] Sending reset code {code} to {email}")
 
-    email_sent = send_email(email, subject, message)
-    if not email_sent:
-        raise HTTPException(status_code=500, detail="Failed to send reset code email")
+    await mail_queue.enqueue(email, subject, message)
 
     return {"message": "Password reset code sent successfully"}
 
 
 
 @app.post("/forgot-password/reset")
-async def forgot_password_reset(request: ForgotPasswordReset):
+async def forgot_password_reset(request: ForgotPasswordReset, http_request: Request):
     email = request.email.lower().strip()
+    await rate_limiter.check(http_request, "reset", email)
     code = request.code.strip()
     new_password = request.new_password
 
-    # Validate code - reuse your validation function
-    is_valid, error = await validate_code_for_signup(email, code)
+    # Validate and burn the reset code
+    is_valid, error = await consume_code(email, PURPOSE_PASSWORD_RESET, code)
     if not is_valid:
         raise HTTPException(status_code=400, detail=error)
 
     # Hash and update the new password
-    hashed_password = get_password_hash(new_password)
+    hashed_password = await get_password_hash(new_password)
     update_result = await users_collection.update_one(
         {"email": email},
-        {"$set": {"hashed_password": hashed_password}}
+        {"$set": {"hashed_password": hashed_password}, "$inc": versioning.BUMP}
     )
     if update_result.modified_count == 0:
         raise HTTPException(status_code=500, detail="Failed to update password")
+    await cache_bus.invalidate("user", email)
 
     return {"message": "Password reset successfully"}
 
 @app.post("/send-verification-code")
 async def send_verification_code(email: str = Body(..., embed=True)):
-    # 1. Check if we can send new code
-    can_send, remaining = await can_send_new_code(email)
-    if not can_send:
+    # 1. Issue a new code unless the cooldown or a live code blocks it
+    email = email.strip().lower()
+    code, remaining = await issue_code(email, PURPOSE_SIGNUP)
+    if code is None:
         return JSONResponse(
             status_code=429,
             content={
@@ -101,15 +192,8 @@ async def send_verification_code(email: str = Body(..., embed=True)):
             }
         )
 
-    # 2. Generate and store hashed code
-    code = await generate_and_store_code(email)
-
-    # 3. Send email (replace with your actual mail sending logic)
-    # Example debug output for now:
-    print(f"[DEBUG] Sending verification code {code} to {email}")
-
-    # If you want to use real sending:
-    send_email(
+    # 2. Queue the email; the mail worker delivers it in the background
+    await mail_queue.enqueue(
         to_email=email,
         subject="Your Verification Code",
         message=f"Your verification code is: {code}"
@@ -118,18 +202,16 @@ async def send_verification_code(email: str = Body(..., embed=True)):
     return {"status": "success", "message": "Verification code sent successfully"}
 
 
-@app.on_event("startup")
-async def startup_event():
-    await init_db()
-
 @app.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     # OAuth2PasswordRequestForm uses 'username', which will now be the email
+    await rate_limiter.check(request, "login", form_data.username)
     user = await authenticate_user(form_data.username, form_data.password)
     if not user:
+        await rate_limiter.record_failure(request, form_data.username)
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_access_token(data=access_token_claims(user))
     refresh_token = create_refresh_token(data={"sub": user.email})
     
     return {
@@ -139,12 +221,14 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     }
 
 @app.post("/login", response_model=Token)
-async def normal_login(user_data: UserLogin):
+async def normal_login(user_data: UserLogin, request: Request):
+    await rate_limiter.check(request, "login", user_data.email)
     user = await authenticate_user(user_data.email, user_data.password)
     if not user:
+        await rate_limiter.record_failure(request, user_data.email)
         raise HTTPException(status_code=400, detail="Incorrect email or password")
 
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_access_token(data=access_token_claims(user))
     refresh_token = create_refresh_token(data={"sub": user.email})
 
     return {
@@ -154,15 +238,20 @@ async def normal_login(user_data: UserLogin):
     }
 
 @app.get("/users/me", response_model=User)
-async def read_users_me(current_user: User = Depends(get_current_user)):
-    return current_user
+async def read_users_me(request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    # The profile comes from the token or the user cache, so tag its content directly
+    profile = current_user.model_dump(mode="json")
+    tag = versioning.etag("user", profile)
+    if versioning.matches(request, tag):
+        return versioning.not_modified(tag)
+    return versioning.tagged(profile, tag, response)
 
 @app.post("/create-user")
 async def create_user(user: UserCreate):
     email_normalized = user.email.strip().lower()
 
     # Validate verification code
-    is_valid, error_msg = await validate_code_for_signup(email_normalized, user.code)
+    is_valid, error_msg = await consume_code(email_normalized, PURPOSE_SIGNUP, user.code)
     if not is_valid:
         raise HTTPException(status_code=400, detail=error_msg)
 
@@ -174,10 +263,11 @@ async def create_user(user: UserCreate):
     # Create user document
     user_doc = {
         "email": email_normalized,
-        "hashed_password": get_password_hash(user.password),
+        "hashed_password": await get_password_hash(user.password),
         "first_name": user.first_name,
         "last_name": user.last_name,
-        "joined_on": datetime.utcnow()
+        "joined_on": datetime.utcnow(),
+        "version": 1
     }
 
     # Insert user into DB
@@ -186,37 +276,44 @@ async def create_user(user: UserCreate):
     return {"message": "User created successfully", "id": str(result.inserted_id)}
 
 
-@app.delete("/users/{email}")
+@app.delete("/users/{email}", status_code=status.HTTP_202_ACCEPTED)
 async def delete_user(
     email: Annotated[str, Path(title="The email of the user to delete")],
     current_user: Annotated[User, Depends(get_current_user)]
 ):
+    """Remove the account now; its dashboards, groups, chats and codes are
+    removed or detached by a background deletion job."""
     if current_user.email != email:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You can only delete your own account"
         )
-    
-    result = await users_collection.delete_one({"email": email})
-    if result.deleted_count == 0:
+
+    user = await users_collection.find_one({"email": email}, {"_id": 1})
+    if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-        
-    return {"message": f"User '{email}' deleted successfully."}
+    # Job first, so a crash after it still finishes the deletion
+    job_id = await deletion_jobs.enqueue(str(user["_id"]), email)
+    await revocation_cache.revoke_subject(email)
+    await users_collection.delete_one({"_id": user["_id"]})
+    await cache_bus.invalidate("user", email)
+
+    return {"message": f"User '{email}' deleted; their data is being removed.", "job_id": job_id}
 
 @app.post("/refresh", response_model=Token)
 async def refresh_token(refresh_token: str = Body(...)):
-    if await is_token_blacklisted(refresh_token):
-        raise HTTPException(status_code=401, detail="Refresh token has been revoked")
     try:
         payload = jwt.decode(refresh_token, JWT_SECRET_KEY, algorithms=[ALGORITHM])
         email = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid refresh token")
+        if await is_token_blacklisted(refresh_token, payload):
+            raise HTTPException(status_code=401, detail="Refresh token has been revoked")
         user = await get_user_by_email(email)
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
 
-        new_access_token = create_access_token(data={"sub": email})
+        new_access_token = create_access_token(data=access_token_claims(user))
         new_refresh_token = create_refresh_token(data={"sub": email})
         return {
             "access_token": new_access_token,
@@ -234,18 +331,18 @@ async def logout(data: LogoutRequest, authorization: str = Header(...)):
     else:
         access_token = authorization  # fallback
     
-    # blacklist both tokens
-    await blacklist_token(data.refresh_token)
-    await blacklist_token(access_token)
-    
+    # blacklist both tokens; forged ones were never valid, so there is nothing to revoke
+    revoked = [await blacklist_token(data.refresh_token), await blacklist_token(access_token)]
+    if not all(revoked):
+        raise HTTPException(status_code=401, detail="Invalid token")
+
     return {"message": "Logged out and tokens revoked"}
 
 
 @app.post("/users/google-login", response_model=Token)
 async def google_login(token: str = Body(...)):
     try:
-        idinfo = id_token.verify_oauth2_token(token, google_requests.Request())
-        google_user_id = idinfo["sub"]
+        idinfo = await verify_google_id_token(token)
         email = idinfo["email"]
         name = idinfo.get("name", "").split(" ")
         first_name = name[0] if len(name) > 0 else ""
@@ -253,16 +350,25 @@ async def google_login(token: str = Body(...)):
 
         user = await users_collection.find_one({"email": email})
         if not user:
-            new_user = {
+            user = {
                 "email": email,
                 "first_name": first_name,
                 "last_name": last_name,
                 "hashed_password": "",
-                "joined_on": datetime.utcnow()
+                "joined_on": datetime.utcnow(),
+                "version": 1
             }
-            await users_collection.insert_one(new_user)
-
-        access_token = create_access_token(data={"sub": email})
+            result = await users_collection.insert_one(user)
+            user["_id"] = result.inserted_id
+
+        profile = User(
+            id=str(user["_id"]),
+            email=email,
+            first_name=user.get("first_name") or "",
+            last_name=user.get("last_name") or "",
+            joined_on=user.get("joined_on")
+        )
+        access_token = create_access_token(data=access_token_claims(profile))
         refresh_token = create_refresh_token(data={"sub": email})
 
         return {
@@ -273,7 +379,12 @@ async def google_login(token: str = Body(...)):
 
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid Google token")
+    except CertFetchError:
+        raise HTTPException(status_code=503, detail="Google sign-in is temporarily unavailable")
 
 app.include_router(dashboard_router)
 app.include_router(chat_router)
-app.include_router(transactional_group_router)
\ No newline at end of file
+app.include_router(transactional_group_router)
+app.include_router(ledger_router)
+app.include_router(search_router)
+app.include_router(export_router)
\ No newline at end of file
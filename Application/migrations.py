@@ -0,0 +1,180 @@
+"""One-shot data migrations.
+
+Run with ``python -m Application.migrations <name>``. Every migration is
+idempotent, so an interrupted run can simply be started again.
+"""
+import asyncio
+import sys
+
+from bson import ObjectId
+from pymongo import DESCENDING, UpdateOne
+
+from Application.db import (
+    chats_collection, chat_messages_collection, dashboards_collection, transactional_groups_collection, init_db
+)
+from Application.ledger import rebuild_balances
+from Application.routers.chat import PREVIEW_LENGTH
+from Application.routers.dashboards import account_totals, card_totals
+
+BATCH_SIZE = 500
+
+
+async def migrate_embedded_messages(batch_size: int = BATCH_SIZE) -> int:
+    """Move ``chats.messages`` arrays into ``chat_messages``; returns messages moved."""
+    moved = 0
+    cursor = chats_collection.find(
+        {"messages.0": {"$exists": True}},
+        {"chat_id": 1, "messages": 1}
+    )
+    async for chat in cursor:
+        ops = []
+        for index, message in enumerate(chat["messages"]):
+            doc = {**message, "chat_id": chat["chat_id"]}
+            # Deterministic fallback id keeps re-runs from duplicating messages
+            doc.setdefault("message_id", f"{chat['chat_id']}:{index}")
+            ops.append(UpdateOne({"message_id": doc["message_id"]}, {"$setOnInsert": doc}, upsert=True))
+            if len(ops) >= batch_size:
+                await chat_messages_collection.bulk_write(ops, ordered=False)
+                moved += len(ops)
+                ops = []
+        if ops:
+            await chat_messages_collection.bulk_write(ops, ordered=False)
+            moved += len(ops)
+        # Only drop the array once every message is safely copied
+        await chats_collection.update_one({"_id": chat["_id"]}, {"$unset": {"messages": ""}})
+        print(f"[MIGRATION] chat {chat['chat_id']}: moved {len(chat['messages'])} messages")
+    # Empty arrays left behind by older create paths
+    await chats_collection.update_many({"messages": {"$size": 0}}, {"$unset": {"messages": ""}})
+    return moved
+
+
+async def build_indexes() -> bool:
+    """(Re)apply every index, regardless of the schema marker."""
+    return await init_db(force=True)
+
+
+async def rebuild_ledger_balances() -> int:
+    """Recompute every group's balances from its ledger entries; returns groups rebuilt.
+
+    Run while the API is stopped: balances are overwritten, not merged.
+    """
+    rebuilt = 0
+    async for group in transactional_groups_collection.find({}, {"transactional_group_id": 1}):
+        await rebuild_balances(group["transactional_group_id"])
+        rebuilt += 1
+    return rebuilt
+
+
+def _cents(value) -> int:
+    return round((value or 0) * 100)
+
+def _typed_item(item: dict, id_field: str) -> dict:
+    """Legacy ``{"name", "balance"[, "limit"]}`` items (in currency units) to the typed shape."""
+    item = dict(item)
+    item.setdefault(id_field, str(ObjectId()))
+    if "balance_cents" not in item:
+        item["balance_cents"] = _cents(item.pop("balance", 0))
+    if id_field == "card_id" and "limit_cents" not in item:
+        item["limit_cents"] = _cents(item.pop("limit", 0))
+    return item
+
+async def backfill_dashboard_summaries() -> int:
+    """Convert legacy account and card items, then compute ``summary`` for
+    dashboards created before it was maintained; returns dashboards updated."""
+    converted = 0
+    async for dashboard in dashboards_collection.find(
+        {"$or": [
+            {"bank_accounts": {"$elemMatch": {"$or": [
+                {"account_id": {"$exists": False}}, {"balance_cents": {"$exists": False}}
+            ]}}},
+            {"credit_cards": {"$elemMatch": {"$or": [
+                {"card_id": {"$exists": False}}, {"balance_cents": {"$exists": False}},
+                {"limit_cents": {"$exists": False}}
+            ]}}},
+        ]},
+        {"bank_accounts": 1, "credit_cards": 1}
+    ):
+        accounts = [_typed_item(a, "account_id") for a in dashboard.get("bank_accounts", [])]
+        cards = [_typed_item(c, "card_id") for c in dashboard.get("credit_cards", [])]
+        summary = {field: 0 for field in (
+            "total_balance_cents", "credit_balance_cents", "credit_limit_cents", "bank_account_count", "credit_card_count"
+        )}
+        for totals in [*map(account_totals, accounts), *map(card_totals, cards)]:
+            for field, value in totals.items():
+                summary[field] += value
+        await dashboards_collection.update_one(
+            {"_id": dashboard["_id"]},
+            {"$set": {"bank_accounts": accounts, "credit_cards": cards, "summary": summary}}
+        )
+        converted += 1
+    if converted:
+        print(f"[MIGRATION] converted legacy accounts/cards on {converted} dashboards")
+
+    result = await dashboards_collection.update_many(
+        {"summary": {"$exists": False}},
+        [{"$set": {"summary": {
+            "total_balance_cents": {"$sum": {"$ifNull": ["$bank_accounts.balance_cents", []]}},
+            "credit_balance_cents": {"$sum": {"$ifNull": ["$credit_cards.balance_cents", []]}},
+            "credit_limit_cents": {"$sum": {"$ifNull": ["$credit_cards.limit_cents", []]}},
+            "bank_account_count": {"$size": {"$ifNull": ["$bank_accounts", []]}},
+            "credit_card_count": {"$size": {"$ifNull": ["$credit_cards", []]}},
+        }}}]
+    )
+    return converted + result.modified_count
+
+
+async def backfill_chat_inbox() -> int:
+    """Derive last-message previews and unread counters for chats created
+    before the inbox existed; returns chats updated."""
+    updated = 0
+    async for chat in chats_collection.find(
+        {"last_activity_at": {"$exists": False}},
+        {"chat_id": 1, "participants.user_id": 1}
+    ):
+        latest = await chat_messages_collection.find_one(
+            {"chat_id": chat["chat_id"]}, sort=[("time_stamp", DESCENDING), ("message_id", DESCENDING)]
+        )
+        read_state = {}
+        for participant in chat.get("participants", []):
+            uid = participant["user_id"]
+            read_state[uid] = {"unread_count": await chat_messages_collection.count_documents(
+                {"chat_id": chat["chat_id"], "seen_by": {"$ne": uid}}
+            )}
+        last_message = None
+        if latest:
+            sender = latest.get("sender", {})
+            last_message = {
+                "message_id": latest["message_id"],
+                "sender_id": sender.get("id", ""),
+                "sender_name": f"{sender.get('first_name', '')} {sender.get('last_name', '')}".strip(),
+                "text": latest.get("text", "")[:PREVIEW_LENGTH],
+                "message_type": latest.get("message_type", "text"),
+                "time_stamp": latest["time_stamp"],
+            }
+        await chats_collection.update_one(
+            {"_id": chat["_id"], "last_activity_at": {"$exists": False}},
+            {"$set": {
+                "last_message": last_message,
+                "last_activity_at": latest["time_stamp"] if latest else chat["_id"].generation_time.replace(tzinfo=None),
+                "read_state": read_state,
+            }}
+        )
+        updated += 1
+    return updated
+
+
+MIGRATIONS = {
+    "chat-messages": migrate_embedded_messages,
+    "indexes": build_indexes,
+    "ledger-balances": rebuild_ledger_balances,
+    "dashboard-summaries": backfill_dashboard_summaries,
+    "chat-inbox": backfill_chat_inbox,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in MIGRATIONS:
+        print(f"usage: python -m Application.migrations [{'|'.join(MIGRATIONS)}]")
+        sys.exit(2)
+    result = asyncio.run(MIGRATIONS[sys.argv[1]]())
+    print(f"[MIGRATION] {sys.argv[1]} done: {result}")
@@ -0,0 +1,101 @@
+import asyncio
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(*values) -> str:
+    """Opaque, URL-safe cursor for a keyset position (datetimes are preserved)."""
+    parts = [{"$dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(parts, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        parts = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(parts, list) or len(parts) != size:
+            raise ValueError
+        return [
+            datetime.fromisoformat(p["$dt"]) if isinstance(p, dict) and "$dt" in p else p
+            for p in parts
+        ]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_after(fields: tuple[str, str], values: list, descending: bool = False) -> dict:
+    """Filter matching documents strictly past ``values`` in (fields[0], fields[1]) order."""
+    op = "$lt" if descending else "$gt"
+    first, second = fields
+    return {"$or": [
+        {first: {op: values[0]}},
+        {first: values[0], second: {op: values[1]}},
+    ]}
+
+
+def _object_id_cursor(cursor: str) -> ObjectId:
+    try:
+        return ObjectId(decode_cursor(cursor, 1)[0])
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(fields: str | None, allowed: set[str], default: list[str]) -> list[str]:
+    """Validate a comma-separated ``fields=`` parameter against ``allowed``."""
+    if not fields:
+        return list(default)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+async def list_owned_and_shared(
+    collection,
+    user_id: str,
+    fields: list[str],
+    limit: int,
+    owned_cursor: str | None = None,
+    shared_cursor: str | None = None,
+) -> dict:
+    """Newest-first page of documents owned by and shared with ``user_id``.
+
+    The two branches run concurrently as separate queries, each walking its
+    own (owner_id|shared_with, _id) index from its keyset cursor and
+    stopping after ``limit + 1`` documents, so a page costs O(page size)
+    however many documents the user has.
+    """
+    owned: dict = {"owner_id": user_id}
+    shared: dict = {"shared_with": user_id}
+    if owned_cursor:
+        owned["_id"] = {"$lt": _object_id_cursor(owned_cursor)}
+    if shared_cursor:
+        shared["_id"] = {"$lt": _object_id_cursor(shared_cursor)}
+    projection = {field: 1 for field in fields}
+
+    async def page(query: dict) -> tuple[list, str | None]:
+        docs = await collection.find(query, projection).sort("_id", -1).limit(limit + 1).to_list(length=limit + 1)
+        for doc in docs:
+            doc["_id"] = str(doc["_id"])
+        if len(docs) > limit:
+            docs = docs[:limit]
+            return docs, encode_cursor(docs[-1]["_id"])
+        return docs, None
+
+    (owned_docs, next_owned), (shared_docs, next_shared) = await asyncio.gather(page(owned), page(shared))
+    return {
+        "owned": owned_docs,
+        "shared_access": shared_docs,
+        "owned_cursor": next_owned,
+        "shared_cursor": next_shared,
+    }
@@ -0,0 +1,216 @@
+import math
+import time
+from typing import Dict, List, NamedTuple
+
+from fastapi import HTTPException, Request, status
+
+from Application.config import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND_URL, RATE_LIMIT_MAX_KEYS, RATE_LIMIT_TRUSTED_HOPS,
+    RATE_LIMIT_WINDOW_SECONDS, RATE_LIMIT_PER_IP, RATE_LIMIT_PER_EMAIL, RATE_LIMIT_GLOBAL,
+    RATE_LIMIT_FAILURES_PER_EMAIL, RATE_LIMIT_FAILURE_WINDOW_SECONDS,
+)
+
+
+class Rule(NamedTuple):
+    name: str
+    limit: int
+    window: float
+
+
+def _estimate(previous: int, current: int, elapsed: float, window: float) -> float:
+    """Sliding-window count: the previous window weighted by its remaining overlap."""
+    return previous * (1 - elapsed / window) + current
+
+def _retry_after(previous: int, current: int, elapsed: float, window: float, limit: int, cost: int) -> int:
+    if current + cost > limit or not previous:
+        # Only the next window can make room
+        wait = window - elapsed
+    else:
+        # Wait until enough of the previous window has slid out
+        wait = window * (1 - (limit - current - cost) / previous) - elapsed
+    return max(1, math.ceil(wait))
+
+
+# --- Backends ---
+class MemoryBackend:
+    """Per-process sliding-window counters: one ``[window index, current,
+    previous, window length]`` list per key, swept when the table outgrows
+    ``max_keys``."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self.counters: Dict[str, List[float]] = {}
+
+    def _sweep(self, now: float):
+        # Drop keys whose counts have fully slid out, then the oldest inserted
+        for key, (index, _, _, window) in list(self.counters.items()):
+            if int(now // window) > index + 1:
+                del self.counters[key]
+        overflow = len(self.counters) - self.max_keys + 1
+        for key in list(self.counters)[:max(0, overflow)]:
+            del self.counters[key]
+
+    async def hit(self, key: str, limit: int, window: float, cost: int = 1) -> int:
+        """Count ``cost`` against ``key``; returns 0 if allowed, else seconds to wait.
+        Rejected hits are not counted. ``cost=0`` only peeks."""
+        now = time.time()
+        index = int(now // window)
+        entry = self.counters.get(key)
+        if entry is None:
+            if len(self.counters) >= self.max_keys:
+                self._sweep(now)
+            entry = self.counters[key] = [index, 0, 0, window]
+        elif entry[0] != index:
+            entry[2] = entry[1] if entry[0] == index - 1 else 0
+            entry[1] = 0
+            entry[0] = index
+
+        elapsed = now - index * window
+        _, current, previous, _ = entry
+        if _estimate(previous, current, elapsed, window) + cost > limit:
+            return _retry_after(previous, current, elapsed, window, limit, cost)
+        entry[1] += cost
+        return 0
+
+    async def close(self):
+        pass
+
+
+class RedisBackend:
+    """Shares counters between instances through Redis (optional ``redis``
+    package). Each window is its own key, expired after two windows."""
+
+    def __init__(self, url: str | None = None, client=None, prefix: str = "rl:"):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise RuntimeError("RATE_LIMIT_BACKEND_URL uses redis but the 'redis' package is not installed")
+            client = redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    async def hit(self, key: str, limit: int, window: float, cost: int = 1) -> int:
+        now = time.time()
+        index = int(now // window)
+        current_key = f"{self.prefix}{key}:{index}"
+        try:
+            # Increment first so concurrent instances never over-admit
+            pipe = self.client.pipeline(transaction=True)
+            pipe.incrby(current_key, cost)
+            pipe.expire(current_key, math.ceil(window * 2))
+            pipe.get(f"{self.prefix}{key}:{index - 1}")
+            current, _, previous = await pipe.execute()
+        except Exception as e:
+            # Fail open: an unreachable limiter must not take logins down with it
+            print(f"[RATE LIMIT] Backend unavailable, allowing request: {e}")
+            return 0
+
+        previous = int(previous or 0)
+        elapsed = now - index * window
+        if _estimate(previous, current, elapsed, window) > limit:
+            if cost:
+                await self.client.decrby(current_key, cost)
+            return _retry_after(previous, current - cost, elapsed, window, limit, cost)
+        return 0
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def backend_from_url(url: str):
+    if url.startswith("memory://"):
+        return MemoryBackend(RATE_LIMIT_MAX_KEYS)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported RATE_LIMIT_BACKEND_URL: {url!r}")
+
+
+# --- Limiter ---
+class RateLimiter:
+    """Guards the bcrypt-backed endpoints: global, per-IP and per-email limits
+    on attempts, plus a separate budget of failed logins per email and IP.
+    Checks run before any hashing or database work and raise 429 with
+    Retry-After; an attempt is only counted once every rule has room for it."""
+
+    def __init__(self, backend, enabled: bool = True, trusted_hops: int = 0,
+                 window: float = 60, per_ip: int = 30, per_email: int = 10, global_limit: int = 600,
+                 failures_per_email: int = 20, failure_window: float = 900):
+        self.backend = backend
+        self.enabled = enabled
+        self.trusted_hops = trusted_hops
+        self.global_rule = Rule("global", global_limit, window)
+        self.ip_rule = Rule("ip", per_ip, window)
+        self.email_rule = Rule("email", per_email, window)
+        self.failure_rule = Rule("failures", failures_per_email, failure_window)
+        # Metrics
+        self.allowed = 0
+        self.limited: Dict[str, int] = {}
+
+    def client_ip(self, request: Request) -> str:
+        """The caller's address; with ``trusted_hops`` proxies in front (Cloud
+        Run's front end is one) it is read from X-Forwarded-For, right to left."""
+        if self.trusted_hops:
+            forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+            if len(forwarded) >= self.trusted_hops:
+                return forwarded[-self.trusted_hops]
+        return request.client.host if request.client else "unknown"
+
+    async def _enforce(self, rule: Rule, key: str, cost: int = 1):
+        # cost=0 asks whether one more attempt would fit, without counting it
+        limit = rule.limit if cost else rule.limit - 1
+        wait = await self.backend.hit(f"{rule.name}:{key}", limit, rule.window, cost)
+        if wait:
+            self.limited[rule.name] = self.limited.get(rule.name, 0) + 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts, please retry later",
+                headers={"Retry-After": str(wait)},
+            )
+
+    async def check(self, request: Request, scope: str, email: str | None = None):
+        """Count one attempt at ``scope`` (e.g. "login") or raise 429."""
+        if not self.enabled:
+            return
+        ip = self.client_ip(request)
+        rules = [(self.global_rule, scope), (self.ip_rule, f"{scope}:{ip}")]
+        if email:
+            email = email.strip().lower()
+            rules.append((self.email_rule, f"{scope}:{email}"))
+            # Failures lock the account for that caller only, so nobody can lock out someone else
+            await self._enforce(self.failure_rule, f"{email}:{ip}", cost=0)
+        # Peek first: a rejected attempt must not use up the budgets it passed
+        for rule, key in rules:
+            await self._enforce(rule, key, cost=0)
+        for rule, key in rules:
+            await self._enforce(rule, key)
+        self.allowed += 1
+
+    async def record_failure(self, request: Request, email: str):
+        if self.enabled:
+            key = f"{self.failure_rule.name}:{email.strip().lower()}:{self.client_ip(request)}"
+            await self.backend.hit(key, self.failure_rule.limit + 1, self.failure_rule.window)
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        stats = {"enabled": self.enabled, "allowed": self.allowed}
+        for name, count in self.limited.items():
+            stats[f"limited_{name}"] = count
+        if isinstance(self.backend, MemoryBackend):
+            stats["keys"] = len(self.backend.counters)
+        return stats
+
+
+rate_limiter = RateLimiter(
+    backend_from_url(RATE_LIMIT_BACKEND_URL),
+    enabled=RATE_LIMIT_ENABLED,
+    trusted_hops=RATE_LIMIT_TRUSTED_HOPS,
+    window=RATE_LIMIT_WINDOW_SECONDS,
+    per_ip=RATE_LIMIT_PER_IP,
+    per_email=RATE_LIMIT_PER_EMAIL,
+    global_limit=RATE_LIMIT_GLOBAL,
+    failures_per_email=RATE_LIMIT_FAILURES_PER_EMAIL,
+    failure_window=RATE_LIMIT_FAILURE_WINDOW_SECONDS,
+)
@@ -0,0 +1,277 @@
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from jose import JWTError, jwt
+from pymongo.errors import DuplicateKeyError
+
+from Application.config import (
+    JWT_SECRET_KEY, ALGORITHM, REVOCATION_BLOOM_CAPACITY, REVOCATION_BLOOM_ERROR_RATE,
+    REVOCATION_LRU_SIZE, REVOCATION_SYNC_SECONDS, REVOCATION_USE_CHANGE_STREAM,
+)
+from Application.db import token_blacklist_collection
+from Application.collection_sync import CollectionSync
+
+# Tokens that cannot be decoded are kept for the longest token lifetime
+FALLBACK_TTL = timedelta(days=7)
+# How often the Bloom filter is rebuilt to shed expired entries
+REBUILD_INTERVAL = timedelta(hours=1)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over a blake2b digest."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def token_key(token: str, claims: dict | None = None) -> str:
+    """Revocation key for a token: its ``jti`` when present, else a SHA-256 of the token."""
+    if claims and claims.get("jti"):
+        return f"jti:{claims['jti']}"
+    return "sha256:" + hashlib.sha256(token.encode()).hexdigest()
+
+
+def subject_key(subject: str) -> str:
+    """Revocation key covering every token of a subject issued up to its ``not_before``."""
+    return f"sub:{subject}"
+
+
+def _unverified_claims(token: str) -> dict | None:
+    try:
+        return jwt.get_unverified_claims(token)
+    except JWTError:
+        return None
+
+
+def _verified_claims(token: str) -> dict | None:
+    """Claims of a token signed by this service, expired or not."""
+    try:
+        return jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})
+    except JWTError:
+        return None
+
+
+def _expiry_from_claims(claims: dict | None) -> datetime:
+    """The token's ``exp``, never later than FALLBACK_TTL from now."""
+    now = datetime.utcnow()
+    exp = claims.get("exp") if claims else None
+    if isinstance(exp, (int, float)):
+        remaining = exp - time.time()
+        if remaining < FALLBACK_TTL.total_seconds():
+            return now + timedelta(seconds=max(remaining, 0))
+    return now + FALLBACK_TTL
+
+
+class RevocationCache:
+    """Per-process view of ``token_blacklist``.
+
+    A Bloom filter answers the common "not revoked" case without touching
+    Mongo; filter hits are confirmed against an LRU of known answers and
+    then the database. Revocations made by other workers arrive through a
+    change stream, or through polling on deployments without a replica set.
+    """
+
+    def __init__(self, collection, capacity: int, error_rate: float,
+                 lru_size: int, sync_seconds: float, use_change_stream: bool = True):
+        self.collection = collection
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.lru_size = lru_size
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._lru: OrderedDict[str, tuple[bool, datetime]] = OrderedDict()
+        # Subject revocations seen by this process: key -> not_before (None when there is none)
+        self._subjects: dict[str, datetime | None] = {}
+        self._ready = False
+        self._loaded_at = datetime.utcnow()
+        self._last_rebuild = datetime.utcnow()
+        # Subject revocations are replaced in place, so replaces are synced too
+        self._sync = CollectionSync(
+            "REVOCATION", collection, "revoked_at", {"key": 1, "expires_at": 1},
+            self._receive, sync_seconds, use_change_stream,
+            operation_types=("insert", "replace"), on_synced=self._maybe_rebuild
+        )
+        # Metrics
+        self.bloom_negatives = 0
+        self.lru_hits = 0
+        self.db_lookups = 0
+
+    # --- Local state ---
+    def _remember(self, key: str, revoked: bool, expires_at: datetime):
+        self._lru[key] = (revoked, expires_at)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _add_local(self, key: str, expires_at: datetime):
+        if key not in self._bloom:
+            self._bloom.add(key)
+        if key.startswith("sub:"):
+            # Its not_before may have moved; look it up again on next use
+            self._subjects.pop(key, None)
+            return
+        self._remember(key, True, expires_at)
+
+    async def _load_all(self) -> BloomFilter:
+        bloom = BloomFilter(max(self.capacity, 1), self.error_rate)
+        now = datetime.utcnow()
+        cursor = self.collection.find({}, {"key": 1, "token": 1, "expires_at": 1})
+        async for doc in cursor:
+            key, expires_at = doc.get("key"), doc.get("expires_at")
+            if key is None:
+                # Entry written before revocation keys existed: backfill it
+                claims = _unverified_claims(doc.get("token", ""))
+                key, expires_at = token_key(doc.get("token", ""), claims), _expiry_from_claims(claims)
+                try:
+                    await self.collection.update_one(
+                        {"_id": doc["_id"]},
+                        {"$set": {"key": key, "expires_at": expires_at, "revoked_at": now}},
+                    )
+                except DuplicateKeyError:
+                    await self.collection.delete_one({"_id": doc["_id"]})
+            if expires_at and expires_at <= now:
+                continue
+            bloom.add(key)
+        return bloom
+
+    async def bootstrap(self):
+        self._loaded_at = datetime.utcnow()
+        self._bloom = await self._load_all()
+        self._last_rebuild = datetime.utcnow()
+        self._ready = True
+
+    # --- Public API ---
+    async def revoke(self, token: str) -> bool:
+        """Revoke ``token``; returns False (and stores nothing) unless this service signed it."""
+        claims = _verified_claims(token)
+        if claims is None:
+            return False
+        key = token_key(token, claims)
+        expires_at = _expiry_from_claims(claims)
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"key": key},
+            {"$setOnInsert": {"key": key, "expires_at": expires_at, "revoked_at": now}},
+            upsert=True,
+        )
+        self._add_local(key, expires_at)
+        return True
+
+    async def revoke_subject(self, subject: str):
+        """Revoke every token issued to ``subject`` so far (by ``iat``).
+
+        Tokens without ``iat`` predate the claim and are all revoked. The entry
+        lives as long as the longest-lived token it can cover.
+        """
+        key = subject_key(subject)
+        now = datetime.utcnow()
+        # A replace (not an update) so change streams carry the full document
+        await self.collection.replace_one(
+            {"key": key},
+            {"key": key, "not_before": now, "expires_at": now + FALLBACK_TTL, "revoked_at": now},
+            upsert=True,
+        )
+        self._add_local(key, now + FALLBACK_TTL)
+        self._subjects[key] = now
+
+    async def _subject_revoked(self, claims: dict | None) -> bool:
+        if not claims or not claims.get("sub"):
+            return False
+        key = subject_key(claims["sub"])
+        if self._ready and key not in self._bloom:
+            return False
+        if key not in self._subjects:
+            self.db_lookups += 1
+            doc = await self.collection.find_one({"key": key}, {"not_before": 1})
+            self._subjects[key] = doc.get("not_before") if doc else None
+            while len(self._subjects) > self.lru_size:
+                self._subjects.pop(next(iter(self._subjects)))
+        not_before = self._subjects[key]
+        if not_before is None:
+            return False
+        issued_at = claims.get("iat")
+        return not isinstance(issued_at, (int, float)) or datetime.utcfromtimestamp(issued_at) <= not_before
+
+    async def is_revoked(self, token: str, claims: dict | None = None) -> bool:
+        if await self._subject_revoked(claims):
+            return True
+        key = token_key(token, claims)
+        if self._ready and key not in self._bloom:
+            self.bloom_negatives += 1
+            return False
+
+        cached = self._lru.get(key)
+        if cached is not None and cached[1] > datetime.utcnow():
+            self._lru.move_to_end(key)
+            self.lru_hits += 1
+            return cached[0]
+
+        self.db_lookups += 1
+        doc = await self.collection.find_one({"key": key}, {"_id": 1})
+        revoked = doc is not None
+        self._remember(key, revoked, _expiry_from_claims(claims))
+        return revoked
+
+    def stats(self) -> dict:
+        return {
+            "bloom_entries": self._bloom.count,
+            "bloom_bits": self._bloom.size,
+            "lru_entries": len(self._lru),
+            "revoked_subjects": sum(1 for v in self._subjects.values() if v is not None),
+            "bloom_negatives": self.bloom_negatives,
+            "lru_hits": self.lru_hits,
+            "db_lookups": self.db_lookups,
+        }
+
+    # --- Cross-worker sync ---
+    def _receive(self, doc: dict):
+        self._add_local(doc["key"], doc.get("expires_at") or datetime.utcnow() + FALLBACK_TTL)
+
+    async def _maybe_rebuild(self):
+        if datetime.utcnow() - self._last_rebuild > REBUILD_INTERVAL:
+            bloom = await self._load_all()
+            # Keep anything revoked locally while the reload was in flight
+            for key, (revoked, _) in self._lru.items():
+                if revoked and key not in bloom:
+                    bloom.add(key)
+            self._bloom = bloom
+            self._last_rebuild = datetime.utcnow()
+
+    async def start(self):
+        await self.bootstrap()
+        # Catch up from just before the initial load
+        self._sync.start(since=self._loaded_at)
+
+    async def stop(self):
+        await self._sync.stop()
+
+
+revocation_cache = RevocationCache(
+    token_blacklist_collection,
+    REVOCATION_BLOOM_CAPACITY,
+    REVOCATION_BLOOM_ERROR_RATE,
+    REVOCATION_LRU_SIZE,
+    REVOCATION_SYNC_SECONDS,
+    REVOCATION_USE_CHANGE_STREAM,
+)
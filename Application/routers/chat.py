@@ -1,14 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
 from datetime import datetime
 from bson import ObjectId
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from typing import List, Dict, Any, Optional
+from pymongo import ASCENDING, DESCENDING
 
 from Application.auth import get_current_user, User
-from Application.db import chats_collection
+from Application.db import chats_collection, chat_messages_collection
+from Application.chat_hub import chat_hub
+from Application.serialization import trusted
+from Application import versioning
+from Application.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor, keyset_after
+)
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
+MESSAGE_KEY = ("time_stamp", "message_id")
+INBOX_KEY = ("last_activity_at", "chat_id")
+PREVIEW_LENGTH = 140
+PARTICIPANT_IDS = {"_id": 0, "participants.user_id": 1}
+
 # --- Models ---
 class ChatParticipant(BaseModel):
     user_id: str
@@ -24,13 +36,167 @@ class ChatMessage(BaseModel):
     message_type: str
     time_stamp: datetime
 
+# Stored messages projected to exactly the ChatMessage shape
+MESSAGE_PROJECTION = {"_id": 0, **{field: 1 for field in ChatMessage.model_fields}}
+
 class ChatCreateRequest(BaseModel):
     participants: List[ChatParticipant]
 
 class ChatResponse(BaseModel):
     chat_id: str
     participants: List[ChatParticipant]
-    messages: List[ChatMessage]
+    messages: List[ChatMessage]  # most recent page, oldest first
+    before_cursor: Optional[str] = None
+
+class MessageCreateRequest(BaseModel):
+    text: str
+    message_type: str = "text"
+
+class LastMessage(BaseModel):
+    message_id: str
+    sender_id: str
+    sender_name: str
+    text: str  # first PREVIEW_LENGTH characters
+    message_type: str
+    time_stamp: datetime
+
+class InboxChat(BaseModel):
+    chat_id: str
+    transactional_group_id: Optional[str] = None
+    participants: List[ChatParticipant]
+    last_message: Optional[LastMessage] = None
+    last_activity_at: datetime
+    unread_count: int
+
+class InboxPage(BaseModel):
+    chats: List[InboxChat]  # most recent activity first
+    next_cursor: Optional[str] = None
+
+class ReadRequest(BaseModel):
+    message_ids: List[str]
+
+class MessagePage(BaseModel):
+    messages: List[ChatMessage]  # oldest first
+    has_more: bool
+    before_cursor: Optional[str] = None  # pass as `before` for older messages
+    after_cursor: Optional[str] = None   # pass as `after` for newer messages
+
+
+# --- Helpers ---
+async def require_participant(chat_id: str, user: User, projection: Optional[Dict[str, Any]] = None):
+    chat_doc = await chats_collection.find_one(
+        {"chat_id": chat_id, "participants.user_id": user.id},
+        projection or {"_id": 1}
+    )
+    if not chat_doc:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return chat_doc
+
+async def fetch_message_page(
+    chat_id: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE
+) -> Dict[str, Any]:
+    """Keyset page over (time_stamp, message_id); returned oldest first."""
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
+
+    query: Dict[str, Any] = {"chat_id": chat_id}
+    if after:
+        query.update(keyset_after(MESSAGE_KEY, decode_cursor(after, 2)))
+        sort = [("time_stamp", ASCENDING), ("message_id", ASCENDING)]
+    else:
+        if before:
+            query.update(keyset_after(MESSAGE_KEY, decode_cursor(before, 2), descending=True))
+        sort = [("time_stamp", DESCENDING), ("message_id", DESCENDING)]
+
+    docs = await chat_messages_collection.find(query, MESSAGE_PROJECTION) \
+        .sort(sort).limit(limit + 1).to_list(length=limit + 1)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    if not after:
+        docs.reverse()
+
+    return {
+        "messages": docs,
+        "has_more": has_more,
+        "before_cursor": encode_cursor(docs[0]["time_stamp"], docs[0]["message_id"]) if docs else before,
+        "after_cursor": encode_cursor(docs[-1]["time_stamp"], docs[-1]["message_id"]) if docs else after,
+    }
+
+def participant_ids(chat_doc: Dict[str, Any]) -> List[str]:
+    return [p["user_id"] for p in chat_doc.get("participants", [])]
+
+def empty_inbox_fields(now: datetime) -> Dict[str, Any]:
+    """Inbox fields of a chat without messages (see ``create_message``)."""
+    return {"last_message": None, "last_activity_at": now, "read_state": {}}
+
+async def create_message(chat_id: str, user: User, text: str, message_type: str) -> Dict[str, Any]:
+    """Persist a message and fan it out to connected participants.
+
+    Membership is read per message, so long-lived sockets count unread
+    messages for members added since they connected (and a removed sender
+    gets a 404). The chat's inbox fields are updated in one write: the
+    last-message preview, activity time, and the unread counter of every
+    other participant (the sender's read cursor moves to this message).
+    """
+    participants = participant_ids(await require_participant(chat_id, user, PARTICIPANT_IDS))
+    message = {
+        "chat_id": chat_id,
+        "message_id": str(ObjectId()),
+        "sender": {
+            "id": user.id,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "email": user.email
+        },
+        "seen_by": [user.id],
+        "text": text,
+        "message_type": message_type,
+        "time_stamp": datetime.utcnow()
+    }
+    await chat_messages_collection.insert_one(message)
+    await chats_collection.update_one({"chat_id": chat_id}, {
+        "$set": {
+            "last_message": {
+                "message_id": message["message_id"],
+                "sender_id": user.id,
+                "sender_name": f"{user.first_name} {user.last_name}".strip(),
+                "text": text[:PREVIEW_LENGTH],
+                "message_type": message_type,
+                "time_stamp": message["time_stamp"]
+            },
+            "last_activity_at": message["time_stamp"],
+            f"read_state.{user.id}.unread_count": 0,
+            f"read_state.{user.id}.last_read_at": message["time_stamp"]
+        },
+        "$inc": {
+            **{f"read_state.{uid}.unread_count": 1 for uid in set(participants) if uid != user.id},
+            **versioning.BUMP
+        }
+    })
+    message.pop("_id", None)
+    await chat_hub.publish(chat_id, {"type": "message", "message": message})
+    return message
+
+async def mark_read(chat_id: str, user: User, message_ids: List[str]):
+    """Add the user to ``seen_by`` and push a read receipt to participants.
+
+    Only messages the user had not seen yet are counted off their unread
+    counter, so repeated receipts never push it below the true count.
+    """
+    if not message_ids:
+        return
+    result = await chat_messages_collection.update_many(
+        {"chat_id": chat_id, "message_id": {"$in": message_ids}, "seen_by": {"$ne": user.id}},
+        {"$addToSet": {"seen_by": user.id}}
+    )
+    await chats_collection.update_one({"chat_id": chat_id}, {
+        "$inc": {f"read_state.{user.id}.unread_count": -result.modified_count, **versioning.BUMP},
+        "$max": {f"read_state.{user.id}.last_read_at": datetime.utcnow()}
+    })
+    await chat_hub.publish(chat_id, {"type": "read", "user_id": user.id, "message_ids": message_ids})
 
 # --- Create Chat (internal use for transactional groups) ---
 @router.post("/create", response_model=ChatResponse)
@@ -41,16 +207,140 @@ async def create_chat(
     chat_data = {
         "chat_id": str(ObjectId()),
         "participants": [p.dict() for p in request.participants],
-        "messages": []
+        "version": 1,
+        **empty_inbox_fields(datetime.utcnow())
     }
 
     await chats_collection.insert_one(chat_data)
-    return chat_data
+    return {**chat_data, "messages": []}
+
+# --- Inbox ---
+@router.get("/inbox", response_model=InboxPage)
+async def get_inbox(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """The user's chats, most recent activity first, with their unread counts.
+
+    One index-backed query over ``(participants.user_id, last_activity_at)``;
+    pass `next_cursor` back as `cursor` for the next page.
+    """
+    query: Dict[str, Any] = {"participants.user_id": current_user.id}
+    if cursor:
+        query.update(keyset_after(INBOX_KEY, decode_cursor(cursor, 2), descending=True))
+    projection = {
+        "_id": 0, "chat_id": 1, "transactional_group_id": 1, "participants": 1,
+        "last_message": 1, "last_activity_at": 1, f"read_state.{current_user.id}.unread_count": 1
+    }
+    chats = await chats_collection.find(query, projection) \
+        .sort([("last_activity_at", DESCENDING), ("chat_id", DESCENDING)]) \
+        .limit(limit) \
+        .to_list(length=limit)
+
+    for chat in chats:
+        read_state = chat.pop("read_state", {}).get(current_user.id, {})
+        chat["unread_count"] = max(0, read_state.get("unread_count", 0))
+        chat.setdefault("last_message", None)
+    next_cursor = None
+    if len(chats) == limit:
+        next_cursor = encode_cursor(chats[-1]["last_activity_at"], chats[-1]["chat_id"])
+    return trusted({"chats": chats, "next_cursor": next_cursor})
 
 # --- Get Chat by Transactional Group ID ---
 @router.get("/from-transactional-group/{transactional_group_id}", response_model=ChatResponse)
-async def get_chat_from_group(transactional_group_id: str, current_user: User = Depends(get_current_user)):
-    chat_doc = await chats_collection.find_one({"transactional_group_id": transactional_group_id})
+async def get_chat_from_group(
+    transactional_group_id: str,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user)
+):
+    """Chat with its latest message page; 304 while the chat version is unchanged."""
+    chat_doc = await chats_collection.find_one(
+        {"transactional_group_id": transactional_group_id, "participants.user_id": current_user.id},
+        {"_id": 0, "chat_id": 1, "participants": 1, "version": 1}
+    )
     if not chat_doc:
         raise HTTPException(status_code=404, detail="Chat not found for this group")
-    return chat_doc
+    tag = versioning.etag("chat", chat_doc["chat_id"], chat_doc.pop("version", 0))
+    if versioning.matches(request, tag):
+        return versioning.not_modified(tag)
+
+    page = await fetch_message_page(chat_doc["chat_id"])
+    return versioning.tagged(
+        {**chat_doc, "messages": page["messages"], "before_cursor": page["before_cursor"]}, tag, response
+    )
+
+# --- Messages ---
+@router.get("/{chat_id}/messages", response_model=MessagePage)
+async def get_messages(
+    chat_id: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user)
+):
+    await require_participant(chat_id, current_user)
+    return trusted(await fetch_message_page(chat_id, before, after, limit))
+
+@router.post("/{chat_id}/messages", response_model=ChatMessage)
+async def send_message(
+    chat_id: str,
+    request: MessageCreateRequest,
+    current_user: User = Depends(get_current_user)
+):
+    return await create_message(chat_id, current_user, request.text, request.message_type)
+
+@router.post("/{chat_id}/read")
+async def read_messages(
+    chat_id: str,
+    request: ReadRequest,
+    current_user: User = Depends(get_current_user)
+):
+    await require_participant(chat_id, current_user)
+    await mark_read(chat_id, current_user, request.message_ids)
+    return {"message": "Messages marked as read"}
+
+# --- Real-time delivery ---
+@router.websocket("/ws/{chat_id}")
+async def chat_socket(websocket: WebSocket, chat_id: str, token: str = Query(...)):
+    """Live chat stream authenticated with the same bearer token as the REST API.
+
+    Client frames: ``{"type": "message", "text": ..., "message_type": "text"}``
+    and ``{"type": "read", "message_ids": [...]}``. Server frames are the
+    resulting ``message`` and ``read`` events for everyone in the chat.
+    """
+    try:
+        user = await get_current_user(token)
+        await require_participant(chat_id, user)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    await chat_hub.connect(chat_id, websocket)
+    try:
+        while True:
+            frame = await websocket.receive_json()
+            kind = frame.get("type") if isinstance(frame, dict) else None
+            try:
+                # Frames go through the same models as the REST routes
+                if kind == "message":
+                    request = MessageCreateRequest.model_validate(frame)
+                    await create_message(chat_id, user, request.text, request.message_type)
+                elif kind == "read":
+                    request = ReadRequest.model_validate(frame)
+                    await require_participant(chat_id, user)
+                    await mark_read(chat_id, user, request.message_ids)
+                else:
+                    await websocket.send_json({"type": "error", "detail": "Unsupported frame"})
+            except ValidationError:
+                await websocket.send_json({"type": "error", "detail": "Invalid frame"})
+            except HTTPException as e:
+                # Removed from the chat since connecting
+                await websocket.send_json({"type": "error", "detail": e.detail})
+                break
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        await chat_hub.disconnect(chat_id, websocket)
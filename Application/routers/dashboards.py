@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from datetime import datetime
 from bson import ObjectId
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from pydantic import BaseModel, Field
+from pymongo import ReturnDocument
+from typing import Callable, List, Dict, Any, Optional
 
 from Application.auth import get_current_user, User
 from Application.db import dashboards_collection
+from Application.serialization import trusted
+from Application import versioning
+from Application.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, parse_fields, list_owned_and_shared
+)
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
@@ -15,18 +21,165 @@ class DashboardCreateRequest(BaseModel):
     description: str
     theme_color: str
 
+# Bank account and credit card sub-resources (amounts in cents)
+class BankAccountCreateRequest(BaseModel):
+    name: str
+    institution: Optional[str] = None
+    balance_cents: int
+
+class BankAccountUpdateRequest(BaseModel):
+    name: Optional[str] = None
+    institution: Optional[str] = None
+    balance_cents: Optional[int] = None
+
+class BankAccount(BankAccountCreateRequest):
+    account_id: str
+
+class CreditCardCreateRequest(BaseModel):
+    name: str
+    issuer: Optional[str] = None
+    last4: Optional[str] = Field(None, pattern=r"^\d{4}$")
+    balance_cents: int  # amount owed
+    limit_cents: int = Field(ge=0)
+
+class CreditCardUpdateRequest(BaseModel):
+    name: Optional[str] = None
+    issuer: Optional[str] = None
+    last4: Optional[str] = Field(None, pattern=r"^\d{4}$")
+    balance_cents: Optional[int] = None
+    limit_cents: Optional[int] = Field(None, ge=0)
+
+class CreditCard(CreditCardCreateRequest):
+    card_id: str
+
+# Maintained with $inc by every account/card write, so list views never sum the arrays
+class DashboardSummary(BaseModel):
+    total_balance_cents: int = 0
+    credit_balance_cents: int = 0
+    credit_limit_cents: int = 0
+    bank_account_count: int = 0
+    credit_card_count: int = 0
+    credit_utilization: float = 0.0  # derived on read from the two credit totals
+
 # Response model
 class DashboardResponse(BaseModel):
     dashboard_id: str
     owner_id: str
     title: str
     shared_with: List[str]
-    bank_accounts: List[Dict[str, Any]]
+    bank_accounts: List[BankAccount]
     defaults: Dict[str, Any]
     created_on: datetime
     description: str
     theme_color: str
-    credit_cards: List[Dict[str, Any]]
+    credit_cards: List[CreditCard]
+    summary: DashboardSummary
+    version: int = 0
+
+DASHBOARD_FIELDS = set(DashboardResponse.model_fields)
+# List views skip the account and card arrays unless asked for via `fields=`
+DASHBOARD_LIST_FIELDS = [
+    "dashboard_id", "owner_id", "title", "shared_with", "created_on",
+    "description", "theme_color", "summary"
+]
+
+
+# --- Helpers ---
+# Element fields the summary is computed from; writes are conditional on them
+SUMMARY_INPUTS = ("balance_cents", "limit_cents")
+
+# Items not yet converted by the dashboard-summaries migration count as zero
+def account_totals(account: dict) -> Dict[str, int]:
+    return {"total_balance_cents": account.get("balance_cents", 0), "bank_account_count": 1}
+
+def card_totals(card: dict) -> Dict[str, int]:
+    return {
+        "credit_balance_cents": card.get("balance_cents", 0),
+        "credit_limit_cents": card.get("limit_cents", 0),
+        "credit_card_count": 1,
+    }
+
+def with_utilization(summary: Optional[dict]) -> dict:
+    summary = {**DashboardSummary().model_dump(), **(summary or {})}
+    limit = summary["credit_limit_cents"]
+    summary["credit_utilization"] = round(summary["credit_balance_cents"] / limit, 4) if limit else 0.0
+    return summary
+
+def summary_inc(totals: Dict[str, int], sign: int = 1) -> Dict[str, int]:
+    return {f"summary.{field}": sign * value for field, value in totals.items() if value}
+
+async def summary_written(dashboard: dict) -> dict:
+    """Summary of a just-written dashboard; every member's list changed with it."""
+    await versioning.bump_collection_version(
+        versioning.DASHBOARDS, [dashboard["owner_id"], *dashboard.get("shared_with", [])]
+    )
+    return with_utilization(dashboard.get("summary"))
+
+def accessible(dashboard_id: str, user: User) -> dict:
+    return {"dashboard_id": dashboard_id, "$or": [{"owner_id": user.id}, {"shared_with": user.id}]}
+
+async def find_item(dashboard_id: str, user: User, array: str, id_field: str, item_id: str) -> dict:
+    dashboard = await dashboards_collection.find_one(
+        {**accessible(dashboard_id, user), f"{array}.{id_field}": item_id},
+        {"_id": 0, array: {"$elemMatch": {id_field: item_id}}}
+    )
+    if not dashboard:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return dashboard[array][0]
+
+async def apply_item_write(dashboard_id: str, array: str, id_field: str, old: dict, update: dict) -> dict:
+    """Run ``update`` only if the element still has the values its summary
+    contribution was computed from; returns the new summary.
+
+    Access was checked when ``old`` was read. The filter names no other
+    array (such as ``shared_with``) so the positional ``$`` binds to the
+    ``$elemMatch``-ed element.
+    """
+    guard = {id_field: old[id_field], **{f: old[f] for f in SUMMARY_INPUTS if f in old}}
+    dashboard = await dashboards_collection.find_one_and_update(
+        {"dashboard_id": dashboard_id, array: {"$elemMatch": guard}},
+        update,
+        projection={"summary": 1, "owner_id": 1, "shared_with": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not dashboard:
+        raise HTTPException(status_code=409, detail="Item was modified concurrently, reload and retry")
+    return await summary_written(dashboard)
+
+async def add_item(dashboard_id: str, user: User, array: str, item: dict, totals: Dict[str, int]) -> dict:
+    dashboard = await dashboards_collection.find_one_and_update(
+        accessible(dashboard_id, user),
+        {"$push": {array: item}, "$inc": {**summary_inc(totals), **versioning.BUMP}},
+        projection={"summary": 1, "owner_id": 1, "shared_with": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not dashboard:
+        raise HTTPException(status_code=404, detail="Dashboard not found")
+    return await summary_written(dashboard)
+
+async def update_item(
+    dashboard_id: str, user: User, array: str, id_field: str, item_id: str,
+    changes: dict, totals: Callable[[dict], Dict[str, int]]
+) -> tuple[dict, dict]:
+    if not changes:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    old = await find_item(dashboard_id, user, array, id_field, item_id)
+    new = {**old, **changes}
+    old_totals = totals(old)
+    update = {
+        "$set": {f"{array}.$.{field}": value for field, value in changes.items()},
+        "$inc": {**summary_inc({f: v - old_totals[f] for f, v in totals(new).items()}), **versioning.BUMP},
+    }
+    return new, await apply_item_write(dashboard_id, array, id_field, old, update)
+
+async def remove_item(
+    dashboard_id: str, user: User, array: str, id_field: str, item_id: str,
+    totals: Callable[[dict], Dict[str, int]]
+) -> dict:
+    old = await find_item(dashboard_id, user, array, id_field, item_id)
+    update = {"$pull": {array: {id_field: item_id}}, "$inc": {**summary_inc(totals(old), sign=-1), **versioning.BUMP}}
+    return await apply_item_write(dashboard_id, array, id_field, old, update)
+
 
 @router.post("/create", response_model=DashboardResponse)
 async def create_dashboard(
@@ -43,32 +196,135 @@ async def create_dashboard(
         "created_on": datetime.utcnow(),
         "description": request.description,
         "theme_color": request.theme_color,
-        "credit_cards": []
+        "credit_cards": [],
+        "summary": DashboardSummary().model_dump(exclude={"credit_utilization"}),
+        "version": 1
     }
 
     await dashboards_collection.insert_one(dashboard_data)
-    return dashboard_data
+    await versioning.bump_collection_version(versioning.DASHBOARDS, [current_user.id])
+    dashboard_data.pop("_id")
+    dashboard_data["summary"] = with_utilization(dashboard_data["summary"])
+    return trusted(dashboard_data)
 
 
 # ---------------- Get all dashboards for logged-in user ----------------
 @router.get("/my-dashboards")
-async def get_my_dashboards(current_user: User = Depends(get_current_user)):
-    """Returns dashboards owned by and shared with the current user."""
-    
-    owned_dashboards = await dashboards_collection.find(
-        {"owner_id": current_user.id}
-    ).to_list(length=None)
-
-    shared_dashboards = await dashboards_collection.find(
-        {"shared_with": {"$in": [current_user.id]}}
-    ).to_list(length=None)
-
-    # Convert ObjectId to str in MongoDB results
-    def serialize(doc):
-        doc["_id"] = str(doc["_id"])
-        return doc
+async def get_my_dashboards(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    owned_cursor: Optional[str] = None,
+    shared_cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to include"),
+    current_user: User = Depends(get_current_user)
+):
+    """Returns dashboards owned by and shared with the current user, newest first.
 
-    return {
-        "owned": [serialize(d) for d in owned_dashboards],
-        "shared_access": [serialize(d) for d in shared_dashboards]
-    }
+    Each list pages independently: pass the returned `owned_cursor` /
+    `shared_cursor` back to continue it. Answers 304 when `If-None-Match`
+    still matches: no dashboard in either list changed since.
+    """
+    tag = versioning.etag(
+        versioning.DASHBOARDS, current_user.id,
+        await versioning.collection_version(versioning.DASHBOARDS, current_user.id),
+        request.url.query
+    )
+    if versioning.matches(request, tag):
+        return versioning.not_modified(tag)
+
+    page = await list_owned_and_shared(
+        dashboards_collection,
+        current_user.id,
+        parse_fields(fields, DASHBOARD_FIELDS, DASHBOARD_LIST_FIELDS),
+        limit,
+        owned_cursor,
+        shared_cursor
+    )
+    for dashboard in page["owned"] + page["shared_access"]:
+        if "summary" in dashboard:
+            dashboard["summary"] = with_utilization(dashboard["summary"])
+    return versioning.tagged(page, tag, response)
+
+
+# ---------------- Summary ----------------
+@router.get("/{dashboard_id}/summary", response_model=DashboardSummary)
+async def get_dashboard_summary(dashboard_id: str, current_user: User = Depends(get_current_user)):
+    dashboard = await dashboards_collection.find_one(
+        accessible(dashboard_id, current_user), {"_id": 0, "summary": 1}
+    )
+    if not dashboard:
+        raise HTTPException(status_code=404, detail="Dashboard not found")
+    return trusted(with_utilization(dashboard.get("summary")))
+
+
+# ---------------- Bank accounts ----------------
+@router.post("/{dashboard_id}/bank-accounts")
+async def add_bank_account(
+    dashboard_id: str,
+    request: BankAccountCreateRequest,
+    current_user: User = Depends(get_current_user)
+):
+    account = {"account_id": str(ObjectId()), **request.model_dump()}
+    summary = await add_item(dashboard_id, current_user, "bank_accounts", account, account_totals(account))
+    return trusted({"bank_account": account, "summary": summary})
+
+
+@router.patch("/{dashboard_id}/bank-accounts/{account_id}")
+async def update_bank_account(
+    dashboard_id: str,
+    account_id: str,
+    request: BankAccountUpdateRequest,
+    current_user: User = Depends(get_current_user)
+):
+    account, summary = await update_item(
+        dashboard_id, current_user, "bank_accounts", "account_id", account_id,
+        request.model_dump(exclude_none=True), account_totals
+    )
+    return trusted({"bank_account": account, "summary": summary})
+
+
+@router.delete("/{dashboard_id}/bank-accounts/{account_id}")
+async def remove_bank_account(
+    dashboard_id: str,
+    account_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    summary = await remove_item(dashboard_id, current_user, "bank_accounts", "account_id", account_id, account_totals)
+    return trusted({"summary": summary})
+
+
+# ---------------- Credit cards ----------------
+@router.post("/{dashboard_id}/credit-cards")
+async def add_credit_card(
+    dashboard_id: str,
+    request: CreditCardCreateRequest,
+    current_user: User = Depends(get_current_user)
+):
+    card = {"card_id": str(ObjectId()), **request.model_dump()}
+    summary = await add_item(dashboard_id, current_user, "credit_cards", card, card_totals(card))
+    return trusted({"credit_card": card, "summary": summary})
+
+
+@router.patch("/{dashboard_id}/credit-cards/{card_id}")
+async def update_credit_card(
+    dashboard_id: str,
+    card_id: str,
+    request: CreditCardUpdateRequest,
+    current_user: User = Depends(get_current_user)
+):
+    card, summary = await update_item(
+        dashboard_id, current_user, "credit_cards", "card_id", card_id,
+        request.model_dump(exclude_none=True), card_totals
+    )
+    return trusted({"credit_card": card, "summary": summary})
+
+
+@router.delete("/{dashboard_id}/credit-cards/{card_id}")
+async def remove_credit_card(
+    dashboard_id: str,
+    card_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    summary = await remove_item(dashboard_id, current_user, "credit_cards", "card_id", card_id, card_totals)
+    return trusted({"summary": summary})
@@ -0,0 +1,228 @@
+import csv
+import io
+import zlib
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional
+
+from Application.auth import get_current_user, User
+from Application.config import EXPORT_BATCH_SIZE, EXPORT_GZIP_LEVEL
+from Application.db import (
+    chats_collection, chat_messages_collection, dashboards_collection,
+    transactional_groups_collection, ledger_entries_collection
+)
+from Application.serialization import dumps
+from Application.pagination import keyset_after
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+class ExportSpec(NamedTuple):
+    name: str
+    collection: Any
+    key_field: str          # record id; the resume cursor is the last one received
+    sort: List[str]         # ascending, ending in a unique field
+    projection: Dict[str, int]
+    columns: List[str]
+    row: Callable[[dict], list]
+
+
+def _iso(value: Optional[datetime]) -> str:
+    return value.isoformat() if value else ""
+
+
+MESSAGES = ExportSpec(
+    name="messages",
+    collection=chat_messages_collection,
+    key_field="message_id",
+    sort=["time_stamp", "message_id"],
+    projection={"_id": 0, "message_id": 1, "sender": 1, "text": 1, "message_type": 1, "time_stamp": 1, "seen_by": 1},
+    columns=["message_id", "time_stamp", "sender_id", "sender_email", "message_type", "text"],
+    row=lambda m: [
+        m["message_id"], _iso(m["time_stamp"]), m["sender"].get("id", ""),
+        m["sender"].get("email", ""), m.get("message_type", ""), m.get("text", ""),
+    ],
+)
+DASHBOARDS = ExportSpec(
+    name="dashboards",
+    collection=dashboards_collection,
+    key_field="dashboard_id",
+    sort=["_id"],
+    projection={
+        "dashboard_id": 1, "owner_id": 1, "title": 1, "description": 1, "theme_color": 1,
+        "created_on": 1, "shared_with": 1, "bank_accounts": 1, "credit_cards": 1, "summary": 1
+    },
+    columns=[
+        "dashboard_id", "owner_id", "title", "description", "created_on",
+        "total_balance_cents", "credit_balance_cents", "credit_limit_cents",
+        "bank_account_count", "credit_card_count",
+    ],
+    row=lambda d: [
+        d["dashboard_id"], d["owner_id"], d.get("title", ""), d.get("description", ""), _iso(d.get("created_on")),
+        *(d.get("summary", {}).get(field, 0) for field in (
+            "total_balance_cents", "credit_balance_cents", "credit_limit_cents",
+            "bank_account_count", "credit_card_count",
+        )),
+    ],
+)
+TRANSACTIONAL_GROUPS = ExportSpec(
+    name="transactional-groups",
+    collection=transactional_groups_collection,
+    key_field="transactional_group_id",
+    sort=["_id"],
+    projection={
+        "transactional_group_id": 1, "owner_id": 1, "title": 1, "description": 1, "color": 1,
+        "created_on": 1, "is_active": 1, "shared_with": 1, "chat_id": 1, "balances": 1
+    },
+    columns=["transactional_group_id", "owner_id", "title", "description", "created_on", "is_active", "chat_id"],
+    row=lambda g: [
+        g["transactional_group_id"], g["owner_id"], g.get("title", ""), g.get("description", ""),
+        _iso(g.get("created_on")), g.get("is_active", True), g.get("chat_id", ""),
+    ],
+)
+EXPENSES = ExportSpec(
+    name="expenses",
+    collection=ledger_entries_collection,
+    key_field="expense_id",
+    sort=["created_at", "expense_id"],
+    projection={
+        "_id": 0, "expense_id": 1, "description": 1, "amount_cents": 1, "paid_by": 1,
+        "split_type": 1, "splits": 1, "created_by": 1, "created_at": 1, "updated_at": 1
+    },
+    columns=["expense_id", "created_at", "description", "amount_cents", "paid_by", "split_type", "splits"],
+    row=lambda e: [
+        e["expense_id"], _iso(e["created_at"]), e.get("description", ""), e["amount_cents"], e["paid_by"],
+        e["split_type"], ";".join(f"{s['user_id']}:{s['amount_cents']}" for s in e["splits"]),
+    ],
+)
+
+
+# --- Helpers ---
+def _csv_line(values: list) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue().encode()
+
+async def resume_filter(spec: ExportSpec, scope: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+    """Restrict ``scope`` to records sorted after the record named by ``cursor``."""
+    if not cursor:
+        return scope
+    last = await spec.collection.find_one(
+        {**scope, spec.key_field: cursor}, {field: 1 for field in spec.sort}
+    )
+    if not last:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if len(spec.sort) == 1:
+        after = {spec.sort[0]: {"$gt": last[spec.sort[0]]}}
+    else:
+        after = keyset_after(tuple(spec.sort), [last[field] for field in spec.sort])
+    return {"$and": [scope, after]}
+
+async def stream_records(spec: ExportSpec, query: Dict[str, Any], fmt: str, compress: bool) -> AsyncIterator[bytes]:
+    """Encode one cursor batch at a time, so memory stays at one batch whatever the size."""
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+
+    def emit(data: bytes) -> bytes:
+        if compressor is None:
+            return data
+        # Sync-flush each chunk so the client can decode as it arrives
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    if fmt == "csv":
+        encode = lambda doc: _csv_line(spec.row(doc))
+        yield emit(_csv_line(spec.columns))
+    else:
+        encode = lambda doc: dumps(doc) + b"\n"
+
+    cursor = spec.collection.find(query, spec.projection) \
+        .sort([(field, 1) for field in spec.sort]) \
+        .batch_size(EXPORT_BATCH_SIZE)
+    try:
+        chunk: List[bytes] = []
+        async for doc in cursor:
+            doc.pop("_id", None)
+            chunk.append(encode(doc))
+            if len(chunk) >= EXPORT_BATCH_SIZE:
+                yield emit(b"".join(chunk))
+                chunk = []
+        if chunk:
+            yield emit(b"".join(chunk))
+        if compressor is not None:
+            yield compressor.flush()
+    finally:
+        await cursor.close()
+
+async def export_response(
+    spec: ExportSpec, scope: Dict[str, Any], fmt: str, compress: bool, cursor: Optional[str]
+) -> StreamingResponse:
+    query = await resume_filter(spec, scope, cursor)
+    filename = f"{spec.name}.{fmt}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(stream_records(spec, query, fmt, compress), media_type=FORMATS[fmt], headers=headers)
+
+def owned_or_shared(user: User) -> Dict[str, Any]:
+    return {"$or": [{"owner_id": user.id}, {"shared_with": user.id}]}
+
+FORMAT_QUERY = Query("ndjson", pattern="^(ndjson|csv)$")
+GZIP_QUERY = Query(False, description="Stream gzip-encoded (Content-Encoding: gzip)")
+CURSOR_QUERY = Query(None, description="Id of the last record received; the export resumes after it")
+
+
+# --- Chat history ---
+@router.get("/chats/{chat_id}/messages")
+async def export_chat_messages(
+    chat_id: str,
+    format: str = FORMAT_QUERY,
+    gzip: bool = GZIP_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    current_user: User = Depends(get_current_user)
+):
+    """Every message of a chat, oldest first."""
+    if not await chats_collection.find_one({"chat_id": chat_id, "participants.user_id": current_user.id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return await export_response(MESSAGES, {"chat_id": chat_id}, format, gzip, cursor)
+
+
+# --- Dashboards and groups ---
+@router.get("/dashboards")
+async def export_dashboards(
+    format: str = FORMAT_QUERY,
+    gzip: bool = GZIP_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    current_user: User = Depends(get_current_user)
+):
+    """Dashboards owned by or shared with the user. NDJSON includes accounts and cards."""
+    return await export_response(DASHBOARDS, owned_or_shared(current_user), format, gzip, cursor)
+
+
+@router.get("/transactional-groups")
+async def export_transactional_groups(
+    format: str = FORMAT_QUERY,
+    gzip: bool = GZIP_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    current_user: User = Depends(get_current_user)
+):
+    """Transactional groups owned by or shared with the user. NDJSON includes balances."""
+    return await export_response(TRANSACTIONAL_GROUPS, owned_or_shared(current_user), format, gzip, cursor)
+
+
+@router.get("/transactional-groups/{group_id}/expenses")
+async def export_expenses(
+    group_id: str,
+    format: str = FORMAT_QUERY,
+    gzip: bool = GZIP_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    current_user: User = Depends(get_current_user)
+):
+    """A group's ledger, oldest first."""
+    if not await transactional_groups_collection.find_one(
+        {"transactional_group_id": group_id, **owned_or_shared(current_user)}, {"_id": 1}
+    ):
+        raise HTTPException(status_code=404, detail="Transactional group not found")
+    scope = {"transactional_group_id": group_id, "deleted": {"$ne": True}}
+    return await export_response(EXPENSES, scope, format, gzip, cursor)
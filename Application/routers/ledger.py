@@ -0,0 +1,304 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from datetime import datetime
+from bson import ObjectId
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from Application.auth import get_current_user, User
+from Application.db import ledger_entries_collection, transactional_groups_collection
+from Application.serialization import trusted
+from Application.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor, keyset_after
+from Application import ledger, versioning
+
+router = APIRouter(prefix="/transactional-group", tags=["Ledger"])
+
+# --- Models ---
+class SplitShare(BaseModel):
+    user_id: str
+    amount_cents: int = Field(ge=0)
+
+class ExpenseCreateRequest(BaseModel):
+    description: str
+    amount_cents: int = Field(gt=0)
+    paid_by: Optional[str] = None            # defaults to the current user
+    split_between: Optional[List[str]] = None  # equal split; defaults to every member
+    splits: Optional[List[SplitShare]] = None  # exact split, must add up to amount_cents
+
+class ExpenseUpdateRequest(BaseModel):
+    description: Optional[str] = None
+    amount_cents: Optional[int] = Field(None, gt=0)
+    paid_by: Optional[str] = None
+    split_between: Optional[List[str]] = None
+    splits: Optional[List[SplitShare]] = None
+    version: Optional[int] = None  # reject the edit if the expense changed since this version
+
+class ExpenseResponse(BaseModel):
+    expense_id: str
+    transactional_group_id: str
+    description: str
+    amount_cents: int
+    paid_by: str
+    split_type: str  # "equal" or "exact"
+    splits: List[SplitShare]
+    created_by: str
+    created_at: datetime
+    updated_at: datetime
+    version: int
+
+EXPENSE_PROJECTION = {"_id": 0, **{field: 1 for field in ExpenseResponse.model_fields}}
+
+
+# --- Helpers ---
+async def get_member_group(group_id: str, user: User) -> dict:
+    group = await transactional_groups_collection.find_one(
+        {"transactional_group_id": group_id, "$or": [{"owner_id": user.id}, {"shared_with": user.id}]},
+        {"_id": 0, "owner_id": 1, "shared_with": 1, "balances": 1, "ledger_ops": 1, "version": 1}
+    )
+    if not group:
+        raise HTTPException(status_code=404, detail="Transactional group not found")
+    return group
+
+def group_members(group: dict) -> List[str]:
+    return [group["owner_id"], *(uid for uid in group.get("shared_with", []) if uid != group["owner_id"])]
+
+def check_members(user_ids: List[str], members: List[str]):
+    outsiders = sorted(set(user_ids) - set(members))
+    if outsiders:
+        raise HTTPException(status_code=400, detail=f"Not members of this group: {', '.join(outsiders)}")
+
+def build_splits(
+    amount_cents: int,
+    members: List[str],
+    split_between: Optional[List[str]],
+    splits: Optional[List[SplitShare]]
+) -> tuple[str, List[dict]]:
+    if split_between is not None and splits is not None:
+        raise HTTPException(status_code=400, detail="Give either split_between or splits, not both")
+    if splits is not None:
+        user_ids = [s.user_id for s in splits]
+        if not user_ids or len(set(user_ids)) != len(user_ids):
+            raise HTTPException(status_code=400, detail="splits must name each member once")
+        if sum(s.amount_cents for s in splits) != amount_cents:
+            raise HTTPException(status_code=400, detail="splits must add up to amount_cents")
+        check_members(user_ids, members)
+        return "exact", [s.model_dump() for s in splits]
+
+    user_ids = members if split_between is None else split_between
+    if not user_ids or len(set(user_ids)) != len(user_ids):
+        raise HTTPException(status_code=400, detail="split_between must name each member once")
+    check_members(user_ids, members)
+    return "equal", [
+        {"user_id": uid, "amount_cents": cents}
+        for uid, cents in ledger.equal_split(amount_cents, user_ids).items()
+    ]
+
+def public_expense(entry: dict) -> dict:
+    return {field: entry[field] for field in ExpenseResponse.model_fields}
+
+def balances_tag(group_id: str, version: int) -> str:
+    return versioning.etag("balances", group_id, version)
+
+def written(content: dict, group_id: str, version: int | None, response: Response):
+    """Response to a ledger write, tagged with the group's new balances ETag."""
+    if version is None:
+        return trusted(content)
+    return versioning.tagged(content, balances_tag(group_id, version), response)
+
+
+# --- Add expense ---
+@router.post("/{group_id}/expenses", response_model=ExpenseResponse)
+async def add_expense(
+    group_id: str,
+    request: ExpenseCreateRequest,
+    response: Response,
+    current_user: User = Depends(get_current_user)
+):
+    group = await get_member_group(group_id, current_user)
+    members = group_members(group)
+    paid_by = request.paid_by or current_user.id
+    check_members([paid_by], members)
+    split_type, splits = build_splits(request.amount_cents, members, request.split_between, request.splits)
+
+    now = datetime.utcnow()
+    expense_id = str(ObjectId())
+    entry = {
+        "expense_id": expense_id,
+        "transactional_group_id": group_id,
+        "description": request.description,
+        "amount_cents": request.amount_cents,
+        "paid_by": paid_by,
+        "split_type": split_type,
+        "splits": splits,
+        "created_by": current_user.id,
+        "created_at": now,
+        "updated_at": now,
+        "version": 1,
+        "pending_op": f"{expense_id}:1",
+        "pending_delta": ledger.expense_delta(paid_by, request.amount_cents, splits),
+        "pending_since": now,
+    }
+    await ledger_entries_collection.insert_one(entry)
+    version = await ledger.commit(entry)
+    return written(public_expense(entry), group_id, version, response)
+
+
+# --- List expenses (newest first) ---
+@router.get("/{group_id}/expenses")
+async def list_expenses(
+    group_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    await get_member_group(group_id, current_user)
+    query: dict = {"transactional_group_id": group_id, "deleted": {"$ne": True}}
+    if cursor:
+        query.update(keyset_after(("created_at", "expense_id"), decode_cursor(cursor, 2), descending=True))
+
+    expenses = await ledger_entries_collection.find(query, EXPENSE_PROJECTION) \
+        .sort([("created_at", -1), ("expense_id", -1)]) \
+        .limit(limit) \
+        .to_list(length=limit)
+
+    next_cursor = None
+    if len(expenses) == limit:
+        last = expenses[-1]
+        next_cursor = encode_cursor(last["created_at"], last["expense_id"])
+    return trusted({"expenses": expenses, "next_cursor": next_cursor})
+
+
+# --- Edit expense ---
+@router.patch("/{group_id}/expenses/{expense_id}", response_model=ExpenseResponse)
+async def update_expense(
+    group_id: str,
+    expense_id: str,
+    request: ExpenseUpdateRequest,
+    response: Response,
+    current_user: User = Depends(get_current_user)
+):
+    group = await get_member_group(group_id, current_user)
+    members = group_members(group)
+    entry = await ledger_entries_collection.find_one(
+        {"expense_id": expense_id, "transactional_group_id": group_id, "deleted": {"$ne": True}}
+    )
+    if not entry:
+        raise HTTPException(status_code=404, detail="Expense not found")
+    if entry.get("pending_op") or (request.version is not None and request.version != entry["version"]):
+        raise HTTPException(status_code=409, detail="Expense was modified concurrently, reload and retry")
+
+    amount_cents = request.amount_cents or entry["amount_cents"]
+    paid_by = request.paid_by or entry["paid_by"]
+    if request.paid_by:
+        check_members([paid_by], members)
+    if request.split_between is not None or request.splits is not None:
+        split_type, splits = build_splits(amount_cents, members, request.split_between, request.splits)
+    elif amount_cents == entry["amount_cents"]:
+        split_type, splits = entry["split_type"], entry["splits"]
+    elif entry["split_type"] == "equal":
+        # Re-split the new amount between the same people
+        split_type, splits = "equal", [
+            {"user_id": uid, "amount_cents": cents}
+            for uid, cents in ledger.equal_split(amount_cents, [s["user_id"] for s in entry["splits"]]).items()
+        ]
+    else:
+        raise HTTPException(status_code=400, detail="Changing the amount of an exact split needs new splits")
+
+    version = entry["version"] + 1
+    changes = {
+        "description": request.description if request.description is not None else entry["description"],
+        "amount_cents": amount_cents,
+        "paid_by": paid_by,
+        "split_type": split_type,
+        "splits": splits,
+        "updated_at": datetime.utcnow(),
+        "version": version,
+        "pending_op": f"{expense_id}:{version}",
+        "pending_delta": ledger.subtract(
+            ledger.expense_delta(paid_by, amount_cents, splits), ledger.entry_delta(entry)
+        ),
+    }
+    changes["pending_since"] = changes["updated_at"]
+    result = await ledger_entries_collection.update_one(
+        {"expense_id": expense_id, "version": entry["version"], "pending_op": None},
+        {"$set": changes}
+    )
+    if result.modified_count == 0:
+        raise HTTPException(status_code=409, detail="Expense was modified concurrently, reload and retry")
+
+    entry.update(changes)
+    version = await ledger.commit(entry)
+    return written(public_expense(entry), group_id, version, response)
+
+
+# --- Delete expense ---
+@router.delete("/{group_id}/expenses/{expense_id}")
+async def delete_expense(
+    group_id: str,
+    expense_id: str,
+    response: Response,
+    current_user: User = Depends(get_current_user)
+):
+    await get_member_group(group_id, current_user)
+    entry = await ledger_entries_collection.find_one(
+        {"expense_id": expense_id, "transactional_group_id": group_id, "deleted": {"$ne": True}}
+    )
+    if not entry:
+        raise HTTPException(status_code=404, detail="Expense not found")
+
+    # Tombstone first so the reversal is recoverable if we stop half-way
+    version = entry["version"] + 1
+    changes = {
+        "deleted": True,
+        "version": version,
+        "pending_op": f"{expense_id}:{version}",
+        "pending_delta": ledger.negate(ledger.entry_delta(entry)),
+        "pending_since": datetime.utcnow(),
+    }
+    result = await ledger_entries_collection.update_one(
+        {"expense_id": expense_id, "version": entry["version"], "pending_op": None},
+        {"$set": changes}
+    )
+    if result.modified_count == 0:
+        raise HTTPException(status_code=409, detail="Expense was modified concurrently, reload and retry")
+
+    entry.update(changes)
+    version = await ledger.commit(entry)
+    return written({"message": "Expense deleted successfully"}, group_id, version, response)
+
+
+# --- Balances and settlement ---
+async def current_balances(group_id: str, group: dict) -> tuple[dict, int]:
+    """Group balances and version, after finishing any write that was interrupted."""
+    if await ledger.reconcile_group(group_id, group.get("ledger_ops", [])):
+        group = await transactional_groups_collection.find_one(
+            {"transactional_group_id": group_id}, {"_id": 0, "balances": 1, "version": 1}
+        )
+    balances = group.get("balances", {})
+    return {uid: cents for uid, cents in balances.items() if cents}, group.get("version", 0)
+
+
+@router.get("/{group_id}/balances")
+async def get_balances(
+    group_id: str,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user)
+):
+    """Net position per member in cents: positive is owed, negative owes.
+    304 while the group version is unchanged (expense writes return its ETag)."""
+    group = await get_member_group(group_id, current_user)
+    balances, version = await current_balances(group_id, group)
+    tag = balances_tag(group_id, version)
+    if versioning.matches(request, tag):
+        return versioning.not_modified(tag)
+    return versioning.tagged({
+        "balances": {uid: balances.get(uid, 0) for uid in group_members(group)} | balances
+    }, tag, response)
+
+
+@router.get("/{group_id}/settlements")
+async def get_settlements(group_id: str, current_user: User = Depends(get_current_user)):
+    """Transfers that settle every balance, at most one fewer than the members involved."""
+    group = await get_member_group(group_id, current_user)
+    balances, _ = await current_balances(group_id, group)
+    return trusted({"transfers": ledger.settle(balances)})
@@ -0,0 +1,114 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query
+from bson import ObjectId
+from bson.errors import InvalidId
+from typing import Any, Dict, List, Optional
+
+from Application.auth import get_current_user, User
+from Application.db import (
+    chats_collection, chat_messages_collection, dashboards_collection, transactional_groups_collection
+)
+from Application.serialization import trusted
+from Application.pagination import MAX_PAGE_SIZE, encode_cursor, decode_cursor, keyset_after
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+SEARCH_KEY = ("score", "_id")
+DEFAULT_SEARCH_LIMIT = 20
+MAX_QUERY_LENGTH = 200
+
+# Fields returned per hit, besides "score"
+PROJECTIONS = {
+    "messages": {
+        "message_id": 1, "chat_id": 1, "sender": 1, "text": 1, "message_type": 1, "time_stamp": 1
+    },
+    "dashboards": {"dashboard_id": 1, "title": 1, "description": 1, "theme_color": 1},
+    "transactional_groups": {"transactional_group_id": 1, "title": 1, "description": 1, "color": 1, "chat_id": 1},
+}
+COLLECTIONS = {
+    "messages": chat_messages_collection,
+    "dashboards": dashboards_collection,
+    "transactional_groups": transactional_groups_collection,
+}
+
+
+# --- Helpers ---
+async def access_scope(kind: str, user: User, chat_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Filter limiting ``kind`` to what the user may read; None when nothing is."""
+    if kind != "messages":
+        return {"$or": [{"owner_id": user.id}, {"shared_with": user.id}]}
+    if chat_id:
+        if not await chats_collection.find_one({"chat_id": chat_id, "participants.user_id": user.id}, {"_id": 1}):
+            return None
+        return {"chat_id": chat_id}
+    chat_ids = await chats_collection.distinct("chat_id", {"participants.user_id": user.id})
+    return {"chat_id": {"$in": chat_ids}} if chat_ids else None
+
+def decode_search_cursor(cursor: str) -> list:
+    score, oid = decode_cursor(cursor, 2)
+    try:
+        return [float(score), ObjectId(oid)]
+    except (InvalidId, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def ranked_page(
+    kind: str, q: str, user: User, limit: int, cursor: Optional[str] = None, chat_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Text-index matches best first, keyset-paged on (textScore, _id)."""
+    scope = await access_scope(kind, user, chat_id)
+    if scope is None:
+        return {"results": [], "next_cursor": None}
+
+    # $text must lead the pipeline so the text index drives the match
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": {"$text": {"$search": q}, **scope}},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+    ]
+    if cursor:
+        pipeline.append({"$match": keyset_after(SEARCH_KEY, decode_search_cursor(cursor), descending=True)})
+    pipeline += [
+        {"$sort": {"score": -1, "_id": -1}},
+        {"$limit": limit},
+        {"$project": {**PROJECTIONS[kind], "score": 1}},
+    ]
+    results = await COLLECTIONS[kind].aggregate(pipeline).to_list(length=limit)
+
+    next_cursor = None
+    if len(results) == limit:
+        next_cursor = encode_cursor(results[-1]["score"], str(results[-1]["_id"]))
+    for hit in results:
+        hit.pop("_id")
+    return {"results": results, "next_cursor": next_cursor}
+
+
+# --- Search everything ---
+@router.get("")
+async def search_all(
+    q: str = Query(..., min_length=1, max_length=MAX_QUERY_LENGTH),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user)
+):
+    """First page of each kind; continue one with `/search/{kind}?cursor=`.
+
+    Scores are relevance within a kind and are not comparable across kinds.
+    """
+    pages = await asyncio.gather(*(ranked_page(kind, q, current_user, limit) for kind in COLLECTIONS))
+    return trusted(dict(zip(COLLECTIONS, pages)))
+
+
+# --- Search one kind ---
+@router.get("/{kind}")
+async def search_kind(
+    kind: str,
+    q: str = Query(..., min_length=1, max_length=MAX_QUERY_LENGTH),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    chat_id: Optional[str] = Query(None, description="Only messages in this chat"),
+    current_user: User = Depends(get_current_user)
+):
+    """`kind` is one of messages, dashboards, transactional_groups."""
+    if kind not in COLLECTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown search kind: {kind}")
+    if chat_id and kind != "messages":
+        raise HTTPException(status_code=400, detail="chat_id only applies to messages")
+    return trusted(await ranked_page(kind, q, current_user, limit, cursor, chat_id))
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from datetime import datetime
 from bson import ObjectId
 from pydantic import BaseModel
-from typing import List
+from typing import List, Dict, Optional
+from pymongo.errors import BulkWriteError
 
 from Application.auth import get_current_user, User
 from Application.db import transactional_groups_collection, chats_collection
+from Application.routers.chat import empty_inbox_fields
+from Application.serialization import trusted
+from Application import versioning
+from Application.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, parse_fields, list_owned_and_shared
+)
 
 router = APIRouter(prefix="/transactional-group", tags=["Transactional Group"])
 
@@ -25,71 +33,171 @@ class TransactionalGroupResponse(BaseModel):
     description: str
     chat_id: str
     color: str
+    version: int = 0
 
+GROUP_FIELDS = set(TransactionalGroupResponse.model_fields)
 
-# --- Create Transactional Group ---
-@router.post("/create", response_model=TransactionalGroupResponse)
-async def create_transactional_group(
-    request: TransactionalGroupCreateRequest,
-    current_user: User = Depends(get_current_user)
-):
-    # Step 1: Create a chat for the group
+
+MAX_BULK_CREATE = 500
+
+class TransactionalGroupBulkCreateRequest(BaseModel):
+    groups: List[TransactionalGroupCreateRequest]
+
+class BulkCreateItemResult(BaseModel):
+    index: int
+    status: str  # "created" or "error"
+    group: Optional[TransactionalGroupResponse] = None
+    detail: Optional[str] = None
+
+class TransactionalGroupBulkCreateResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkCreateItemResult]
+
+
+# --- Helpers ---
+def build_group_documents(request: TransactionalGroupCreateRequest, user: User) -> tuple[dict, dict]:
+    """Group and chat documents with both ids allocated up front, so each
+    side is written fully linked and no back-link update is needed."""
     chat_id = str(ObjectId())
+    group_id = str(ObjectId())
+    now = datetime.utcnow()
     chat_data = {
         "chat_id": chat_id,
-        "transactional_group_id": None,  # will be linked after group creation
+        "transactional_group_id": group_id,
         "participants": [{
-            "user_id": current_user.id,
-            "user_first_name": current_user.first_name,
-            "user_last_name": current_user.last_name,
-            "user_email": current_user.email
+            "user_id": user.id,
+            "user_first_name": user.first_name,
+            "user_last_name": user.last_name,
+            "user_email": user.email
         }],
-        "messages": []
+        "version": 1,
+        **empty_inbox_fields(now)
     }
-    await chats_collection.insert_one(chat_data)
-
-    # Step 2: Create transactional group and link chat_id
-    group_id = str(ObjectId())
     group_data = {
         "transactional_group_id": group_id,
-        "owner_id": current_user.id,
+        "owner_id": user.id,
         "title": request.title,
         "shared_with": [],
-        "created_on": datetime.utcnow(),
+        "created_on": now,
         "is_active": True,
         "description": request.description,
         "chat_id": chat_id,
-        "color": request.color
+        "color": request.color,
+        "version": 1
     }
-    await transactional_groups_collection.insert_one(group_data)
+    return group_data, chat_data
 
-    # Step 3: Update chat with the transactional_group_id
-    await chats_collection.update_one(
-        {"chat_id": chat_id},
-        {"$set": {"transactional_group_id": group_id}}
+def _failed_indexes(result, count: int) -> Dict[int, str]:
+    """Map item index -> error for an insert_many outcome (or its exception)."""
+    if isinstance(result, BulkWriteError):
+        return {e["index"]: e.get("errmsg", "write failed") for e in result.details.get("writeErrors", [])}
+    if isinstance(result, Exception):
+        # Outcome unknown for every item: treat all as failed and compensate
+        return {i: str(result) for i in range(count)}
+    return {}
+
+
+# --- Create Transactional Group ---
+@router.post("/create", response_model=TransactionalGroupResponse)
+async def create_transactional_group(
+    request: TransactionalGroupCreateRequest,
+    current_user: User = Depends(get_current_user)
+):
+    group_data, chat_data = build_group_documents(request, current_user)
+
+    # Both inserts go out concurrently; if either fails, undo the other
+    chat_result, group_result = await asyncio.gather(
+        chats_collection.insert_one(chat_data),
+        transactional_groups_collection.insert_one(group_data),
+        return_exceptions=True
     )
+    if isinstance(chat_result, Exception) or isinstance(group_result, Exception):
+        await asyncio.gather(
+            chats_collection.delete_one({"chat_id": chat_data["chat_id"]}),
+            transactional_groups_collection.delete_one(
+                {"transactional_group_id": group_data["transactional_group_id"]}
+            )
+        )
+        raise HTTPException(status_code=500, detail="Failed to create transactional group")
 
-    return group_data
+    await versioning.bump_collection_version(versioning.TRANSACTIONAL_GROUPS, [current_user.id])
+    group_data.pop("_id")
+    return trusted(group_data)
 
 
-# --- Get all transactional groups for logged-in user ---
-@router.get("/my-transactional-groups")
-async def get_my_transactional_groups(current_user: User = Depends(get_current_user)):
-    """Returns transactional groups owned by and shared with the current user."""
+@router.post("/bulk-create", response_model=TransactionalGroupBulkCreateResponse)
+async def bulk_create_transactional_groups(
+    request: TransactionalGroupBulkCreateRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Creates many groups (each with its chat) in two concurrent insert_many
+    calls and reports the outcome of every item."""
+    if not request.groups:
+        raise HTTPException(status_code=400, detail="No groups to create")
+    if len(request.groups) > MAX_BULK_CREATE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_CREATE} groups per request")
 
-    owned_groups = await transactional_groups_collection.find(
-        {"owner_id": current_user.id}
-    ).to_list(length=None)
+    documents = [build_group_documents(g, current_user) for g in request.groups]
+    groups = [group for group, _ in documents]
+    chats = [chat for _, chat in documents]
 
-    shared_groups = await transactional_groups_collection.find(
-        {"shared_with": {"$in": [current_user.id]}}
-    ).to_list(length=None)
+    chat_result, group_result = await asyncio.gather(
+        chats_collection.insert_many(chats, ordered=False),
+        transactional_groups_collection.insert_many(groups, ordered=False),
+        return_exceptions=True
+    )
+    failed = _failed_indexes(chat_result, len(chats))
+    failed.update(_failed_indexes(group_result, len(groups)))
 
-    def serialize(doc):
-        doc["_id"] = str(doc["_id"])
-        return doc
+    if failed:
+        # Remove the surviving half of every failed pair
+        await asyncio.gather(
+            chats_collection.delete_many({"chat_id": {"$in": [chats[i]["chat_id"] for i in failed]}}),
+            transactional_groups_collection.delete_many(
+                {"transactional_group_id": {"$in": [groups[i]["transactional_group_id"] for i in failed]}}
+            )
+        )
 
-    return {
-        "owned": [serialize(g) for g in owned_groups],
-        "shared_access": [serialize(g) for g in shared_groups]
-    }
+    if len(failed) < len(groups):
+        await versioning.bump_collection_version(versioning.TRANSACTIONAL_GROUPS, [current_user.id])
+
+    results = [
+        {"index": i, "status": "error", "detail": failed[i]} if i in failed
+        else {"index": i, "status": "created", "group": group}
+        for i, group in enumerate(groups)
+    ]
+    return {"created": len(groups) - len(failed), "failed": len(failed), "results": results}
+
+
+# --- Get all transactional groups for logged-in user ---
+@router.get("/my-transactional-groups")
+async def get_my_transactional_groups(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    owned_cursor: Optional[str] = None,
+    shared_cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to include"),
+    current_user: User = Depends(get_current_user)
+):
+    """Returns transactional groups owned by and shared with the current user, newest first.
+
+    Answers 304 when `If-None-Match` still matches the user's group list version.
+    """
+    tag = versioning.etag(
+        versioning.TRANSACTIONAL_GROUPS, current_user.id,
+        await versioning.collection_version(versioning.TRANSACTIONAL_GROUPS, current_user.id),
+        request.url.query
+    )
+    if versioning.matches(request, tag):
+        return versioning.not_modified(tag)
+
+    return versioning.tagged(await list_owned_and_shared(
+        transactional_groups_collection,
+        current_user.id,
+        parse_fields(fields, GROUP_FIELDS, sorted(GROUP_FIELDS)),
+        limit,
+        owned_cursor,
+        shared_cursor
+    ), tag, response)
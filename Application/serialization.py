@@ -0,0 +1,42 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+from Application.config import TRUSTED_OUTPUT
+
+# datetime/date/UUID are encoded natively by orjson; these are the BSON extras
+def _default(obj: Any):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    """App-wide default response class: orjson with ObjectId support."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def trusted(content: Any, status_code: int = 200):
+    """Return handler output without ``response_model`` revalidation.
+
+    Only for documents the handler built or projected to exactly the
+    response schema. FastAPI passes a ``Response`` through untouched, so the
+    model stays in the OpenAPI schema but is not re-run per request. With
+    TRUSTED_OUTPUT off the plain content is returned and validated as usual.
+    """
+    if not TRUSTED_OUTPUT:
+        return content
+    return ORJSONResponse(content, status_code=status_code)
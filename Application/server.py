@@ -0,0 +1,189 @@
+"""Production entrypoint: ``python -m Application.server``.
+
+Imports the app once, binds the listening socket, then forks one uvicorn
+worker per available CPU so workers share the imported code copy-on-write
+and the kernel balances connections across them. SIGTERM is forwarded to
+the workers, which stop accepting and drain in-flight requests for up to
+SERVER_GRACEFUL_TIMEOUT_SECONDS before being killed.
+
+Per-process state that must agree across workers: user profiles are
+evicted everywhere through the cache bus and revocations sync through
+Mongo. Chat fan-out and rate-limit counters need CHAT_BROKER_URL /
+RATE_LIMIT_BACKEND_URL pointing at Redis to span workers.
+"""
+import importlib.util
+import math
+import os
+import signal
+import socket
+import sys
+import time
+
+
+def available_cpus() -> int:
+    """CPUs this process may actually use: affinity mask capped by the cgroup quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()
+            if limit != "max":
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(1, cpus)
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _server_config(app, host: str, port: int):
+    import uvicorn
+    from Application.config import (
+        SERVER_BACKLOG, SERVER_KEEPALIVE_SECONDS, SERVER_GRACEFUL_TIMEOUT_SECONDS, SERVER_FORWARDED_ALLOW_IPS,
+    )
+
+    return uvicorn.Config(
+        app,
+        host=host,
+        port=port,
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        http="httptools" if importlib.util.find_spec("httptools") else "h11",
+        backlog=SERVER_BACKLOG,
+        timeout_keep_alive=SERVER_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=SERVER_GRACEFUL_TIMEOUT_SECONDS,
+        # Client addresses otherwise come from RATE_LIMIT_TRUSTED_HOPS
+        proxy_headers=bool(SERVER_FORWARDED_ALLOW_IPS),
+        forwarded_allow_ips=SERVER_FORWARDED_ALLOW_IPS or None,
+        access_log=False,
+    )
+
+
+def _serve(app, sock: socket.socket, host: str, port: int):
+    import uvicorn
+    server = uvicorn.Server(_server_config(app, host, port))
+    server.run(sockets=[sock])
+
+
+class Supervisor:
+    """Keeps ``workers`` forked servers alive and shuts them down together."""
+
+    def __init__(self, app, sock: socket.socket, host: str, port: int, workers: int, graceful_timeout: int):
+        self.app = app
+        self.sock = sock
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.children: dict[int, int] = {}  # pid -> slot
+        self.stopping = False
+
+    def _spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            # Worker: default signal handling; uvicorn installs its own
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                _serve(self.app, self.sock, self.host, self.port)
+            except BaseException as e:
+                print(f"[SERVER] Worker {os.getpid()} crashed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = slot
+
+    def _stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        print(f"[SERVER] Received {signal.Signals(signum).name}; draining {len(self.children)} workers")
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for slot in range(self.workers):
+            self._spawn(slot)
+        print(f"[SERVER] {self.workers} workers listening on {self.host}:{self.port}")
+
+        deadline = None
+        while self.children:
+            if self.stopping and deadline is None:
+                deadline = time.monotonic() + self.graceful_timeout + 1
+            if deadline is not None and time.monotonic() > deadline:
+                for pid in self.children:
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.1)
+                continue
+            slot = self.children.pop(pid, None)
+            if slot is not None and not self.stopping:
+                print(f"[SERVER] Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting")
+                time.sleep(1)  # avoid a hot crash loop
+                self._spawn(slot)
+        self.sock.close()
+        return 0
+
+
+def main() -> int:
+    from Application.config import (
+        SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_BACKLOG, SERVER_GRACEFUL_TIMEOUT_SECONDS,
+    )
+
+    cpus = available_cpus()
+    workers = SERVER_WORKERS or cpus
+
+    # Import before forking so every worker shares the loaded modules
+    from Application.main import app
+    from Application.hashing import hashing_service
+
+    if "HASH_POOL_WORKERS" not in os.environ:
+        # Split the CPUs between the workers' bcrypt pools instead of giving each all of them
+        hashing_service.workers = max(1, cpus // workers)
+
+    sock = bind_socket(SERVER_HOST, SERVER_PORT, SERVER_BACKLOG)
+    if workers == 1:
+        _serve(app, sock, SERVER_HOST, SERVER_PORT)
+        return 0
+    return Supervisor(app, sock, SERVER_HOST, SERVER_PORT, workers, SERVER_GRACEFUL_TIMEOUT_SECONDS).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
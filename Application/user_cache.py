@@ -0,0 +1,48 @@
+from cachetools import TTLCache
+
+from Application.config import USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS
+
+
+class UserCache:
+    """TTL + LRU cache of authenticated user profiles keyed by the JWT ``sub``.
+
+    Entries never contain the password hash. Writes that change or remove a
+    user must go through ``cache_bus.invalidate("user", email)`` so every
+    worker evicts the entry; the TTL bounds staleness if an event is missed.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, email: str):
+        user = self._cache.get(email)
+        if user is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return user
+
+    def set(self, email: str, user):
+        self._cache[email] = user
+
+    def invalidate(self, email: str):
+        self.invalidations += 1
+        self._cache.pop(email, None)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
@@ -0,0 +1,82 @@
+"""Version counters and ETags for conditional GETs.
+
+Mutable documents (dashboards, transactional groups, chats, users) carry a
+``version`` that every write bumps with ``$inc``; a missing field counts as
+version 0, so older documents need no backfill. List endpoints cannot use a
+single document's version, so each user document also keeps
+``collection_versions.<kind>``, bumped whenever a document that appears in
+that user's list changes.
+
+Read endpoints derive a strong ETag from those counters (plus the query
+string) and answer a matching ``If-None-Match`` with 304 before loading or
+serializing the body.
+"""
+import hashlib
+from typing import Any, Iterable
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import Request, Response
+
+from Application.db import users_collection
+from Application.serialization import dumps, trusted
+
+# Per-user list kinds
+DASHBOARDS = "dashboards"
+TRANSACTIONAL_GROUPS = "transactional_groups"
+
+BUMP = {"version": 1}
+# Clients may keep the body but must revalidate it before every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def etag(*parts: Any) -> str:
+    digest = hashlib.blake2b(dumps(parts), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def matches(request: Request, tag: str) -> bool:
+    """``If-None-Match`` uses the weak comparison, so ``W/`` prefixes are ignored."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in header.split(","))
+
+
+def not_modified(tag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": tag, "Cache-Control": CACHE_CONTROL})
+
+
+def tagged(content: Any, tag: str, response: Response):
+    """``trusted(content)`` with the ETag attached, whichever response it becomes."""
+    result = trusted(content)
+    target = result if isinstance(result, Response) else response
+    target.headers["ETag"] = tag
+    target.headers["Cache-Control"] = CACHE_CONTROL
+    return result
+
+
+def _object_ids(user_ids: Iterable[str]) -> list[ObjectId]:
+    ids = []
+    for user_id in user_ids:
+        try:
+            ids.append(ObjectId(user_id))
+        except (InvalidId, TypeError):
+            continue
+    return ids
+
+
+async def bump_collection_version(kind: str, user_ids: Iterable[str]):
+    ids = _object_ids(set(user_ids))
+    if ids:
+        await users_collection.update_many({"_id": {"$in": ids}}, {"$inc": {f"collection_versions.{kind}": 1}})
+
+
+async def collection_version(kind: str, user_id: str) -> int:
+    ids = _object_ids([user_id])
+    if not ids:
+        return 0
+    user = await users_collection.find_one({"_id": ids[0]}, {"_id": 0, f"collection_versions.{kind}": 1})
+    return ((user or {}).get("collection_versions") or {}).get(kind, 0)
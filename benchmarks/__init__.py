@@ -0,0 +1,15 @@
+"""Load and micro-benchmarks for the API.
+
+    pip install -r requirements.txt -r benchmarks/requirements.txt
+    python -m benchmarks.load  --users 200 --concurrency 32 --requests 2000
+    python -m benchmarks.micro --iterations 20000
+    python -m benchmarks.startup --runs 5 --target-ms 2000
+    python -m benchmarks.search --mongo-uri mongodb://localhost:27017 --messages 1000000
+
+All but the search benchmark (which needs ``$text``) default to an
+in-memory ``mongomock-motor`` database; pass
+``--mongo-uri mongodb://localhost:27017`` to run against a real mongod
+(a throwaway ``bench_*`` database is created and dropped). Results are
+printed and written as JSON; ``--compare benchmarks/baselines/<file>.json``
+prints the change against a stored baseline.
+"""
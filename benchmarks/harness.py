@@ -0,0 +1,213 @@
+"""Shared setup for the benchmarks: database wiring, seeding and measurement."""
+import asyncio
+import json
+import os
+import statistics
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List
+
+# Background sync relies on change streams, which mongomock does not offer
+os.environ.setdefault("REVOCATION_USE_CHANGE_STREAM", "false")
+
+
+class OpCounter:
+    """Counts database operations issued by the application."""
+
+    def __init__(self):
+        self.count = 0
+
+    # pymongo CommandListener interface (real mongod)
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class _CountingCollection:
+    """Proxy that counts every coroutine-returning or cursor call (mongomock)."""
+
+    def __init__(self, collection, counter: OpCounter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def counted(*args, **kwargs):
+            self._counter.count += 1
+            return attr(*args, **kwargs)
+        return counted
+
+
+def install_database(mongo_uri: str | None = None) -> OpCounter:
+    """Point ``Application.db`` at the benchmark database. Must run before
+    anything imports ``Application.main`` or the routers."""
+    counter = OpCounter()
+    if mongo_uri:
+        from pymongo import monitoring
+        monitoring.register(counter)
+        os.environ["MONGO_URI"] = mongo_uri
+        os.environ["MONGO_DB_NAME"] = f"bench_{uuid.uuid4().hex[:8]}"
+        import Application.db  # noqa: F401  (client picks up the listener)
+        return counter
+
+    from mongomock_motor import AsyncMongoMockClient
+    import Application.db as dbm
+
+    client = AsyncMongoMockClient()
+    dbm.client = client
+    dbm.db = client["bench"]
+    for name in list(vars(dbm)):
+        if name.endswith("_collection"):
+            original = getattr(dbm, name)
+            setattr(dbm, name, _CountingCollection(dbm.db.get_collection(original.name), counter))
+    return counter
+
+
+async def drop_database():
+    import Application.db as dbm
+    if os.environ.get("MONGO_DB_NAME", "").startswith("bench_"):
+        await dbm.client.drop_database(os.environ["MONGO_DB_NAME"])
+
+
+# --- Seeding ---
+PASSWORD = "bench-password"
+
+
+async def seed(users: int, dashboards: int, groups: int, messages: int) -> List[Dict]:
+    """Create ``users`` accounts, each owning the given number of dashboards
+    and groups (one chat per group, ``messages`` messages per chat)."""
+    from bson import ObjectId
+    from Application import db
+    from Application.auth import get_password_hash
+
+    hashed = await get_password_hash(PASSWORD)
+    now = datetime.utcnow()
+    seeded = []
+    for i in range(users):
+        email = f"bench{i}@example.com"
+        user_id = ObjectId()
+        await db.users_collection.insert_one({
+            "_id": user_id, "email": email, "hashed_password": hashed,
+            "first_name": "Bench", "last_name": str(i), "joined_on": now,
+        })
+        participant = {
+            "user_id": str(user_id), "user_first_name": "Bench",
+            "user_last_name": str(i), "user_email": email,
+        }
+        if dashboards:
+            await db.dashboards_collection.insert_many([{
+                "dashboard_id": str(ObjectId()), "owner_id": str(user_id),
+                "title": f"Dashboard {d}", "shared_with": [], "bank_accounts": [],
+                "defaults": {}, "created_on": now, "description": "seeded",
+                "theme_color": "#1E90FF", "credit_cards": [],
+            } for d in range(dashboards)])
+        chat_ids = []
+        for g in range(groups):
+            chat_id, group_id = str(ObjectId()), str(ObjectId())
+            chat_ids.append(chat_id)
+            await db.chats_collection.insert_one({
+                "chat_id": chat_id, "transactional_group_id": group_id,
+                "participants": [participant],
+            })
+            await db.transactional_groups_collection.insert_one({
+                "transactional_group_id": group_id, "owner_id": str(user_id),
+                "title": f"Group {g}", "shared_with": [], "created_on": now,
+                "is_active": True, "description": "seeded", "chat_id": chat_id,
+                "color": "#FF5733",
+            })
+            if messages:
+                await db.chat_messages_collection.insert_many([{
+                    "chat_id": chat_id, "message_id": str(ObjectId()),
+                    "sender": {"id": str(user_id), "first_name": "Bench",
+                               "last_name": str(i), "email": email},
+                    "seen_by": [str(user_id)], "text": f"message {m}",
+                    "message_type": "text", "time_stamp": now,
+                } for m in range(messages)])
+        seeded.append({"email": email, "id": str(user_id), "chat_ids": chat_ids})
+    return seeded
+
+
+# --- Measurement ---
+class LoopLagSampler:
+    """Measures event-loop lag as the overshoot of a short periodic sleep."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: asyncio.Task | None = None
+        self._sleep_started = 0.0
+
+    async def _run(self):
+        while True:
+            self._sleep_started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - self._sleep_started - self.interval))
+
+    def start(self):
+        self._sleep_started = time.perf_counter()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # A loop that never yielded still owes us the sleep that is in flight
+        overshoot = time.perf_counter() - self._sleep_started - self.interval
+        if overshoot > 0:
+            self.samples.append(overshoot)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": (statistics.fmean(latencies) * 1000) if latencies else 0.0,
+        "max_ms": (max(latencies) * 1000) if latencies else 0.0,
+    }
+
+
+# --- Reporting ---
+def write_results(results: Dict, path: str | None):
+    text = json.dumps(results, indent=2, sort_keys=True)
+    print(text)
+    if path:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+
+
+def compare(results: Dict, baseline_path: str):
+    """Print the relative change of every numeric metric against a baseline."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    def walk(current, base, prefix=""):
+        for key, value in current.items():
+            name = f"{prefix}{key}"
+            if isinstance(value, dict) and isinstance(base.get(key), dict):
+                walk(value, base[key], name + ".")
+            elif isinstance(value, (int, float)) and isinstance(base.get(key), (int, float)) and base[key]:
+                change = (value - base[key]) / base[key] * 100
+                print(f"{name:55s} {base[key]:12.3f} -> {value:12.3f} ({change:+6.1f}%)")
+
+    print(f"--- compared with {baseline_path} ---")
+    walk(results, baseline)
@@ -0,0 +1,145 @@
+"""Fixed-concurrency load test against the in-process ASGI app.
+
+Each scenario fires ``--requests`` requests with ``--concurrency`` workers
+and reports throughput, latency percentiles, event-loop lag and database
+operations per request.
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from benchmarks import harness
+
+
+async def run_scenario(name: str, make_request: Callable[[int], Awaitable[int]],
+                       total: int, concurrency: int, counter: harness.OpCounter) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            status = await make_request(index)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors += 1
+
+    lag = harness.LoopLagSampler()
+    ops_before = counter.count
+    lag.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await lag.stop()
+
+    result = {
+        "requests": total,
+        "errors": errors,
+        "rps": total / elapsed if elapsed else 0.0,
+        "db_ops_per_request": (counter.count - ops_before) / total if total else 0.0,
+        "loop_lag_p99_ms": harness.percentile(lag.samples, 99) * 1000,
+        "loop_lag_max_ms": (max(lag.samples) * 1000) if lag.samples else 0.0,
+    }
+    result.update(harness.summarize_latencies(latencies))
+    print(f"[{name}] {result['rps']:.0f} rps, p99 {result['p99_ms']:.1f} ms, "
+          f"{result['db_ops_per_request']:.2f} db ops/req, {errors} errors")
+    return result
+
+
+async def main(args) -> Dict:
+    counter = harness.install_database(args.mongo_uri)
+
+    import httpx
+    from Application.main import app
+
+    async with app.router.lifespan_context(app):
+        users = await harness.seed(args.users, args.dashboards, args.groups, args.messages)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # Log everyone in once so read scenarios measure steady state
+            tokens = []
+            for user in users:
+                response = await client.post("/login", json={"email": user["email"], "password": harness.PASSWORD})
+                tokens.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+
+            def pick(index: int):
+                slot = index % len(users)
+                return users[slot], tokens[slot]
+
+            async def login(index):
+                user, _ = pick(index)
+                r = await client.post("/login", json={"email": user["email"], "password": harness.PASSWORD})
+                return r.status_code
+
+            async def users_me(index):
+                _, headers = pick(index)
+                return (await client.get("/users/me", headers=headers)).status_code
+
+            async def my_dashboards(index):
+                _, headers = pick(index)
+                return (await client.get("/dashboard/my-dashboards", headers=headers)).status_code
+
+            async def create_group(index):
+                _, headers = pick(index)
+                r = await client.post("/transactional-group/create", headers=headers, json={
+                    "title": f"Load {index}", "description": "benchmark", "color": "#000000"})
+                return r.status_code
+
+            async def chat_read(index):
+                user, headers = pick(index)
+                if not user["chat_ids"]:
+                    return 200
+                chat_id = random.choice(user["chat_ids"])
+                return (await client.get(f"/chat/{chat_id}/messages", headers=headers)).status_code
+
+            scenarios = {
+                "login": (login, args.login_requests),
+                "users_me": (users_me, args.requests),
+                "my_dashboards": (my_dashboards, args.requests),
+                "transactional_group_create": (create_group, args.requests),
+                "chat_read": (chat_read, args.requests),
+            }
+            selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+            results = {
+                "config": {
+                    "users": args.users, "concurrency": args.concurrency,
+                    "database": "mongod" if args.mongo_uri else "mongomock",
+                },
+            }
+            for name in selected:
+                fn, total = scenarios[name]
+                results[name] = await run_scenario(name, fn, total, args.concurrency, counter)
+
+        if args.mongo_uri:
+            await harness.drop_database()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mongo-uri", help="Real mongod to use instead of mongomock")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--dashboards", type=int, default=5, help="Dashboards per user")
+    parser.add_argument("--groups", type=int, default=3, help="Groups (and chats) per user")
+    parser.add_argument("--messages", type=int, default=100, help="Messages per chat")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per read/write scenario")
+    parser.add_argument("--login-requests", type=int, default=100, help="Requests for the bcrypt-bound login scenario")
+    parser.add_argument("--scenarios", help="Comma-separated subset to run")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", help="Baseline JSON to diff against")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    results = asyncio.run(main(arguments))
+    harness.write_results(results, arguments.output)
+    if arguments.compare:
+        harness.compare(results, arguments.compare)
@@ -0,0 +1,154 @@
+"""Micro-benchmarks for the per-request hot path: JWT handling,
+get_current_user and response serialization.
+
+Serialization is measured both ways: the validated path (response_model
+plus jsonable_encoder and stdlib json) and the trusted orjson path used by
+the hot read routes.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict
+
+from benchmarks import harness
+
+
+def _report(name: str, iterations: int, elapsed: float, cpu: float) -> Dict:
+    per_op_us = elapsed / iterations * 1e6
+    cpu_per_op_us = cpu / iterations * 1e6
+    print(f"{name:40s} {per_op_us:10.2f} us/op  {cpu_per_op_us:10.2f} cpu us/op  {iterations / elapsed:12.0f} ops/s")
+    return {"us_per_op": per_op_us, "cpu_us_per_op": cpu_per_op_us, "ops_per_sec": iterations / elapsed}
+
+
+def bench_sync(name: str, fn: Callable[[], object], iterations: int) -> Dict:
+    fn()  # warm up
+    started, cpu_started = time.perf_counter(), time.process_time()
+    for _ in range(iterations):
+        fn()
+    return _report(name, iterations, time.perf_counter() - started, time.process_time() - cpu_started)
+
+
+async def bench_async(name: str, fn: Callable[[], Awaitable[object]], iterations: int) -> Dict:
+    await fn()
+    started, cpu_started = time.perf_counter(), time.process_time()
+    for _ in range(iterations):
+        await fn()
+    return _report(name, iterations, time.perf_counter() - started, time.process_time() - cpu_started)
+
+
+def sample_chat(messages: int) -> Dict:
+    now = datetime.utcnow()
+    return {
+        "chat_id": "6650f1c2a1b2c3d4e5f60718",
+        "participants": [{"user_id": str(i), "user_first_name": "Bench",
+                          "user_last_name": str(i), "user_email": f"bench{i}@example.com"}
+                         for i in range(4)],
+        "messages": [{
+            "message_id": f"{m:024x}",
+            "sender": {"id": "0", "first_name": "Bench", "last_name": "0", "email": "bench0@example.com"},
+            "seen_by": ["0", "1"],
+            "text": f"message body number {m} with a little bit of text",
+            "message_type": "text",
+            "time_stamp": now,
+        } for m in range(messages)],
+    }
+
+
+def sample_dashboard(index: int) -> Dict:
+    return {
+        "dashboard_id": f"{index:024x}", "owner_id": "0", "title": f"Dashboard {index}",
+        "shared_with": ["1", "2"], "defaults": {"currency": "USD"},
+        "created_on": datetime.utcnow(), "description": "seeded", "theme_color": "#1E90FF",
+        "bank_accounts": [{
+            "account_id": f"{a:024x}", "name": f"Account {a}", "institution": "Bench Bank",
+            "balance_cents": 100050 + a * 100,
+        } for a in range(5)],
+        "credit_cards": [{
+            "card_id": f"{c:024x}", "name": f"Card {c}", "issuer": "Bench", "last4": "4242",
+            "balance_cents": 12025, "limit_cents": 500000,
+        } for c in range(3)],
+        "summary": {
+            "total_balance_cents": 501250, "credit_balance_cents": 36075, "credit_limit_cents": 1500000,
+            "bank_account_count": 5, "credit_card_count": 3,
+        },
+        "version": 1,
+    }
+
+
+async def main(args) -> Dict:
+    harness.install_database(args.mongo_uri)
+
+    from fastapi.encoders import jsonable_encoder
+    from jose import jwt
+    from Application.auth import create_access_token, get_current_user
+    from Application.config import JWT_SECRET_KEY, ALGORITHM
+    from Application.routers.chat import ChatResponse
+    from Application.routers.dashboards import DashboardResponse
+    from Application.revocation import revocation_cache
+    from Application.serialization import dumps
+    from Application.user_cache import user_cache
+
+    n = args.iterations
+    await revocation_cache.bootstrap()
+    results: Dict[str, Dict] = {}
+    users = await harness.seed(1, 0, 0, 0)
+    token = create_access_token({"sub": users[0]["email"]})
+
+    results["jwt_encode"] = bench_sync("jwt_encode", lambda: create_access_token({"sub": "bench0@example.com"}), n)
+    results["jwt_decode"] = bench_sync("jwt_decode", lambda: jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM]), n)
+    results["get_current_user_cached"] = await bench_async(
+        "get_current_user (cache hit)", lambda: get_current_user(token), n)
+
+    async def uncached():
+        user_cache.clear()
+        return await get_current_user(token)
+    results["get_current_user_uncached"] = await bench_async(
+        "get_current_user (cache miss)", uncached, max(1, n // 10))
+
+    chat = sample_chat(args.messages)
+    dashboards = [sample_dashboard(i) for i in range(args.dashboards)]
+
+    def serialize_chat():
+        return json.dumps(jsonable_encoder(ChatResponse.model_validate(chat))).encode()
+
+    def serialize_dashboards():
+        return json.dumps(jsonable_encoder([DashboardResponse.model_validate(d) for d in dashboards])).encode()
+
+    def serialize_chat_trusted():
+        return dumps(chat)
+
+    def serialize_dashboards_trusted():
+        return dumps(dashboards)
+
+    for name, fn in (("serialize_chat", serialize_chat), ("serialize_dashboards", serialize_dashboards),
+                     ("serialize_chat_trusted", serialize_chat_trusted),
+                     ("serialize_dashboards_trusted", serialize_dashboards_trusted)):
+        payload_bytes = len(fn())
+        results[name] = bench_sync(name, fn, max(1, n // 100))
+        results[name]["bytes"] = payload_bytes
+        results[name]["mb_per_sec"] = payload_bytes * results[name]["ops_per_sec"] / 1e6
+
+    if args.mongo_uri:
+        await harness.drop_database()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mongo-uri", help="Real mongod to use instead of mongomock")
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=500, help="Messages in the serialized chat")
+    parser.add_argument("--dashboards", type=int, default=100, help="Dashboards in the serialized list")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", help="Baseline JSON to diff against")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    results = asyncio.run(main(arguments))
+    harness.write_results(results, arguments.output)
+    if arguments.compare:
+        harness.compare(results, arguments.compare)
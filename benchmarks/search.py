@@ -0,0 +1,161 @@
+"""Search latency on a seeded message corpus (default 1M messages).
+
+Seeds ``--messages`` chat messages drawn from a Zipf-distributed vocabulary
+across ``--chats`` chats shared by ``--users`` users, builds the text
+indexes, then times ``/search/messages`` for common, mid-frequency, rare and
+two-word queries, both across all of a user's chats and within one chat.
+The run fails (exit status 1) when any p95 exceeds ``--target-p95-ms``.
+
+Needs a real mongod (``--mongo-uri``): mongomock has no ``$text``.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from benchmarks import harness
+
+# Indexes are built explicitly once the corpus is loaded
+os.environ["INDEX_BUILD_MODE"] = "off"
+
+INSERT_BATCH = 10000
+
+
+def vocabulary(size: int) -> List[str]:
+    rng = random.Random(7)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(4, 9))))
+    return sorted(words)
+
+
+async def seed_corpus(args, words: List[str]) -> Dict:
+    from bson import ObjectId
+    from Application import db
+
+    users = await harness.seed(args.users, 0, 0, 0)
+    rng = random.Random(11)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    chats = []
+    for c in range(args.chats):
+        # Every chat has the owner plus two other users, so scoping matters
+        members = [users[(c + k) % len(users)] for k in range(3)]
+        chats.append({
+            "chat_id": str(ObjectId()),
+            "participants": [{
+                "user_id": u["id"], "user_first_name": "Bench", "user_last_name": u["email"],
+                "user_email": u["email"],
+            } for u in members],
+        })
+    await db.chats_collection.insert_many(chats)
+
+    started = time.perf_counter()
+    base = datetime.utcnow() - timedelta(days=365)
+    batch = []
+    for m in range(args.messages):
+        chat = chats[m % len(chats)]
+        sender = chat["participants"][m % 3]
+        batch.append({
+            "chat_id": chat["chat_id"], "message_id": str(ObjectId()),
+            "sender": {"id": sender["user_id"], "first_name": "Bench", "last_name": "", "email": sender["user_email"]},
+            "seen_by": [sender["user_id"]],
+            "text": " ".join(rng.choices(words, weights, k=rng.randint(4, 16))),
+            "message_type": "text", "time_stamp": base + timedelta(seconds=m),
+        })
+        if len(batch) >= INSERT_BATCH:
+            await db.chat_messages_collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.chat_messages_collection.insert_many(batch, ordered=False)
+    seeded_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await db.init_db(force=True)
+    indexed_s = time.perf_counter() - started
+    print(f"seeded {args.messages} messages in {seeded_s:.0f} s, indexes built in {indexed_s:.0f} s")
+    return {"users": users, "chats": chats, "seed_s": seeded_s, "index_build_s": indexed_s}
+
+
+async def main(args) -> Dict:
+    harness.install_database(args.mongo_uri)
+
+    import httpx
+    from Application.main import app
+
+    words = vocabulary(args.vocabulary)
+    queries = {
+        "common": words[0],
+        "mid": words[min(100, len(words) - 1)],
+        "rare": words[-1],
+        "two_words": f"{words[10]} {words[500 % len(words)]}",
+    }
+    results: Dict = {"config": {
+        "messages": args.messages, "chats": args.chats, "users": args.users,
+        "vocabulary": args.vocabulary, "limit": args.limit,
+    }}
+    async with app.router.lifespan_context(app):
+        corpus = await seed_corpus(args, words)
+        results["seed_s"] = corpus["seed_s"]
+        results["index_build_s"] = corpus["index_build_s"]
+        user = corpus["users"][0]
+        one_chat = next(c["chat_id"] for c in corpus["chats"]
+                        if any(p["user_id"] == user["id"] for p in c["participants"]))
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            response = await client.post("/login", json={"email": user["email"], "password": harness.PASSWORD})
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            for scope, extra in (("all_chats", {}), ("one_chat", {"chat_id": one_chat})):
+                for name, q in queries.items():
+                    params = {"q": q, "limit": args.limit, **extra}
+                    latencies: List[float] = []
+                    hits = 0
+                    for _ in range(args.iterations):
+                        started = time.perf_counter()
+                        r = await client.get("/search/messages", params=params, headers=headers)
+                        latencies.append(time.perf_counter() - started)
+                        r.raise_for_status()
+                        hits = len(r.json()["results"])
+                    summary = harness.summarize_latencies(latencies)
+                    summary["hits"] = hits
+                    results[f"{scope}.{name}"] = summary
+                    print(f"[{scope}.{name}] p50 {summary['p50_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms, "
+                          f"{hits} hits")
+
+        await harness.drop_database()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mongo-uri", help="mongod to seed and search (required)")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--vocabulary", type=int, default=5000, help="Distinct words in the corpus")
+    parser.add_argument("--limit", type=int, default=20, help="Page size requested")
+    parser.add_argument("--iterations", type=int, default=50, help="Requests per query")
+    parser.add_argument("--target-p95-ms", type=float, default=100)
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", help="Baseline JSON to diff against")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    if not arguments.mongo_uri:
+        print("benchmarks.search needs --mongo-uri: mongomock does not implement $text")
+        sys.exit(2)
+    results = asyncio.run(main(arguments))
+    harness.write_results(results, arguments.output)
+    if arguments.compare:
+        harness.compare(results, arguments.compare)
+    slow = [name for name, value in results.items() if isinstance(value, dict) and value.get("p95_ms", 0) > arguments.target_p95_ms]
+    if slow:
+        print(f"p95 above {arguments.target_p95_ms:.0f} ms: {', '.join(slow)}")
+        sys.exit(1)
@@ -0,0 +1,125 @@
+"""Cold-start profile: import-time breakdown and time-to-ready.
+
+Time-to-ready is measured from spawning a fresh interpreter that serves the
+app with uvicorn until ``/healthz`` first answers 200, i.e. what a Cloud Run
+cold start costs before the first request can be routed. The run fails
+(exit status 1) when the median exceeds ``--target-ms``.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List
+
+from benchmarks import harness
+
+
+def import_breakdown(module: str, top: int) -> Dict:
+    """Run ``python -X importtime`` on ``module`` and return the heaviest imports."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, self_us, cumulative_us, name = (part for part in line.replace("import time:", "|", 1).split("|"))
+        if not self_us.strip().isdigit():
+            continue  # header row
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+
+    total_us = next((cumulative for name, _, _, cumulative in entries if name == module), 0)
+    # Direct imports of the target module show where its own import time goes
+    children = [e for e in entries if e[1] == 1]
+    children.sort(key=lambda e: e[3], reverse=True)
+    breakdown = {name: cumulative / 1000 for name, _, _, cumulative in children[:top]}
+    print(f"import {module}: {total_us / 1000:.1f} ms")
+    for name, ms in breakdown.items():
+        print(f"  {name:45s} {ms:8.1f} ms")
+    return {"total_ms": total_us / 1000, "modules_ms": breakdown}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_ready(mongo_uri: str | None, timeout: float) -> float:
+    """Seconds from process spawn until /healthz returns 200."""
+    port = _free_port()
+    command = [sys.executable, "-m", "benchmarks.startup", "--serve", "--port", str(port)]
+    if mongo_uri:
+        command += ["--mongo-uri", mongo_uri]
+    started = time.perf_counter()
+    process = subprocess.Popen(command, env=os.environ.copy())
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with status {process.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.01)
+        raise TimeoutError(f"/healthz not ready after {timeout} s")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def serve(port: int, mongo_uri: str | None):
+    harness.install_database(mongo_uri)
+    import uvicorn
+    from Application.main import app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def main(args) -> Dict:
+    results: Dict = {"imports": import_breakdown("Application.main", args.top)}
+    samples: List[float] = []
+    for _ in range(args.runs):
+        samples.append(time_to_ready(args.mongo_uri, args.timeout))
+    ready = harness.summarize_latencies(samples)
+    ready["median_ms"] = statistics.median(samples) * 1000
+    ready["target_ms"] = args.target_ms
+    results["time_to_ready"] = ready
+    print(f"time to ready: median {ready['median_ms']:.0f} ms, max {ready['max_ms']:.0f} ms "
+          f"(target {args.target_ms:.0f} ms)")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mongo-uri", help="Real mongod to use instead of mongomock")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to measure")
+    parser.add_argument("--top", type=int, default=15, help="Imports to list in the breakdown")
+    parser.add_argument("--target-ms", type=float, default=2000, help="Fail when median time-to-ready exceeds this")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", help="Baseline JSON to diff against")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=8080, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    if arguments.serve:
+        serve(arguments.port, arguments.mongo_uri)
+        sys.exit(0)
+    results = main(arguments)
+    harness.write_results(results, arguments.output)
+    if arguments.compare:
+        harness.compare(results, arguments.compare)
+    if results["time_to_ready"]["median_ms"] > arguments.target_ms:
+        sys.exit(1)
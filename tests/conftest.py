@@ -0,0 +1,65 @@
+"""Shared fixtures: an in-memory database and helpers for background workers.
+
+    pip install -r requirements.txt -r tests/requirements.txt
+    python -m pytest
+"""
+import asyncio
+import os
+import time
+
+import pytest
+
+# Background sync relies on change streams, which mongomock does not offer
+os.environ.setdefault("REVOCATION_USE_CHANGE_STREAM", "false")
+os.environ.setdefault("CACHE_BUS_USE_CHANGE_STREAM", "false")
+
+
+def _install_database():
+    """Point ``Application.db`` at mongomock-motor before anything imports the routers."""
+    from mongomock_motor import AsyncMongoMockClient
+    import Application.db as dbm
+
+    dbm.client = AsyncMongoMockClient()
+    dbm.db = dbm.client["test"]
+    for name in list(vars(dbm)):
+        if name.endswith("_collection"):
+            setattr(dbm, name, dbm.db.get_collection(getattr(dbm, name).name))
+
+
+_install_database()
+
+
+@pytest.fixture
+def anyio_backend():
+    # Motor only runs on asyncio
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The app with its lifespan running; one per session, as the
+    module-level workers stay bound to the first event loop they run on."""
+    from fastapi.testclient import TestClient
+    from Application.main import app
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def db():
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()["test"]
+
+
+async def eventually(predicate, timeout: float = 5.0, interval: float = 0.02):
+    """Await ``predicate()`` (sync or async) until it is truthy; fail after ``timeout``."""
+    deadline = time.monotonic() + timeout
+    while True:
+        result = predicate()
+        if asyncio.iscoroutine(result):
+            result = await result
+        if result:
+            return result
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(interval)
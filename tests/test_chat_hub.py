@@ -0,0 +1,172 @@
+"""Chat hub fan-out through both brokers, and the chat WebSocket route."""
+from datetime import datetime
+
+import fakeredis
+import pytest
+from bson import ObjectId
+from fakeredis.aioredis import FakeRedis
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from Application import db
+from Application.auth import create_access_token
+from Application.chat_hub import ChatHub, InMemoryBroker, RedisBroker
+from Application.routers.chat import empty_inbox_fields
+from conftest import eventually
+
+
+class FakeSocket:
+    """Stands in for a WebSocket: records what the hub sends."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.received = []
+
+    async def send_json(self, event: dict):
+        if self.fail:
+            raise RuntimeError("connection closed")
+        self.received.append(event)
+
+
+# --- Hub ---
+@pytest.fixture(params=["memory", "redis"])
+async def hubs(request):
+    """Two hubs, as in two worker processes, joined by the broker under test."""
+    if request.param == "memory":
+        bus = []
+        brokers = [InMemoryBroker(bus), InMemoryBroker(bus)]
+    else:
+        # A Redis-protocol stand-in shared by both clients
+        server = fakeredis.FakeServer()
+        brokers = [RedisBroker(client=FakeRedis(server=server)) for _ in range(2)]
+    pair = [ChatHub(broker) for broker in brokers]
+    for hub in pair:
+        await hub.start()
+    yield pair
+    for hub in pair:
+        await hub.stop()
+
+
+@pytest.mark.anyio
+async def test_fans_out_once_to_every_hub(hubs):
+    hub_a, hub_b = hubs
+    local, remote, elsewhere = FakeSocket(), FakeSocket(), FakeSocket()
+    await hub_a.connect("c1", local)
+    await hub_b.connect("c1", remote)
+    await hub_b.connect("c2", elsewhere)
+
+    await hub_a.publish("c1", {"type": "message", "at": datetime(2024, 1, 1)})
+
+    await eventually(lambda: local.received and remote.received)
+    expected = [{"type": "message", "at": "2024-01-01T00:00:00"}]
+    assert local.received == expected
+    assert remote.received == expected
+    assert elsewhere.received == []
+
+
+@pytest.mark.anyio
+async def test_stops_delivering_after_last_socket_leaves(hubs):
+    hub_a, hub_b = hubs
+    staying, leaving = FakeSocket(), FakeSocket()
+    await hub_a.connect("c1", staying)
+    await hub_b.connect("c1", leaving)
+    await hub_b.disconnect("c1", leaving)
+    assert hub_b.stats() == {"chats": 0, "connections": 0}
+
+    await hub_a.publish("c1", {"type": "read"})
+
+    await eventually(lambda: staying.received)
+    assert leaving.received == []
+
+
+@pytest.mark.anyio
+async def test_drops_sockets_that_fail(hubs):
+    hub_a, hub_b = hubs
+    broken = FakeSocket(fail=True)
+    await hub_b.connect("c1", broken)
+
+    await hub_a.publish("c1", {"type": "read"})
+
+    await eventually(lambda: hub_b.stats()["connections"] == 0)
+
+
+# --- WebSocket route ---
+def _user(client: TestClient, email: str) -> tuple[str, str]:
+    """Insert a user; returns its id and an access token."""
+    result = client.portal.call(db.users_collection.insert_one, {
+        "email": email, "hashed_password": "", "first_name": "Test", "last_name": "User",
+        "joined_on": datetime.utcnow(),
+    })
+    return str(result.inserted_id), create_access_token({"sub": email})
+
+
+def _chat(client: TestClient, *user_ids: str) -> str:
+    chat_id = str(ObjectId())
+    client.portal.call(db.chats_collection.insert_one, {
+        "chat_id": chat_id,
+        "participants": [{"user_id": uid} for uid in user_ids],
+        "version": 1,
+        **empty_inbox_fields(datetime.utcnow()),
+    })
+    return chat_id
+
+
+def _remove(client: TestClient, chat_id: str, user_id: str):
+    client.portal.call(db.chats_collection.update_one, {"chat_id": chat_id},
+                       {"$pull": {"participants": {"user_id": user_id}}})
+
+
+def test_socket_rejects_invalid_frames(client):
+    user_id, token = _user(client, f"{ObjectId()}@example.com")
+    chat_id = _chat(client, user_id)
+
+    with client.websocket_connect(f"/chat/ws/{chat_id}?token={token}") as ws:
+        for frame in ([], 1, "message", {"type": "unknown"}):
+            ws.send_json(frame)
+            assert ws.receive_json() == {"type": "error", "detail": "Unsupported frame"}
+        for frame in ({"type": "message", "text": 1},
+                      {"type": "message", "text": "hi", "message_type": {"x": 1}},
+                      {"type": "read", "message_ids": [1]}):
+            ws.send_json(frame)
+            assert ws.receive_json() == {"type": "error", "detail": "Invalid frame"}
+
+        ws.send_json({"type": "message", "text": "hi"})
+        event = ws.receive_json()
+        assert event["type"] == "message"
+        assert event["message"]["text"] == "hi"
+        assert event["message"]["message_type"] == "text"
+
+
+def test_socket_rechecks_membership(client):
+    owner_id, owner_token = _user(client, f"{ObjectId()}@example.com")
+    member_id, member_token = _user(client, f"{ObjectId()}@example.com")
+    stranger_id, stranger_token = _user(client, f"{ObjectId()}@example.com")
+    chat_id = _chat(client, owner_id, member_id)
+
+    # Not a participant: refused at connect
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect(f"/chat/ws/{chat_id}?token={stranger_token}") as ws:
+            ws.receive_json()
+
+    with client.websocket_connect(f"/chat/ws/{chat_id}?token={owner_token}") as owner, \
+            client.websocket_connect(f"/chat/ws/{chat_id}?token={member_token}") as member:
+        # Added after the owner connected: still counted as unread
+        client.portal.call(db.chats_collection.update_one, {"chat_id": chat_id},
+                           {"$push": {"participants": {"user_id": stranger_id}}})
+        owner.send_json({"type": "message", "text": "hi"})
+        message_id = owner.receive_json()["message"]["message_id"]
+        assert member.receive_json()["message"]["message_id"] == message_id
+        chat = client.portal.call(db.chats_collection.find_one, {"chat_id": chat_id})
+        assert chat["read_state"][stranger_id]["unread_count"] == 1
+
+        # Removed while connected: both sends and read receipts are refused
+        _remove(client, chat_id, member_id)
+        member.send_json({"type": "read", "message_ids": [message_id]})
+        assert member.receive_json() == {"type": "error", "detail": "Chat not found"}
+
+        _remove(client, chat_id, owner_id)
+        owner.send_json({"type": "message", "text": "again"})
+        assert owner.receive_json() == {"type": "error", "detail": "Chat not found"}
+
+    message = client.portal.call(db.chat_messages_collection.find_one, {"message_id": message_id})
+    assert message["seen_by"] == [owner_id]
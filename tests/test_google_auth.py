@@ -0,0 +1,155 @@
+"""Google id_token verification against locally signed tokens and certs."""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt as google_jwt
+
+from Application import google_auth
+from Application.google_auth import GoogleCertCache, MIN_TTL_SECONDS
+
+pytestmark = pytest.mark.anyio
+
+AUDIENCE = "client-id.apps.googleusercontent.com"
+
+
+class SigningKey:
+    """An RSA key with the self-signed certificate Google would publish for it."""
+
+    def __init__(self, key_id: str):
+        self.key_id = key_id
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, key_id)])
+        now = datetime.utcnow()
+        cert = x509.CertificateBuilder().subject_name(name).issuer_name(name) \
+            .public_key(key.public_key()).serial_number(x509.random_serial_number()) \
+            .not_valid_before(now - timedelta(days=1)).not_valid_after(now + timedelta(days=1)) \
+            .sign(key, hashes.SHA256())
+        self.cert = cert.public_bytes(serialization.Encoding.PEM).decode()
+        pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption())
+        self.signer = crypt.RSASigner.from_string(pem, key_id)
+
+    def id_token(self, **claims) -> str:
+        now = int(time.time())
+        payload = {"iss": "https://accounts.google.com", "aud": AUDIENCE, "sub": "12345",
+                   "email": "user@example.com", "iat": now, "exp": now + 3600, **claims}
+        return google_jwt.encode(self.signer, payload).decode()
+
+
+class FixtureCertSource:
+    """Cert source serving the published keys with a given max-age."""
+
+    def __init__(self, *keys: SigningKey, max_age: float = 3600):
+        self.keys = list(keys)
+        self.max_age = max_age
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return {key.key_id: key.cert for key in self.keys}, self.max_age
+
+
+class Clock:
+    """Stands in for the ``time`` module inside google_auth."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return SigningKey("key-1"), SigningKey("key-2")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(google_auth, "time", clock)
+    return clock
+
+
+@pytest.fixture
+async def make_cache():
+    def make(source: FixtureCertSource) -> GoogleCertCache:
+        cache = GoogleCertCache(source)
+        caches.append(cache)
+        return cache
+
+    caches = []
+    yield make
+    for cache in caches:
+        await cache.stop()
+
+
+async def test_verifies_with_one_fetch_and_serves_from_cache(keys, clock, make_cache):
+    source = FixtureCertSource(keys[0])
+    cache = make_cache(source)
+
+    # The first verify waits on the refresh loop's fetch instead of making its own
+    claims = await cache.verify(keys[0].id_token(), AUDIENCE)
+    assert claims["sub"] == "12345"
+    for _ in range(3):
+        await cache.verify(keys[0].id_token(sub="67890"), AUDIENCE)
+    assert source.calls == 1
+    assert cache.fetches == 1
+
+
+async def test_rejects_bad_tokens(keys, clock, make_cache):
+    cache = make_cache(FixtureCertSource(keys[0]))
+
+    with pytest.raises(ValueError):
+        await cache.verify(keys[0].id_token(), "another-client")
+    with pytest.raises(ValueError, match="Wrong issuer"):
+        await cache.verify(keys[0].id_token(iss="https://evil.example.com"), AUDIENCE)
+    with pytest.raises(ValueError):
+        await cache.verify(keys[0].id_token(exp=int(time.time()) - 3600), AUDIENCE)
+
+
+async def test_refetches_on_unknown_key_id_at_most_once_a_minute(keys, clock, make_cache):
+    source = FixtureCertSource(keys[0])
+    cache = make_cache(source)
+    await cache.verify(keys[0].id_token(), AUDIENCE)
+
+    # Google rotates in key-2 before our copy expires
+    source.keys.append(keys[1])
+    with pytest.raises(ValueError, match="Certificate for key id"):
+        await cache.verify(keys[1].id_token(), AUDIENCE)
+    assert source.calls == 1
+
+    clock.now += MIN_TTL_SECONDS
+    assert (await cache.verify(keys[1].id_token(), AUDIENCE))["sub"] == "12345"
+    assert source.calls == 2
+    await cache.verify(keys[1].id_token(), AUDIENCE)
+    assert source.calls == 2
+
+
+async def test_honours_max_age(keys, clock, make_cache):
+    source = FixtureCertSource(keys[0], max_age=600)
+    cache = make_cache(source)
+    await cache.verify(keys[0].id_token(), AUDIENCE)
+
+    clock.now += 599
+    await cache.get_certs()
+    assert source.calls == 1
+
+    clock.now += 2
+    await cache.get_certs()
+    assert source.calls == 2
+
+
+async def test_floors_short_max_age(keys, clock, make_cache):
+    source = FixtureCertSource(keys[0], max_age=0)
+    cache = make_cache(source)
+    await cache.verify(keys[0].id_token(), AUDIENCE)
+
+    clock.now += MIN_TTL_SECONDS - 1
+    await cache.get_certs()
+    assert source.calls == 1
@@ -0,0 +1,143 @@
+"""Outbox worker against a local aiosmtpd server."""
+import socket
+from datetime import datetime
+
+import pytest
+from aiosmtpd.controller import Controller
+from bson import ObjectId
+
+from Application.mailer import MailQueue, SMTPConnection
+from conftest import eventually
+
+pytestmark = pytest.mark.anyio
+
+
+class Inbox:
+    """aiosmtpd handler that records messages and can refuse the first few."""
+
+    def __init__(self, refuse: int = 0):
+        self.refuse = refuse
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.refuse:
+            self.refuse -= 1
+            return "451 Try again later"
+        self.messages.append(envelope.content.decode())
+        return "250 OK"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp():
+    def serve(inbox: Inbox) -> SMTPConnection:
+        controller = Controller(inbox, hostname="127.0.0.1", port=_free_port())
+        controller.start()
+        controllers.append(controller)
+        return SMTPConnection("127.0.0.1", controller.port, "", "", False, idle_seconds=60)
+
+    controllers = []
+    yield serve
+    for controller in controllers:
+        controller.stop()
+
+
+@pytest.fixture
+async def make_queue(db):
+    async def make(connection: SMTPConnection, **overrides) -> MailQueue:
+        options = dict(batch_size=10, max_attempts=3, retry_base_seconds=0.2,
+                       poll_seconds=0.05, lease_seconds=60)
+        options.update(overrides)
+        queue = MailQueue(db["mail_outbox"], connection, "noreply@example.com", **options)
+        queues.append(queue)
+        queue.start()
+        return queue
+
+    queues = []
+    yield make
+    for queue in queues:
+        await queue.stop()
+
+
+async def _status(queue: MailQueue, message_id):
+    return await queue.collection.find_one({"_id": ObjectId(message_id)})
+
+
+async def _sent(queue: MailQueue, message_id):
+    doc = await _status(queue, message_id)
+    return doc if doc["status"] == "sent" else None
+
+
+async def test_delivers_and_drops_body(smtp, make_queue):
+    inbox = Inbox()
+    queue = await make_queue(smtp(inbox))
+
+    message_id = await queue.enqueue("a@example.com", "Your code", "Your code is: 123456")
+
+    doc = await eventually(lambda: _sent(queue, message_id))
+    assert doc["attempts"] == 1
+    assert "body" not in doc
+    assert len(inbox.messages) == 1
+    assert "Your code is: 123456" in inbox.messages[0]
+    assert queue.stats() == {"sent": 1, "failed": 0, "retried": 0}
+
+
+async def test_retries_with_backoff_after_smtp_failure(smtp, make_queue):
+    inbox = Inbox(refuse=1)
+    queue = await make_queue(smtp(inbox))
+
+    message_id = await queue.enqueue("a@example.com", "Hello", "body")
+
+    async def retried():
+        doc = await _status(queue, message_id)
+        return doc if doc["status"] == "pending" and doc.get("last_error") else None
+    doc = await eventually(retried)
+    assert "451" in doc["last_error"]
+    assert doc["next_attempt_at"] > datetime.utcnow()
+    assert inbox.messages == []
+
+    doc = await eventually(lambda: _sent(queue, message_id))
+    assert doc["attempts"] == 2
+    assert len(inbox.messages) == 1
+    assert queue.stats() == {"sent": 1, "failed": 0, "retried": 1}
+
+
+async def test_gives_up_after_max_attempts(smtp, make_queue):
+    queue = await make_queue(smtp(Inbox(refuse=10)), max_attempts=2, retry_base_seconds=0.01)
+
+    message_id = await queue.enqueue("a@example.com", "Hello", "Your code is: 123456")
+
+    async def failed():
+        doc = await _status(queue, message_id)
+        return doc if doc["status"] == "failed" else None
+    doc = await eventually(failed)
+    assert doc["attempts"] == 2
+    assert "body" not in doc
+    assert queue.stats()["failed"] == 1
+
+
+async def test_worker_survives_an_exception(smtp, make_queue):
+    inbox = Inbox()
+    connection = smtp(inbox)
+    send_batch = connection.send_batch
+    calls = []
+
+    def flaky_send_batch(messages):
+        calls.append(len(messages))
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return send_batch(messages)
+    connection.send_batch = flaky_send_batch
+
+    # The failed batch stays claimed until its lease runs out, then is sent
+    queue = await make_queue(connection, lease_seconds=1)
+    message_id = await queue.enqueue("a@example.com", "Hello", "body")
+
+    await eventually(lambda: _sent(queue, message_id))
+    assert len(calls) == 2
+    assert len(inbox.messages) == 1